@@ -5,11 +5,12 @@ Run: python app.py
 """
 
 import os
-from flask import Flask, render_template, jsonify
+from flask import Flask, render_template, jsonify, request, abort
 from flask_login import LoginManager
 from flask_migrate import Migrate
 from config import config
 from models.models import db, User
+from services.identity import load_user as cached_user
 
 login_manager = LoginManager()
 migrate = Migrate()
@@ -18,7 +19,7 @@ migrate = Migrate()
 @login_manager.user_loader
 def load_user(user_id):
     try:
-        return db.session.get(User, int(user_id))
+        return cached_user(user_id)
     except Exception:
         return None
 
@@ -31,11 +32,31 @@ def create_app(config_name=None):
     app.config.from_object(config.get(config_name, config["default"]))
 
     os.makedirs(app.config.get("UPLOAD_FOLDER", "static/uploads"), exist_ok=True)
+    os.makedirs(app.config["DOCUMENT_STORE"], exist_ok=True)
+    os.makedirs(app.config["UPLOAD_TMP_FOLDER"], exist_ok=True)
+    os.makedirs(app.config["PREVIEW_CACHE"], exist_ok=True)
     os.makedirs("database", exist_ok=True)
 
     db.init_app(app)
+    from services.sqlite import init_sqlite
+    init_sqlite(app)
+    from services.reporting import init_reporting
+    init_reporting(app)
     login_manager.init_app(app)
-    migrate.init_app(app, db)
+    migrate.init_app(app, db, directory=os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations"),
+                     render_as_batch=True)
+
+    from services.metrics import init_metrics
+    init_metrics(app)
+
+    from services.outbox import init_outbox
+    init_outbox(app)
+
+    from services.previews import init_previews
+    init_previews(app)
+
+    from services.report_cube import init_report_cube
+    init_report_cube(app)
 
     login_manager.login_view = "auth.login"
     login_manager.login_message_category = "warning"
@@ -48,6 +69,7 @@ def create_app(config_name=None):
     from routes.finance import finance_bp
     from routes.application import application_bp
     from routes.api import api_bp
+    from routes.documents import documents_bp
 
     app.register_blueprint(auth_bp)
     app.register_blueprint(student_bp, url_prefix="/student")
@@ -55,6 +77,13 @@ def create_app(config_name=None):
     app.register_blueprint(finance_bp, url_prefix="/finance")
     app.register_blueprint(application_bp, url_prefix="/application")
     app.register_blueprint(api_bp, url_prefix="/api")
+    app.register_blueprint(documents_bp, url_prefix="/documents")
+
+    # Uploaded documents are only served through the authenticated /documents routes
+    @app.before_request
+    def _block_public_uploads():
+        if request.endpoint == "static" and (request.view_args or {}).get("filename", "").startswith("uploads/"):
+            abort(404)
 
     # Error handlers
     @app.errorhandler(404)
@@ -70,6 +99,9 @@ def create_app(config_name=None):
         db.session.rollback()
         return render_template("errors/500.html"), 500
 
+    from cli import register_commands
+    register_commands(app)
+
     @app.shell_context_processor
     def make_shell_context():
         return {"db": db, "User": User}
@@ -83,6 +115,8 @@ if __name__ == "__main__":
 
     with app.app_context():
         db.create_all()
+        from flask_migrate import upgrade
+        upgrade()
         # Seed default admin users
         from models.models import seed_defaults
         seed_defaults()
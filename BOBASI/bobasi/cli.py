@@ -0,0 +1,232 @@
+"""
+Bobasi BBS - Flask CLI Commands
+Run: flask --app app <command>
+"""
+import sys
+import click
+
+
+def register_commands(app):
+
+    @app.cli.command("rebuild-disbursement-rollup")
+    def rebuild_disbursement_rollup_cmd():
+        """Rebuild the monthly disbursement rollup from existing disbursements."""
+        from services.rollups import rebuild_disbursement_rollup
+        buckets = rebuild_disbursement_rollup()
+        click.echo(f"✅ Disbursement rollup rebuilt ({buckets} buckets)")
+
+    @app.cli.command("rebuild-search-index")
+    def rebuild_search_index_cmd():
+        """Rebuild the FTS5 search index for students, applications and disbursements."""
+        from services.search import rebuild_search_index
+        if rebuild_search_index():
+            click.echo("✅ Search index rebuilt")
+        else:
+            click.echo("Full-text search needs SQLite FTS5; searches use LIKE on this database.")
+
+    @app.cli.command("reconcile-unread-counts")
+    def reconcile_unread_counts_cmd():
+        """Repair drift in users.unread_notification_count."""
+        from models.models import reconcile_unread_counts
+        fixed = reconcile_unread_counts()
+        click.echo(f"✅ Unread notification counters reconciled ({fixed} users corrected)")
+
+    @app.cli.command("drain-outbox")
+    def drain_outbox_cmd():
+        """Deliver every pending notification in the outbox now."""
+        from services.outbox import drain_outbox
+        delivered = drain_outbox()
+        click.echo(f"✅ Outbox drained ({delivered} entries delivered)")
+
+    @app.cli.command("stress-sequence")
+    @click.option("--processes", default=4, help="Forked worker processes.")
+    @click.option("--threads", default=8, help="Concurrent allocating threads per process.")
+    @click.option("--per-thread", default=100, help="Numbers allocated by each thread.")
+    @click.option("--block", default=1, help="Block size reserved per allocation round trip.")
+    def stress_sequence_cmd(processes, threads, per_thread, block):
+        """Allocate from a scratch sequence across processes and threads; fail on any duplicate."""
+        from services.sequences import check_concurrent_allocation
+        try:
+            result = check_concurrent_allocation(app, processes=processes, threads=threads,
+                                                 per_thread=per_thread, block_size=block)
+        except AssertionError as exc:
+            click.echo(f"❌ {exc}")
+            sys.exit(1)
+        click.echo(f"✅ {result['allocated']}/{result['expected']} numbers allocated by "
+                   f"{len(result['pids'])} processes, no duplicates")
+
+    @app.cli.command("resume-disbursement-run")
+    @click.argument("run_id", type=int)
+    @click.option("--chunk-size", default=500, help="Applications disbursed per transaction.")
+    def resume_disbursement_run_cmd(run_id, chunk_size):
+        """Continue an interrupted batch disbursement from its last committed chunk."""
+        from services.disbursement_runs import execute_run
+        from services.stats import invalidate_stats
+        run = execute_run(run_id, chunk_size=chunk_size)
+        if run is None:
+            click.echo(f"No disbursement run with id {run_id}")
+            sys.exit(1)
+        invalidate_stats()
+        click.echo(f"{run.reference_number}: {run.status}, {run.processed_count} disbursed, "
+                   f"KShs {run.processed_amount or 0:,.0f}")
+        if run.status != "completed":
+            click.echo(f"Error: {run.error}")
+            sys.exit(1)
+
+    @app.cli.command("gc-document-store")
+    @click.option("--partial-max-age", default=48, help="Hours before an unfinished upload is discarded.")
+    @click.option("--orphan-grace", default=None, type=int,
+                  help="Hours before a store file with no database row is removed (default DOCUMENT_ORPHAN_GRACE_HOURS).")
+    def gc_document_store_cmd(partial_max_age, orphan_grace):
+        """Recount document references, delete unreferenced blobs, orphaned files and stale partial uploads."""
+        from services.documents import collect_garbage
+        blobs, partials = collect_garbage(partial_max_age, orphan_grace)
+        click.echo(f"✅ Document store cleaned ({blobs} blobs, {partials} stale uploads removed)")
+
+    @app.cli.command("import-legacy-uploads")
+    def import_legacy_uploads_cmd():
+        """Move documents saved under static/uploads into the content-addressed store."""
+        from services.documents import import_legacy_uploads
+        moved = import_legacy_uploads()
+        click.echo(f"✅ {moved} legacy documents moved into the document store")
+
+    @app.cli.command("render-previews")
+    @click.option("--retry-failed", is_flag=True, help="Also retry previews that failed or were unavailable.")
+    def render_previews_cmd(retry_failed):
+        """Render every queued document preview now (the worker pool does this in the background)."""
+        from models.models import db, StoredFile
+        from services.previews import drain_previews
+        if retry_failed:
+            db.session.execute(db.update(StoredFile).where(StoredFile.preview_status.in_(("failed", "unavailable")))
+                               .values(preview_status="pending"))
+            db.session.commit()
+        rendered = drain_previews()
+        click.echo(f"✅ {rendered} document previews processed")
+
+    @app.cli.command("check-query-budgets")
+    def check_query_budgets_cmd():
+        """Fail if any listing endpoint issues more SQL statements than its budget."""
+        from services.querycount import check_query_budgets
+        failed = False
+        for url, count, budget, status in check_query_budgets(app):
+            ok = count <= budget and status == 200
+            failed = failed or not ok
+            click.echo(f"{'✅' if ok else '❌'} {url:<40} {count:>3} / {budget:<3} HTTP {status}")
+        if failed:
+            sys.exit(1)
+
+    @app.cli.command("check-query-plans")
+    def check_query_plans_cmd():
+        """Fail if any page's SQL fully scans a large table (SQLite EXPLAIN QUERY PLAN)."""
+        from services.queryplan import check_query_plans
+        failures = check_query_plans(app)
+        for url, status, statement, tables in failures:
+            click.echo(f"❌ {url:<40} HTTP {status}  full scan of {', '.join(sorted(set(tables)))}")
+            click.echo(f"   {' '.join(statement.split())[:200]}")
+        if failures:
+            sys.exit(1)
+        click.echo("✅ No full scans of large tables")
+
+    @app.cli.command("benchmark-sqlite")
+    @click.option("--processes", default=4, help="Worker processes (like gunicorn -w).")
+    @click.option("--threads", default=8, help="Request threads per process.")
+    @click.option("--seconds", default=10.0, help="Duration of each run.")
+    @click.option("--write-ratio", default=0.2, help="Share of operations that write.")
+    def benchmark_sqlite_cmd(processes, threads, seconds, write_ratio):
+        """Compare concurrent read/write throughput with default and production SQLite settings."""
+        from config import Config, ProductionConfig
+        from services.sqlite import benchmark
+        profiles = {
+            "default": (Config.SQLITE_PRAGMAS, {}),
+            "production": (ProductionConfig.SQLITE_PRAGMAS, ProductionConfig.SQLALCHEMY_ENGINE_OPTIONS),
+        }
+        click.echo(f"{processes} processes × {threads} threads, {seconds:g}s per run, "
+                   f"{write_ratio:.0%} writes (scratch databases)")
+        click.echo(f"{'profile':<11} {'op':<6} {'ops/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'errors':>7}")
+        for name, (pragmas, options) in profiles.items():
+            result = benchmark(pragmas, options, processes=processes, threads=threads, seconds=seconds,
+                               write_ratio=write_ratio)
+            for op, r in result.items():
+                click.echo(f"{name:<11} {op:<6} {r['per_second']:>8.0f} {r['p50_ms']:>8.1f} "
+                           f"{r['p95_ms']:>8.1f} {r['errors']:>7}")
+
+    @app.cli.command("refresh-reporting-snapshot")
+    def refresh_reporting_snapshot_cmd():
+        """Copy the primary database into REPORTING_SNAPSHOT now (e.g. from cron)."""
+        from services.reporting import refresh_snapshot
+        if not app.config.get("REPORTING_SNAPSHOT"):
+            click.echo("REPORTING_SNAPSHOT is not set; reports read the primary database.")
+            sys.exit(1)
+        seconds = refresh_snapshot()
+        click.echo(f"✅ Reporting snapshot refreshed in {seconds:.2f}s")
+
+    @app.cli.command("refresh-report-cube")
+    @click.option("--full", is_flag=True, help="Rebuild every bucket instead of applying recent changes.")
+    def refresh_report_cube_cmd(full):
+        """Bring the reporting cube behind /admin/reports up to date (e.g. from cron)."""
+        from services.report_cube import refresh_report_cube
+        changed = refresh_report_cube(full=full)
+        if changed is None:
+            click.echo("Another refresh is running; try again shortly.")
+            sys.exit(1)
+        click.echo(f"✅ Report cube {'rebuilt' if full else 'refreshed'}: {changed} application(s) updated")
+
+    @app.cli.command("check-loan-balances")
+    @click.option("--fix", is_flag=True, help="Rewrite drifted totals from the repayments ledger.")
+    def check_loan_balances_cmd(fix):
+        """Verify each loan's amount_paid and balance_remaining against its repayments."""
+        from services.loans import check_loan_balances
+        mismatches = check_loan_balances(fix=fix)
+        for loan_id, paid, ledger_paid, balance, ledger_balance in mismatches:
+            click.echo(f"{'🔧' if fix else '❌'} Loan #{loan_id}: paid {paid or 0:,.2f} (ledger {ledger_paid:,.2f}), "
+                       f"balance {balance if balance is not None else '—'} (ledger {ledger_balance:,.2f})")
+        if not mismatches:
+            click.echo("✅ Every loan matches its repayments ledger")
+        elif fix:
+            click.echo(f"✅ Repaired {len(mismatches)} loan(s)")
+        else:
+            sys.exit(1)
+
+    @app.cli.command("generate-load-data")
+    @click.option("--students", default=1000, help="Synthetic students to add.")
+    @click.option("--applications-per-student", default=3.0, help="Average applications per student.")
+    @click.option("--years", default=5, help="Academic years the applications are spread over.")
+    @click.option("--batch-size", default=1000, help="Students inserted per transaction.")
+    @click.option("--seed", type=int, default=None, help="Random seed, for a reproducible dataset.")
+    def generate_load_data_cmd(students, applications_per_student, years, batch_size, seed):
+        """Fill the database with synthetic students, applications, disbursements and notifications."""
+        from services.loadgen import generate_load_data, PASSWORD
+        added, seconds = generate_load_data(
+            students=students, applications_per_student=applications_per_student, years=years,
+            batch_size=batch_size, seed=seed,
+            progress=lambda done, total: click.echo(f"  {done:,} / {total:,} students"),
+        )
+        click.echo(f"✅ Generated in {seconds:.1f}s: " + ", ".join(f"{n:,} {t}" for t, n in added.items()))
+        click.echo(f"   Synthetic students log in with password {PASSWORD}")
+
+    @app.cli.command("benchmark-routes")
+    @click.option("--iterations", default=20, help="Timed requests per URL.")
+    @click.option("--warmup", default=1, help="Untimed requests per URL first (fills caches).")
+    @click.option("--output", type=click.Path(dir_okay=False), default=None, help="Write the baseline JSON here.")
+    @click.option("--compare", "compare_to", type=click.Path(exists=True, dir_okay=False), default=None,
+                  help="Earlier baseline to compare against; exits 1 on regressions.")
+    @click.option("--threshold", default=0.25, help="Relative p95 increase that counts as a regression.")
+    def benchmark_routes_cmd(iterations, warmup, output, compare_to, threshold):
+        """Time every page through the test client and record latency percentiles and SQL counts."""
+        from services.benchmark import benchmark_routes, save_baseline, load_baseline, compare_baselines
+        click.echo(f"{'URL':<48} {'HTTP':>4} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'SQL':>4}")
+        baseline = benchmark_routes(
+            app, iterations=iterations, warmup=warmup,
+            progress=lambda url, r: click.echo(f"{url:<48} {r['status']:>4} {r['p50_ms']:>8.1f} "
+                                               f"{r['p95_ms']:>8.1f} {r['p99_ms']:>8.1f} {r['sql']:>4}"),
+        )
+        if output:
+            save_baseline(baseline, output)
+            click.echo(f"✅ Baseline written to {output}")
+        if compare_to:
+            regressions = compare_baselines(load_baseline(compare_to), baseline, threshold=threshold)
+            for url, metric, before, after in regressions:
+                click.echo(f"❌ {url:<48} {metric}: {before} → {after}")
+            if regressions:
+                sys.exit(1)
+            click.echo(f"✅ No regressions against {compare_to}")
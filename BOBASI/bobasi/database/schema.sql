@@ -22,6 +22,7 @@ CREATE TABLE users (
     status ENUM('active', 'inactive', 'suspended') NOT NULL DEFAULT 'active',
     email_verified TINYINT(1) DEFAULT 0,
     last_login DATETIME NULL,
+    unread_notification_count INT NOT NULL DEFAULT 0,
     created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
     updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
 );
@@ -125,6 +126,21 @@ CREATE TABLE applications (
 -- ============================================================
 -- DOCUMENTS
 -- ============================================================
+-- Content-addressed blobs (DOCUMENT_STORE/<aa>/<bb>/<sha256>), shared by documents
+CREATE TABLE stored_files (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    sha256 CHAR(64) NOT NULL UNIQUE,
+    size BIGINT NOT NULL,
+    mime_type VARCHAR(100),
+    storage_path VARCHAR(255) NOT NULL,
+    ref_count INT NOT NULL DEFAULT 0,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    last_referenced_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    preview_status ENUM('pending','rendering','ready','unavailable','failed') NOT NULL DEFAULT 'pending',
+    preview_mime VARCHAR(50),
+    preview_updated_at DATETIME NULL
+);
+
 CREATE TABLE documents (
     id INT AUTO_INCREMENT PRIMARY KEY,
     student_id INT NOT NULL,
@@ -134,10 +150,32 @@ CREATE TABLE documents (
     file_path VARCHAR(500) NOT NULL,
     file_size INT,
     mime_type VARCHAR(100),
+    stored_file_id INT NULL,
     status ENUM('pending','verified','rejected') DEFAULT 'pending',
     uploaded_at DATETIME DEFAULT CURRENT_TIMESTAMP,
     FOREIGN KEY (student_id) REFERENCES students(id) ON DELETE CASCADE,
-    FOREIGN KEY (application_id) REFERENCES applications(id) ON DELETE CASCADE
+    FOREIGN KEY (application_id) REFERENCES applications(id) ON DELETE CASCADE,
+    FOREIGN KEY (stored_file_id) REFERENCES stored_files(id),
+    INDEX ix_documents_stored_file_id (stored_file_id)
+);
+
+-- Chunked uploads in progress (bytes in UPLOAD_TMP_FOLDER/<id>.part)
+CREATE TABLE upload_sessions (
+    id CHAR(32) PRIMARY KEY,
+    student_id INT NOT NULL,
+    application_id INT NOT NULL,
+    document_type VARCHAR(50) NOT NULL,
+    filename VARCHAR(255) NOT NULL,
+    mime_type VARCHAR(100),
+    total_size BIGINT NOT NULL,
+    received_bytes BIGINT NOT NULL DEFAULT 0,
+    status ENUM('uploading','complete','aborted') NOT NULL DEFAULT 'uploading',
+    document_id INT NULL,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    FOREIGN KEY (student_id) REFERENCES students(id) ON DELETE CASCADE,
+    FOREIGN KEY (application_id) REFERENCES applications(id) ON DELETE CASCADE,
+    FOREIGN KEY (document_id) REFERENCES documents(id) ON DELETE SET NULL
 );
 
 -- ============================================================
@@ -155,6 +193,28 @@ CREATE TABLE reviews (
     FOREIGN KEY (reviewer_id) REFERENCES users(id)
 );
 
+-- ============================================================
+-- DISBURSEMENT RUNS (batch disbursements)
+-- ============================================================
+CREATE TABLE disbursement_runs (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    reference_number VARCHAR(100) NOT NULL UNIQUE,
+    finance_officer_id INT NOT NULL,
+    payment_method ENUM('bank_transfer','mpesa','cheque','cash') NOT NULL,
+    filters_json TEXT NULL,
+    notes TEXT NULL,
+    status ENUM('pending','running','completed','failed') NOT NULL DEFAULT 'pending',
+    total_selected INT DEFAULT 0,
+    processed_count INT DEFAULT 0,
+    processed_amount DECIMAL(14,2) DEFAULT 0,
+    last_application_id INT DEFAULT 0,
+    error TEXT NULL,
+    started_at DATETIME NULL,
+    completed_at DATETIME NULL,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (finance_officer_id) REFERENCES users(id)
+);
+
 -- ============================================================
 -- DISBURSEMENTS
 -- ============================================================
@@ -163,6 +223,7 @@ CREATE TABLE disbursements (
     application_id INT NOT NULL,
     student_id INT NOT NULL,
     finance_officer_id INT NOT NULL,
+    run_id INT NULL,
     amount DECIMAL(10,2) NOT NULL,
     disbursement_date DATETIME DEFAULT CURRENT_TIMESTAMP,
     payment_method ENUM('bank_transfer','mpesa','cheque','cash') NOT NULL,
@@ -174,7 +235,61 @@ CREATE TABLE disbursements (
     created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
     FOREIGN KEY (application_id) REFERENCES applications(id),
     FOREIGN KEY (student_id) REFERENCES students(id),
-    FOREIGN KEY (finance_officer_id) REFERENCES users(id)
+    FOREIGN KEY (finance_officer_id) REFERENCES users(id),
+    FOREIGN KEY (run_id) REFERENCES disbursement_runs(id)
+);
+
+-- ============================================================
+-- DISBURSEMENT ROLLUPS (monthly totals per financial year)
+-- ============================================================
+CREATE TABLE disbursement_rollups (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    financial_year VARCHAR(9) NOT NULL,
+    month INT NOT NULL,
+    payment_method VARCHAR(20) NOT NULL,
+    ward VARCHAR(100) NOT NULL DEFAULT '',
+    total_amount DECIMAL(14,2) NOT NULL DEFAULT 0,
+    disbursement_count INT NOT NULL DEFAULT 0,
+    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    UNIQUE KEY uq_disbursement_rollup_bucket (financial_year, month, payment_method, ward)
+);
+
+-- ============================================================
+-- REPORTING CUBE (admin reports; refreshed incrementally)
+-- ============================================================
+CREATE TABLE report_cube (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    academic_year VARCHAR(10) NOT NULL DEFAULT '',
+    sub_county VARCHAR(100) NOT NULL DEFAULT '',
+    ward VARCHAR(100) NOT NULL DEFAULT '',
+    location VARCHAR(100) NOT NULL DEFAULT '',
+    institution VARCHAR(200) NOT NULL DEFAULT '',
+    status VARCHAR(20) NOT NULL DEFAULT '',
+    level_of_study VARCHAR(100) NOT NULL DEFAULT '',
+    application_count INT NOT NULL DEFAULT 0,
+    requested_amount DECIMAL(14,2) NOT NULL DEFAULT 0,
+    approved_amount DECIMAL(14,2) NOT NULL DEFAULT 0,
+    disbursed_amount DECIMAL(14,2) NOT NULL DEFAULT 0,
+    disbursement_count INT NOT NULL DEFAULT 0,
+    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    UNIQUE KEY uq_report_cube_bucket (academic_year, sub_county, ward, location, institution, status, level_of_study)
+);
+
+CREATE TABLE report_cube_members (
+    application_id INT PRIMARY KEY,
+    cube_id INT NOT NULL,
+    requested_amount DECIMAL(12,2) NOT NULL DEFAULT 0,
+    approved_amount DECIMAL(12,2) NOT NULL DEFAULT 0,
+    disbursed_amount DECIMAL(12,2) NOT NULL DEFAULT 0,
+    disbursement_count INT NOT NULL DEFAULT 0,
+    FOREIGN KEY (cube_id) REFERENCES report_cube(id)
+);
+
+CREATE TABLE report_cube_state (
+    id INT PRIMARY KEY,
+    watermark DATETIME NULL,
+    refreshed_at DATETIME NULL,
+    locked_until DATETIME NULL
 );
 
 -- ============================================================
@@ -189,6 +304,7 @@ CREATE TABLE loans (
     repayment_period_months INT DEFAULT 24,
     monthly_installment DECIMAL(10,2),
     total_payable DECIMAL(10,2),
+    amount_paid DECIMAL(10,2) NOT NULL DEFAULT 0,
     balance_remaining DECIMAL(10,2),
     start_date VARCHAR(20),
     due_date VARCHAR(20),
@@ -207,13 +323,17 @@ CREATE TABLE repayments (
     loan_id INT NOT NULL,
     student_id INT NOT NULL,
     amount DECIMAL(10,2) NOT NULL,
+    entry_type ENUM('payment','reversal','adjustment') NOT NULL DEFAULT 'payment',
+    reverses_id INT NULL,
     payment_date DATETIME DEFAULT CURRENT_TIMESTAMP,
-    payment_method ENUM('bank_transfer','mpesa','cheque','cash') NOT NULL,
+    payment_method ENUM('bank_transfer','mpesa','cheque','cash') NULL,
     reference_number VARCHAR(100),
     balance_remaining DECIMAL(10,2),
     recorded_by INT NULL,
     notes TEXT NULL,
     created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE KEY uq_repayments_reverses_id (reverses_id),
+    FOREIGN KEY (reverses_id) REFERENCES repayments(id),
     FOREIGN KEY (loan_id) REFERENCES loans(id),
     FOREIGN KEY (student_id) REFERENCES students(id)
 );
@@ -232,6 +352,34 @@ CREATE TABLE notifications (
     FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
 );
 
+-- ============================================================
+-- NUMBER SEQUENCES (application numbers per year)
+-- ============================================================
+CREATE TABLE number_sequences (
+    name VARCHAR(50) PRIMARY KEY,
+    next_value BIGINT NOT NULL DEFAULT 1,
+    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+);
+
+-- ============================================================
+-- NOTIFICATION OUTBOX (fan-out queue for the background worker)
+-- ============================================================
+CREATE TABLE notification_outbox (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    recipient_user_id INT NULL,
+    recipient_roles VARCHAR(100) NULL,
+    title VARCHAR(200) NOT NULL,
+    message TEXT NOT NULL,
+    type ENUM('application','disbursement','repayment','review','system') DEFAULT 'system',
+    status ENUM('pending','done','failed') NOT NULL DEFAULT 'pending',
+    attempts INT NOT NULL DEFAULT 0,
+    last_error TEXT NULL,
+    available_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    processed_at DATETIME NULL,
+    FOREIGN KEY (recipient_user_id) REFERENCES users(id) ON DELETE CASCADE
+);
+
 -- ============================================================
 -- INDEXES
 -- ============================================================
@@ -240,7 +388,29 @@ CREATE INDEX idx_applications_status ON applications(status);
 CREATE INDEX idx_documents_application ON documents(application_id);
 CREATE INDEX idx_loans_student ON loans(student_id);
 CREATE INDEX idx_repayments_loan ON repayments(loan_id);
-CREATE INDEX idx_notifications_user ON notifications(user_id, is_read);
+CREATE INDEX ix_users_created_at ON users(created_at);
+CREATE INDEX ix_students_user_id ON students(user_id);
+CREATE INDEX ix_students_sub_county ON students(sub_county);
+CREATE INDEX ix_students_ward ON students(ward);
+CREATE INDEX ix_students_created_at ON students(created_at);
+CREATE INDEX ix_applications_submitted_at ON applications(submitted_at);
+CREATE INDEX ix_reviews_application_id ON reviews(application_id);
+CREATE INDEX ix_disbursements_application_id ON disbursements(application_id);
+CREATE INDEX ix_disbursements_student_id ON disbursements(student_id);
+CREATE INDEX ix_disbursements_created_at ON disbursements(created_at);
+CREATE INDEX ix_loans_application_id ON loans(application_id);
+CREATE INDEX ix_loans_created_at ON loans(created_at);
+CREATE INDEX ix_applications_updated_at ON applications(updated_at);
+CREATE INDEX ix_students_updated_at ON students(updated_at);
+CREATE INDEX ix_report_cube_members_cube_id ON report_cube_members(cube_id);
+CREATE INDEX ix_notifications_user_unread_created ON notifications(user_id, is_read, created_at);
+CREATE INDEX ix_notifications_user_created ON notifications(user_id, created_at);
+CREATE INDEX ix_notification_outbox_status_available ON notification_outbox(status, available_at);
+CREATE INDEX ix_disbursements_run_id ON disbursements(run_id);
+CREATE INDEX ix_disbursement_rollups_financial_year ON disbursement_rollups(financial_year);
+CREATE INDEX ix_disbursements_method_created ON disbursements(payment_method, created_at);
+CREATE INDEX ix_loans_status_created ON loans(status, created_at);
+CREATE INDEX ix_loans_status_amount ON loans(status, principal_amount);
 
 -- ============================================================
 -- SEED DATA - DEFAULT STAFF ACCOUNTS
@@ -0,0 +1,28 @@
+"""Baseline schema
+
+The original tables are created by db.create_all() (python app.py) or by
+database/schema.sql on MySQL. Later revisions are written to be safe on
+databases built either way.
+
+Revision ID: 0001_baseline
+Revises:
+Create Date: 2026-10-17 09:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0001_baseline'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    pass
+
+
+def downgrade():
+    pass
@@ -0,0 +1,40 @@
+"""Monthly disbursement rollup table
+
+Revision ID: 0002_disbursement_rollups
+Revises: 0001_baseline
+Create Date: 2026-10-17 09:05:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0002_disbursement_rollups'
+down_revision = '0001_baseline'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if sa.inspect(op.get_bind()).has_table('disbursement_rollups'):
+        return
+    op.create_table(
+        'disbursement_rollups',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('financial_year', sa.String(length=9), nullable=False),
+        sa.Column('month', sa.Integer(), nullable=False),
+        sa.Column('payment_method', sa.String(length=20), nullable=False),
+        sa.Column('ward', sa.String(length=100), nullable=False, server_default=''),
+        sa.Column('total_amount', sa.Float(), nullable=False, server_default='0'),
+        sa.Column('disbursement_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.UniqueConstraint('financial_year', 'month', 'payment_method', 'ward',
+                            name='uq_disbursement_rollup_bucket'),
+    )
+    op.create_index('ix_disbursement_rollups_financial_year', 'disbursement_rollups', ['financial_year'])
+
+
+def downgrade():
+    op.drop_index('ix_disbursement_rollups_financial_year', table_name='disbursement_rollups')
+    op.drop_table('disbursement_rollups')
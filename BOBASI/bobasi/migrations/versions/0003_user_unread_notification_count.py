@@ -0,0 +1,33 @@
+"""Denormalized unread notification counter on users
+
+Revision ID: 0003_user_unread_notification_count
+Revises: 0002_disbursement_rollups
+Create Date: 2026-10-17 09:10:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0003_user_unread_notification_count'
+down_revision = '0002_disbursement_rollups'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    columns = {c['name'] for c in sa.inspect(op.get_bind()).get_columns('users')}
+    if 'unread_notification_count' not in columns:
+        op.add_column('users', sa.Column('unread_notification_count', sa.Integer(),
+                                         nullable=False, server_default='0'))
+    op.execute(
+        "UPDATE users SET unread_notification_count = ("
+        "SELECT COUNT(*) FROM notifications "
+        "WHERE notifications.user_id = users.id AND notifications.is_read = 0)"
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('users') as batch_op:
+        batch_op.drop_column('unread_notification_count')
@@ -0,0 +1,33 @@
+"""Notification inbox indexes
+
+Revision ID: 0004_notification_inbox_indexes
+Revises: 0003_user_unread_notification_count
+Create Date: 2026-10-17 09:20:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0004_notification_inbox_indexes'
+down_revision = '0003_user_unread_notification_count'
+branch_labels = None
+depends_on = None
+
+INDEXES = {
+    'ix_notifications_user_unread_created': ['user_id', 'is_read', 'created_at'],
+    'ix_notifications_user_created': ['user_id', 'created_at'],
+}
+
+
+def upgrade():
+    existing = {i['name'] for i in sa.inspect(op.get_bind()).get_indexes('notifications')}
+    for name, columns in INDEXES.items():
+        if name not in existing:
+            op.create_index(name, 'notifications', columns)
+
+
+def downgrade():
+    for name in INDEXES:
+        op.drop_index(name, table_name='notifications')
@@ -0,0 +1,42 @@
+"""Notification outbox table
+
+Revision ID: 0005_notification_outbox
+Revises: 0004_notification_inbox_indexes
+Create Date: 2026-10-17 09:30:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0005_notification_outbox'
+down_revision = '0004_notification_inbox_indexes'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if sa.inspect(op.get_bind()).has_table('notification_outbox'):
+        return
+    op.create_table(
+        'notification_outbox',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('recipient_user_id', sa.Integer(), sa.ForeignKey('users.id', ondelete='CASCADE'), nullable=True),
+        sa.Column('recipient_roles', sa.String(length=100), nullable=True),
+        sa.Column('title', sa.String(length=200), nullable=False),
+        sa.Column('message', sa.Text(), nullable=False),
+        sa.Column('type', sa.Enum('application', 'disbursement', 'repayment', 'review', 'system'), nullable=True),
+        sa.Column('status', sa.Enum('pending', 'done', 'failed'), nullable=False, server_default='pending'),
+        sa.Column('attempts', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.Column('available_at', sa.DateTime(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('processed_at', sa.DateTime(), nullable=True),
+    )
+    op.create_index('ix_notification_outbox_status_available', 'notification_outbox', ['status', 'available_at'])
+
+
+def downgrade():
+    op.drop_index('ix_notification_outbox_status_available', table_name='notification_outbox')
+    op.drop_table('notification_outbox')
@@ -0,0 +1,31 @@
+"""Number sequences for application numbers
+
+Revision ID: 0006_number_sequences
+Revises: 0005_notification_outbox
+Create Date: 2026-10-17 09:40:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0006_number_sequences'
+down_revision = '0005_notification_outbox'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if sa.inspect(op.get_bind()).has_table('number_sequences'):
+        return
+    op.create_table(
+        'number_sequences',
+        sa.Column('name', sa.String(length=50), primary_key=True),
+        sa.Column('next_value', sa.BigInteger(), nullable=False, server_default='1'),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+    )
+
+
+def downgrade():
+    op.drop_table('number_sequences')
@@ -0,0 +1,54 @@
+"""Batch disbursement runs
+
+Revision ID: 0007_disbursement_runs
+Revises: 0006_number_sequences
+Create Date: 2026-10-17 09:50:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0007_disbursement_runs'
+down_revision = '0006_number_sequences'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table('disbursement_runs'):
+        op.create_table(
+            'disbursement_runs',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('reference_number', sa.String(length=100), nullable=False, unique=True),
+            sa.Column('finance_officer_id', sa.Integer(), sa.ForeignKey('users.id'), nullable=False),
+            sa.Column('payment_method', sa.Enum('bank_transfer', 'mpesa', 'cheque', 'cash'), nullable=False),
+            sa.Column('filters_json', sa.Text(), nullable=True),
+            sa.Column('notes', sa.Text(), nullable=True),
+            sa.Column('status', sa.Enum('pending', 'running', 'completed', 'failed'), nullable=False,
+                      server_default='pending'),
+            sa.Column('total_selected', sa.Integer(), nullable=True),
+            sa.Column('processed_count', sa.Integer(), nullable=True),
+            sa.Column('processed_amount', sa.Float(), nullable=True),
+            sa.Column('last_application_id', sa.Integer(), nullable=True),
+            sa.Column('error', sa.Text(), nullable=True),
+            sa.Column('started_at', sa.DateTime(), nullable=True),
+            sa.Column('completed_at', sa.DateTime(), nullable=True),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+        )
+    columns = {c['name'] for c in inspector.get_columns('disbursements')}
+    if 'run_id' not in columns:
+        with op.batch_alter_table('disbursements') as batch_op:
+            batch_op.add_column(sa.Column('run_id', sa.Integer(), nullable=True))
+            batch_op.create_foreign_key('fk_disbursements_run_id', 'disbursement_runs', ['run_id'], ['id'])
+            batch_op.create_index('ix_disbursements_run_id', ['run_id'])
+
+
+def downgrade():
+    with op.batch_alter_table('disbursements') as batch_op:
+        batch_op.drop_index('ix_disbursements_run_id')
+        batch_op.drop_constraint('fk_disbursements_run_id', type_='foreignkey')
+        batch_op.drop_column('run_id')
+    op.drop_table('disbursement_runs')
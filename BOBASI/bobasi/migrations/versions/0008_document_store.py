@@ -0,0 +1,63 @@
+"""Content-addressed document store and chunked upload sessions
+
+Revision ID: 0008_document_store
+Revises: 0007_disbursement_runs
+Create Date: 2026-10-17 11:20:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0008_document_store'
+down_revision = '0007_disbursement_runs'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table('stored_files'):
+        op.create_table(
+            'stored_files',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('sha256', sa.String(length=64), nullable=False, unique=True),
+            sa.Column('size', sa.BigInteger(), nullable=False),
+            sa.Column('mime_type', sa.String(length=100), nullable=True),
+            sa.Column('storage_path', sa.String(length=255), nullable=False),
+            sa.Column('ref_count', sa.Integer(), nullable=False, server_default='0'),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.Column('last_referenced_at', sa.DateTime(), nullable=True),
+        )
+    if not inspector.has_table('upload_sessions'):
+        op.create_table(
+            'upload_sessions',
+            sa.Column('id', sa.String(length=32), primary_key=True),
+            sa.Column('student_id', sa.Integer(), sa.ForeignKey('students.id', ondelete='CASCADE'), nullable=False),
+            sa.Column('application_id', sa.Integer(), sa.ForeignKey('applications.id', ondelete='CASCADE'), nullable=False),
+            sa.Column('document_type', sa.String(length=50), nullable=False),
+            sa.Column('filename', sa.String(length=255), nullable=False),
+            sa.Column('mime_type', sa.String(length=100), nullable=True),
+            sa.Column('total_size', sa.BigInteger(), nullable=False),
+            sa.Column('received_bytes', sa.BigInteger(), nullable=False, server_default='0'),
+            sa.Column('status', sa.Enum('uploading', 'complete', 'aborted'), nullable=False, server_default='uploading'),
+            sa.Column('document_id', sa.Integer(), sa.ForeignKey('documents.id', ondelete='SET NULL'), nullable=True),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.Column('updated_at', sa.DateTime(), nullable=True),
+        )
+    columns = {c['name'] for c in inspector.get_columns('documents')}
+    if 'stored_file_id' not in columns:
+        with op.batch_alter_table('documents') as batch_op:
+            batch_op.add_column(sa.Column('stored_file_id', sa.Integer(), nullable=True))
+            batch_op.create_foreign_key('fk_documents_stored_file_id', 'stored_files', ['stored_file_id'], ['id'])
+            batch_op.create_index('ix_documents_stored_file_id', ['stored_file_id'])
+
+
+def downgrade():
+    with op.batch_alter_table('documents') as batch_op:
+        batch_op.drop_index('ix_documents_stored_file_id')
+        batch_op.drop_constraint('fk_documents_stored_file_id', type_='foreignkey')
+        batch_op.drop_column('stored_file_id')
+    op.drop_table('upload_sessions')
+    op.drop_table('stored_files')
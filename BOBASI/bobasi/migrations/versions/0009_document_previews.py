@@ -0,0 +1,36 @@
+"""Preview pipeline state on stored files
+
+Revision ID: 0009_document_previews
+Revises: 0008_document_store
+Create Date: 2026-10-17 12:40:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0009_document_previews'
+down_revision = '0008_document_store'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    columns = {c['name'] for c in sa.inspect(op.get_bind()).get_columns('stored_files')}
+    with op.batch_alter_table('stored_files') as batch_op:
+        if 'preview_status' not in columns:
+            batch_op.add_column(sa.Column(
+                'preview_status', sa.Enum('pending', 'rendering', 'ready', 'unavailable', 'failed'),
+                nullable=False, server_default='pending'))
+        if 'preview_mime' not in columns:
+            batch_op.add_column(sa.Column('preview_mime', sa.String(length=50), nullable=True))
+        if 'preview_updated_at' not in columns:
+            batch_op.add_column(sa.Column('preview_updated_at', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('stored_files') as batch_op:
+        batch_op.drop_column('preview_updated_at')
+        batch_op.drop_column('preview_mime')
+        batch_op.drop_column('preview_status')
@@ -0,0 +1,70 @@
+"""Indexes for the hot filter, join and sort columns
+
+Revision ID: 0010_query_indexes
+Revises: 0009_document_previews
+Create Date: 2026-10-17 14:10:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0010_query_indexes'
+down_revision = '0009_document_previews'
+branch_labels = None
+depends_on = None
+
+# table → {index name: columns}. The idx_* names match database/schema.sql, so
+# databases built from it keep their existing indexes.
+INDEXES = {
+    'users': {
+        'ix_users_created_at': ['created_at'],
+    },
+    'students': {
+        'ix_students_user_id': ['user_id'],
+        'ix_students_sub_county': ['sub_county'],
+        'ix_students_ward': ['ward'],
+        'ix_students_created_at': ['created_at'],
+    },
+    'applications': {
+        'idx_applications_student': ['student_id'],
+        'idx_applications_status': ['status'],
+        'ix_applications_submitted_at': ['submitted_at'],
+    },
+    'documents': {
+        'idx_documents_application': ['application_id'],
+    },
+    'reviews': {
+        'ix_reviews_application_id': ['application_id'],
+    },
+    'disbursements': {
+        'ix_disbursements_application_id': ['application_id'],
+        'ix_disbursements_student_id': ['student_id'],
+        'ix_disbursements_created_at': ['created_at'],
+    },
+    'loans': {
+        'idx_loans_student': ['student_id'],
+        'ix_loans_application_id': ['application_id'],
+        'ix_loans_created_at': ['created_at'],
+    },
+    'repayments': {
+        'idx_repayments_loan': ['loan_id'],
+    },
+}
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    for table, indexes in INDEXES.items():
+        existing = {i['name'] for i in inspector.get_indexes(table)}
+        for name, columns in indexes.items():
+            if name not in existing:
+                op.create_index(name, table, columns)
+
+
+def downgrade():
+    for table, indexes in INDEXES.items():
+        for name in indexes:
+            if not name.startswith('idx_'):
+                op.drop_index(name, table_name=table)
@@ -0,0 +1,79 @@
+"""Reporting cube for admin reports
+
+Revision ID: 0011_report_cube
+Revises: 0010_query_indexes
+Create Date: 2026-10-17 15:20:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0011_report_cube'
+down_revision = '0010_query_indexes'
+branch_labels = None
+depends_on = None
+
+KEY_COLUMNS = (
+    ('academic_year', 10), ('sub_county', 100), ('ward', 100), ('location', 100),
+    ('institution', 200), ('status', 20), ('level_of_study', 100),
+)
+
+# updated_at drives the incremental refresh
+INDEXES = {
+    'applications': {'ix_applications_updated_at': ['updated_at']},
+    'students': {'ix_students_updated_at': ['updated_at']},
+}
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table('report_cube'):
+        op.create_table(
+            'report_cube',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            *(sa.Column(name, sa.String(length=length), nullable=False, server_default='')
+              for name, length in KEY_COLUMNS),
+            sa.Column('application_count', sa.Integer(), nullable=False, server_default='0'),
+            sa.Column('requested_amount', sa.Float(), nullable=False, server_default='0'),
+            sa.Column('approved_amount', sa.Float(), nullable=False, server_default='0'),
+            sa.Column('disbursed_amount', sa.Float(), nullable=False, server_default='0'),
+            sa.Column('disbursement_count', sa.Integer(), nullable=False, server_default='0'),
+            sa.Column('updated_at', sa.DateTime(), nullable=True),
+            sa.UniqueConstraint(*(name for name, _ in KEY_COLUMNS), name='uq_report_cube_bucket'),
+        )
+    if not inspector.has_table('report_cube_members'):
+        op.create_table(
+            'report_cube_members',
+            sa.Column('application_id', sa.Integer(), primary_key=True, autoincrement=False),
+            sa.Column('cube_id', sa.Integer(), sa.ForeignKey('report_cube.id'), nullable=False),
+            sa.Column('requested_amount', sa.Float(), nullable=False, server_default='0'),
+            sa.Column('approved_amount', sa.Float(), nullable=False, server_default='0'),
+            sa.Column('disbursed_amount', sa.Float(), nullable=False, server_default='0'),
+            sa.Column('disbursement_count', sa.Integer(), nullable=False, server_default='0'),
+        )
+        op.create_index('ix_report_cube_members_cube_id', 'report_cube_members', ['cube_id'])
+    if not inspector.has_table('report_cube_state'):
+        op.create_table(
+            'report_cube_state',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('watermark', sa.DateTime(), nullable=True),
+            sa.Column('refreshed_at', sa.DateTime(), nullable=True),
+            sa.Column('locked_until', sa.DateTime(), nullable=True),
+        )
+    for table, indexes in INDEXES.items():
+        existing = {i['name'] for i in inspector.get_indexes(table)}
+        for name, columns in indexes.items():
+            if name not in existing:
+                op.create_index(name, table, columns)
+
+
+def downgrade():
+    for table, indexes in INDEXES.items():
+        for name in indexes:
+            op.drop_index(name, table_name=table)
+    op.drop_table('report_cube_state')
+    op.drop_index('ix_report_cube_members_cube_id', table_name='report_cube_members')
+    op.drop_table('report_cube_members')
+    op.drop_table('report_cube')
@@ -0,0 +1,104 @@
+"""Running loan balances and repayment ledger entry types
+
+Revision ID: 0012_loan_running_balances
+Revises: 0011_report_cube
+Create Date: 2026-10-17 16:40:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0012_loan_running_balances'
+down_revision = '0011_report_cube'
+branch_labels = None
+depends_on = None
+
+
+BATCH_SIZE = 1000
+
+loans = sa.table(
+    'loans',
+    sa.column('id', sa.Integer), sa.column('principal_amount', sa.Float), sa.column('total_payable', sa.Float),
+    sa.column('repayment_period_months', sa.Integer), sa.column('amount_paid', sa.Float),
+    sa.column('balance_remaining', sa.Float),
+)
+repayments = sa.table(
+    'repayments',
+    sa.column('id', sa.Integer), sa.column('loan_id', sa.Integer), sa.column('amount', sa.Float),
+    sa.column('balance_remaining', sa.Float),
+)
+
+
+def _balance_for(paid):
+    """Balance owed once `paid` has been repaid; grants (no repayment period) owe nothing.
+
+    A copy of Loan.balance_for as of this revision, so the migration does not
+    change meaning when the model does.
+    """
+    return sa.case(
+        (loans.c.repayment_period_months == 0, 0.0),
+        else_=sa.func.coalesce(loans.c.total_payable, loans.c.principal_amount) - paid,
+    )
+
+
+def _backfill_balances(bind):
+    """Set loans.balance_remaining and each repayment's balance-after-entry from the ledger."""
+    bind.execute(loans.update().values(balance_remaining=_balance_for(loans.c.amount_paid)))
+
+    # Running balance after each entry, in ledger (id) order. Computed with a SELECT and
+    # written back by id: MySQL rejects an UPDATE whose subquery reads the same table.
+    earlier = repayments.alias('earlier')
+    paid_so_far = (
+        sa.select(sa.func.sum(earlier.c.amount))
+        .where(earlier.c.loan_id == repayments.c.loan_id, earlier.c.id <= repayments.c.id)
+        .scalar_subquery()
+    )
+    rows = bind.execute(
+        sa.select(repayments.c.id, _balance_for(paid_so_far))
+        .select_from(repayments.join(loans, loans.c.id == repayments.c.loan_id))
+        .order_by(repayments.c.id)
+    ).all()
+    update = repayments.update().where(repayments.c.id == sa.bindparam('entry_id')) \
+        .values(balance_remaining=sa.bindparam('balance'))
+    for start in range(0, len(rows), BATCH_SIZE):
+        bind.execute(update, [{'entry_id': i, 'balance': b} for i, b in rows[start:start + BATCH_SIZE]])
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    loan_columns = {c['name'] for c in inspector.get_columns('loans')}
+    if 'amount_paid' not in loan_columns:
+        with op.batch_alter_table('loans') as batch_op:
+            batch_op.add_column(sa.Column('amount_paid', sa.Float(), nullable=False, server_default='0'))
+        # Start the running total from the existing ledger
+        op.execute(
+            "UPDATE loans SET amount_paid = "
+            "(SELECT COALESCE(SUM(amount), 0) FROM repayments WHERE repayments.loan_id = loans.id)"
+        )
+        _backfill_balances(op.get_bind())
+
+    repayment_columns = {c['name']: c for c in inspector.get_columns('repayments')}
+    if 'entry_type' not in repayment_columns:
+        with op.batch_alter_table('repayments') as batch_op:
+            batch_op.add_column(sa.Column('entry_type', sa.Enum('payment', 'reversal', 'adjustment'),
+                                          nullable=False, server_default='payment'))
+            batch_op.add_column(sa.Column('reverses_id', sa.Integer(), nullable=True))
+            batch_op.create_foreign_key('fk_repayments_reverses_id', 'repayments', ['reverses_id'], ['id'])
+            batch_op.create_unique_constraint('uq_repayments_reverses_id', ['reverses_id'])
+    if not repayment_columns['payment_method']['nullable']:
+        # Adjustments are not payments and carry no payment method
+        with op.batch_alter_table('repayments') as batch_op:
+            batch_op.alter_column('payment_method', existing_type=sa.Enum('bank_transfer', 'mpesa', 'cheque', 'cash'),
+                                  nullable=True)
+
+
+def downgrade():
+    with op.batch_alter_table('repayments') as batch_op:
+        batch_op.drop_constraint('uq_repayments_reverses_id', type_='unique')
+        batch_op.drop_constraint('fk_repayments_reverses_id', type_='foreignkey')
+        batch_op.drop_column('reverses_id')
+        batch_op.drop_column('entry_type')
+    with op.batch_alter_table('loans') as batch_op:
+        batch_op.drop_column('amount_paid')
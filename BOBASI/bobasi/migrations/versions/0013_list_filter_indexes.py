@@ -0,0 +1,44 @@
+"""Composite indexes for the filtered finance list pages
+
+Revision ID: 0013_list_filter_indexes
+Revises: 0012_loan_running_balances
+Create Date: 2026-10-17 18:20:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0013_list_filter_indexes'
+down_revision = '0012_loan_running_balances'
+branch_labels = None
+depends_on = None
+
+# Filter column first, then the keyset sort column: /finance/disbursements?method=…
+# and /finance/grants?status=… are index searches, not scans. ix_loans_status_amount
+# covers the grants count/sum, filtered or not, so the totals never read the table.
+INDEXES = {
+    'disbursements': {
+        'ix_disbursements_method_created': ['payment_method', 'created_at'],
+    },
+    'loans': {
+        'ix_loans_status_created': ['status', 'created_at'],
+        'ix_loans_status_amount': ['status', 'principal_amount'],
+    },
+}
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    for table, indexes in INDEXES.items():
+        existing = {i['name'] for i in inspector.get_indexes(table)}
+        for name, columns in indexes.items():
+            if name not in existing:
+                op.create_index(name, table, columns)
+
+
+def downgrade():
+    for table, indexes in INDEXES.items():
+        for name in indexes:
+            op.drop_index(name, table_name=table)
@@ -0,0 +1,44 @@
+"""FTS5 search index tables (SQLite)
+
+Revision ID: 0014_search_index
+Revises: 0013_list_filter_indexes
+Create Date: 2026-10-17 21:40:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0014_search_index'
+down_revision = '0013_list_filter_indexes'
+branch_labels = None
+depends_on = None
+
+# FTS table → (base table, indexed columns); mirrors services.search.INDEXES.
+# Other dialects search with LIKE and get no tables.
+INDEXES = {
+    'search_students': ('students', ('full_name', 'admission_number', 'institution')),
+    'search_applications': ('applications', ('application_number',)),
+    'search_disbursements': ('disbursements', ('reference_number',)),
+}
+
+
+def upgrade():
+    bind = op.get_bind()
+    if bind.dialect.name != 'sqlite':
+        return
+    existing = set(sa.inspect(bind).get_table_names())
+    for table, (source, columns) in INDEXES.items():
+        if table in existing:
+            continue
+        cols = ', '.join(columns)
+        op.execute(f"CREATE VIRTUAL TABLE {table} USING fts5({cols}, tokenize = 'unicode61', prefix = '2 3 4')")
+        op.execute(f"INSERT INTO {table} (rowid, {cols}) SELECT id, {cols} FROM {source}")
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    for table in INDEXES:
+        op.execute(f"DROP TABLE IF EXISTS {table}")
@@ -4,6 +4,9 @@ Bobasi NG-CDF Bursary System - Database Models
 
 from datetime import datetime, date
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.hybrid import hybrid_property
 from flask_login import UserMixin
 from werkzeug.security import generate_password_hash, check_password_hash
 
@@ -30,7 +33,9 @@ class User(UserMixin, db.Model):
     )
     email_verified = db.Column(db.Boolean, default=False)
     last_login = db.Column(db.DateTime, nullable=True)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Maintained by the Notification event hooks below; repair with `flask reconcile-unread-counts`
+    unread_notification_count = db.Column(db.Integer, default=0, server_default="0", nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     # Relationships
@@ -58,7 +63,7 @@ class User(UserMixin, db.Model):
 
     @property
     def unread_notifications(self):
-        return self.notifications.filter_by(is_read=False).count()
+        return self.unread_notification_count or 0
 
     def __repr__(self):
         return f"<User {self.email} [{self.role}]>"
@@ -71,7 +76,7 @@ class Student(db.Model):
     __tablename__ = "students"
 
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
     full_name = db.Column(db.String(150), nullable=False)
     admission_number = db.Column(db.String(50), unique=True)
     institution = db.Column(db.String(200))
@@ -86,11 +91,11 @@ class Student(db.Model):
     gender = db.Column(db.Enum("male", "female", "other"))
 
     # Location
-    sub_county = db.Column(db.String(100))
+    sub_county = db.Column(db.String(100), index=True)
     division = db.Column(db.String(100))
     location = db.Column(db.String(100))
     sub_location = db.Column(db.String(100))
-    ward = db.Column(db.String(100))
+    ward = db.Column(db.String(100), index=True)
     polling_station = db.Column(db.String(100))
     registered_voter = db.Column(db.String(5))
     postal_address = db.Column(db.String(200))
@@ -140,8 +145,8 @@ class Student(db.Model):
     chief_name = db.Column(db.String(150))
 
     profile_complete = db.Column(db.Boolean, default=False)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
 
     # Relationships
     applications = db.relationship("Application", backref="student", lazy="dynamic", cascade="all, delete-orphan")
@@ -162,6 +167,10 @@ class Student(db.Model):
 # ─────────────────────────────────────────────
 class Application(db.Model):
     __tablename__ = "applications"
+    __table_args__ = (
+        db.Index("idx_applications_student", "student_id"),
+        db.Index("idx_applications_status", "status"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     student_id = db.Column(db.Integer, db.ForeignKey("students.id", ondelete="CASCADE"), nullable=False)
@@ -185,14 +194,14 @@ class Application(db.Model):
     rejection_reason = db.Column(db.Text, nullable=True)
     committee_comments = db.Column(db.Text, nullable=True)
 
-    submitted_at = db.Column(db.DateTime, default=datetime.utcnow)
+    submitted_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     reviewed_at = db.Column(db.DateTime, nullable=True)
     approved_at = db.Column(db.DateTime, nullable=True)
     disbursed_at = db.Column(db.DateTime, nullable=True)
 
     reviewed_by = db.Column(db.String(100))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
 
     # Relationships
     documents = db.relationship("Document", backref="application", lazy="dynamic", cascade="all, delete-orphan")
@@ -218,6 +227,9 @@ class Application(db.Model):
 # ─────────────────────────────────────────────
 class Document(db.Model):
     __tablename__ = "documents"
+    __table_args__ = (
+        db.Index("idx_documents_application", "application_id"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     student_id = db.Column(db.Integer, db.ForeignKey("students.id", ondelete="CASCADE"), nullable=False)
@@ -227,13 +239,74 @@ class Document(db.Model):
     file_path = db.Column(db.String(500), nullable=False)
     file_size = db.Column(db.Integer)
     mime_type = db.Column(db.String(100))
+    stored_file_id = db.Column(db.Integer, db.ForeignKey("stored_files.id"), nullable=True, index=True)
     status = db.Column(db.Enum("pending", "verified", "rejected"), default="pending")
     uploaded_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    stored_file = db.relationship("StoredFile")
+
     def __repr__(self):
         return f"<Document {self.document_name}>"
 
 
+# ─────────────────────────────────────────────
+# DOCUMENT STORAGE MODELS
+# ─────────────────────────────────────────────
+class StoredFile(db.Model):
+    """One content-addressed blob in the document store, shared by every Document with the same bytes."""
+    __tablename__ = "stored_files"
+
+    id = db.Column(db.Integer, primary_key=True)
+    sha256 = db.Column(db.String(64), unique=True, nullable=False)
+    size = db.Column(db.BigInteger, nullable=False)
+    mime_type = db.Column(db.String(100))
+    storage_path = db.Column(db.String(255), nullable=False)  # relative to DOCUMENT_STORE
+    ref_count = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    last_referenced_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Thumbnail pipeline state (services/previews.py); the image itself lives in PREVIEW_CACHE
+    preview_status = db.Column(
+        db.Enum("pending", "rendering", "ready", "unavailable", "failed"),
+        nullable=False, default="pending"
+    )
+    preview_mime = db.Column(db.String(50))
+    preview_updated_at = db.Column(db.DateTime, nullable=True)
+
+    def __repr__(self):
+        return f"<StoredFile {self.sha256[:12]} refs={self.ref_count}>"
+
+
+class UploadSession(db.Model):
+    """A chunked upload in progress; bytes land in UPLOAD_TMP_FOLDER/<id>.part until complete."""
+    __tablename__ = "upload_sessions"
+
+    id = db.Column(db.String(32), primary_key=True)
+    student_id = db.Column(db.Integer, db.ForeignKey("students.id", ondelete="CASCADE"), nullable=False)
+    application_id = db.Column(db.Integer, db.ForeignKey("applications.id", ondelete="CASCADE"), nullable=False)
+    document_type = db.Column(db.String(50), nullable=False)
+    filename = db.Column(db.String(255), nullable=False)
+    mime_type = db.Column(db.String(100))
+    total_size = db.Column(db.BigInteger, nullable=False)
+    received_bytes = db.Column(db.BigInteger, nullable=False, default=0)
+    status = db.Column(db.Enum("uploading", "complete", "aborted"), default="uploading", nullable=False)
+    document_id = db.Column(db.Integer, db.ForeignKey("documents.id", ondelete="SET NULL"), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<UploadSession {self.id} {self.received_bytes}/{self.total_size}>"
+
+
+@event.listens_for(Document, "after_delete")
+def _release_stored_file(mapper, connection, target):
+    # Blobs are only unlinked by `flask gc-document-store`, once nothing references them
+    if target.stored_file_id is not None:
+        t = StoredFile.__table__
+        connection.execute(
+            t.update().where(t.c.id == target.stored_file_id).values(ref_count=t.c.ref_count - 1)
+        )
+
+
 # ─────────────────────────────────────────────
 # REVIEW MODEL
 # ─────────────────────────────────────────────
@@ -241,7 +314,8 @@ class Review(db.Model):
     __tablename__ = "reviews"
 
     id = db.Column(db.Integer, primary_key=True)
-    application_id = db.Column(db.Integer, db.ForeignKey("applications.id", ondelete="CASCADE"), nullable=False)
+    application_id = db.Column(db.Integer, db.ForeignKey("applications.id", ondelete="CASCADE"), nullable=False,
+                               index=True)
     reviewer_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
     decision = db.Column(
         db.Enum("recommend_approval", "recommend_rejection", "need_more_info"),
@@ -260,11 +334,15 @@ class Review(db.Model):
 # ─────────────────────────────────────────────
 class Disbursement(db.Model):
     __tablename__ = "disbursements"
+    __table_args__ = (
+        db.Index("ix_disbursements_method_created", "payment_method", "created_at"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
-    application_id = db.Column(db.Integer, db.ForeignKey("applications.id"), nullable=False)
-    student_id = db.Column(db.Integer, db.ForeignKey("students.id"), nullable=False)
+    application_id = db.Column(db.Integer, db.ForeignKey("applications.id"), nullable=False, index=True)
+    student_id = db.Column(db.Integer, db.ForeignKey("students.id"), nullable=False, index=True)
     finance_officer_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
+    run_id = db.Column(db.Integer, db.ForeignKey("disbursement_runs.id"), nullable=True, index=True)
     amount = db.Column(db.Float, nullable=False)
     disbursement_date = db.Column(db.DateTime, default=datetime.utcnow)
     payment_method = db.Column(
@@ -276,7 +354,7 @@ class Disbursement(db.Model):
     reference_number = db.Column(db.String(100), unique=True)
     status = db.Column(db.Enum("pending", "processed", "failed"), default="processed")
     notes = db.Column(db.Text)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
 
     finance_officer = db.relationship("User", foreign_keys=[finance_officer_id])
 
@@ -284,32 +362,242 @@ class Disbursement(db.Model):
         return f"<Disbursement KShs.{self.amount} → App#{self.application_id}>"
 
 
+# ─────────────────────────────────────────────
+# DISBURSEMENT RUN MODEL
+# ─────────────────────────────────────────────
+class DisbursementRun(db.Model):
+    """A batch disbursement over approved applications matching a filter."""
+    __tablename__ = "disbursement_runs"
+
+    id = db.Column(db.Integer, primary_key=True)
+    reference_number = db.Column(db.String(100), unique=True, nullable=False)
+    finance_officer_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
+    payment_method = db.Column(db.Enum("bank_transfer", "mpesa", "cheque", "cash"), nullable=False)
+    filters_json = db.Column(db.Text)
+    notes = db.Column(db.Text)
+    status = db.Column(db.Enum("pending", "running", "completed", "failed"), default="pending", nullable=False)
+    total_selected = db.Column(db.Integer, default=0)
+    processed_count = db.Column(db.Integer, default=0)
+    processed_amount = db.Column(db.Float, default=0)
+    last_application_id = db.Column(db.Integer, default=0)  # resume point (applications are taken in id order)
+    error = db.Column(db.Text, nullable=True)
+    started_at = db.Column(db.DateTime, nullable=True)
+    completed_at = db.Column(db.DateTime, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    finance_officer = db.relationship("User", foreign_keys=[finance_officer_id])
+    disbursements = db.relationship("Disbursement", backref="run", lazy="dynamic")
+
+    def get_filters(self):
+        import json
+        if self.filters_json:
+            try:
+                return json.loads(self.filters_json)
+            except Exception:
+                return {}
+        return {}
+
+    def __repr__(self):
+        return f"<DisbursementRun {self.reference_number} [{self.status}]>"
+
+
+def financial_year_for(dt):
+    """Kenyan government financial year (July–June) for a date, e.g. '2025/2026'."""
+    if dt.month >= 7:
+        return f"{dt.year}/{dt.year + 1}"
+    return f"{dt.year - 1}/{dt.year}"
+
+
+# ─────────────────────────────────────────────
+# DISBURSEMENT ROLLUP MODEL
+# ─────────────────────────────────────────────
+class DisbursementRollup(db.Model):
+    """Monthly disbursement totals, maintained on every Disbursement insert."""
+    __tablename__ = "disbursement_rollups"
+    __table_args__ = (
+        db.UniqueConstraint("financial_year", "month", "payment_method", "ward",
+                            name="uq_disbursement_rollup_bucket"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    financial_year = db.Column(db.String(9), nullable=False, index=True)
+    month = db.Column(db.Integer, nullable=False)
+    payment_method = db.Column(db.String(20), nullable=False)
+    ward = db.Column(db.String(100), nullable=False, default="")
+    total_amount = db.Column(db.Float, nullable=False, default=0)
+    disbursement_count = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    @staticmethod
+    def apply(connection, when, payment_method, ward, amount, count=1):
+        """Add a disbursement to its bucket using the caller's connection/transaction."""
+        t = DisbursementRollup.__table__
+        key = dict(
+            financial_year=financial_year_for(when),
+            month=when.month,
+            payment_method=payment_method or "",
+            ward=ward or "",
+        )
+        for _ in range(2):
+            result = connection.execute(
+                t.update()
+                .where(*(t.c[k] == v for k, v in key.items()))
+                .values(
+                    total_amount=t.c.total_amount + amount,
+                    disbursement_count=t.c.disbursement_count + count,
+                    updated_at=datetime.utcnow(),
+                )
+            )
+            if result.rowcount:
+                return
+            try:
+                with connection.begin_nested():
+                    connection.execute(t.insert().values(
+                        total_amount=amount, disbursement_count=count,
+                        updated_at=datetime.utcnow(), **key
+                    ))
+                return
+            except IntegrityError:
+                continue  # another transaction created the bucket first — add to it instead
+
+    def __repr__(self):
+        return f"<DisbursementRollup {self.financial_year}-{self.month:02d} {self.payment_method} KShs.{self.total_amount}>"
+
+
+@event.listens_for(Disbursement, "after_insert")
+def _rollup_disbursement(mapper, connection, target):
+    ward = connection.execute(
+        db.select(Student.ward).where(Student.id == target.student_id)
+    ).scalar()
+    DisbursementRollup.apply(
+        connection,
+        target.disbursement_date or target.created_at or datetime.utcnow(),
+        target.payment_method,
+        ward,
+        target.amount or 0,
+    )
+
+
+# ─────────────────────────────────────────────
+# REPORTING CUBE
+# ─────────────────────────────────────────────
+REPORT_CUBE_KEY = ("academic_year", "sub_county", "ward", "location", "institution", "status", "level_of_study")
+
+
+class ReportCube(db.Model):
+    """Application and disbursement totals per reporting bucket, refreshed incrementally (services/report_cube.py)."""
+    __tablename__ = "report_cube"
+    __table_args__ = (
+        db.UniqueConstraint(*REPORT_CUBE_KEY, name="uq_report_cube_bucket"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    # Key columns use "" for "not specified" so the unique constraint covers them
+    academic_year = db.Column(db.String(10), nullable=False, default="")
+    sub_county = db.Column(db.String(100), nullable=False, default="")
+    ward = db.Column(db.String(100), nullable=False, default="")
+    location = db.Column(db.String(100), nullable=False, default="")
+    institution = db.Column(db.String(200), nullable=False, default="")
+    status = db.Column(db.String(20), nullable=False, default="")
+    level_of_study = db.Column(db.String(100), nullable=False, default="")
+    application_count = db.Column(db.Integer, nullable=False, default=0)
+    requested_amount = db.Column(db.Float, nullable=False, default=0)
+    approved_amount = db.Column(db.Float, nullable=False, default=0)
+    disbursed_amount = db.Column(db.Float, nullable=False, default=0)
+    disbursement_count = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<ReportCube {self.academic_year} {self.sub_county}/{self.ward} {self.status} x{self.application_count}>"
+
+
+class ReportCubeMember(db.Model):
+    """What each application currently contributes to the cube, so a refresh can subtract it exactly."""
+    __tablename__ = "report_cube_members"
+
+    application_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    cube_id = db.Column(db.Integer, db.ForeignKey("report_cube.id"), nullable=False, index=True)
+    requested_amount = db.Column(db.Float, nullable=False, default=0)
+    approved_amount = db.Column(db.Float, nullable=False, default=0)
+    disbursed_amount = db.Column(db.Float, nullable=False, default=0)
+    disbursement_count = db.Column(db.Integer, nullable=False, default=0)
+
+
+class ReportCubeState(db.Model):
+    """Single row: how far the cube has been refreshed."""
+    __tablename__ = "report_cube_state"
+
+    id = db.Column(db.Integer, primary_key=True)
+    watermark = db.Column(db.DateTime, nullable=True)  # changes up to here are in the cube
+    refreshed_at = db.Column(db.DateTime, nullable=True)
+    locked_until = db.Column(db.DateTime, nullable=True)  # one refresh at a time, across processes
+
+
 # ─────────────────────────────────────────────
 # LOAN MODEL
 # ─────────────────────────────────────────────
 class Loan(db.Model):
     __tablename__ = "loans"
+    __table_args__ = (
+        db.Index("idx_loans_student", "student_id"),
+        db.Index("ix_loans_status_created", "status", "created_at"),
+        db.Index("ix_loans_status_amount", "status", "principal_amount"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
-    application_id = db.Column(db.Integer, db.ForeignKey("applications.id"), nullable=False)
+    application_id = db.Column(db.Integer, db.ForeignKey("applications.id"), nullable=False, index=True)
     student_id = db.Column(db.Integer, db.ForeignKey("students.id"), nullable=False)
     principal_amount = db.Column(db.Float, nullable=False)
     interest_rate = db.Column(db.Float, default=0.0)
     repayment_period_months = db.Column(db.Integer, default=24)
     monthly_installment = db.Column(db.Float)
     total_payable = db.Column(db.Float)
+    # Running totals of the repayments ledger, moved by the Repayment hooks below;
+    # verify/repair with `flask check-loan-balances`
+    amount_paid = db.Column(db.Float, nullable=False, default=0, server_default="0")
     balance_remaining = db.Column(db.Float)
     start_date = db.Column(db.String(20))
     due_date = db.Column(db.String(20))
     status = db.Column(db.Enum("active", "completed", "defaulted", "waived"), default="active")
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     repayments = db.relationship("Repayment", backref="loan", lazy="dynamic", cascade="all, delete-orphan")
 
-    @property
+    @hybrid_property
     def total_paid(self):
-        return sum(r.amount for r in self.repayments)
+        """The maintained running total; in SQL (Loan.total_paid) the sum of the ledger itself."""
+        return self.amount_paid or 0
+
+    @total_paid.expression
+    def total_paid(cls):
+        return (
+            db.select(db.func.coalesce(db.func.sum(Repayment.amount), 0))
+            .where(Repayment.loan_id == cls.id)
+            .scalar_subquery()
+        )
+
+    @staticmethod
+    def balance_for(columns, paid):
+        """Balance owed once `paid` has been repaid; grants (no repayment period) owe nothing."""
+        return db.case(
+            (columns.repayment_period_months == 0, 0.0),
+            else_=db.func.coalesce(columns.total_payable, columns.principal_amount) - paid,
+        )
+
+    @staticmethod
+    def apply_payment(connection, loan_id, amount):
+        """Move a loan's running totals by a ledger amount (negative for reversals) in one UPDATE."""
+        t = Loan.__table__
+        # balance_remaining is assigned first: MySQL evaluates SET left to right, so it must
+        # still read the old amount_paid (standard SQL reads old values regardless)
+        connection.execute(
+            t.update().where(t.c.id == loan_id).ordered_values(
+                (t.c.balance_remaining, Loan.balance_for(t.c, t.c.amount_paid + amount)),
+                (t.c.amount_paid, t.c.amount_paid + amount),
+                (t.c.updated_at, datetime.utcnow()),
+            )
+        )
 
     def __repr__(self):
         return f"<Loan {self.id} KShs.{self.principal_amount}>"
@@ -319,16 +607,28 @@ class Loan(db.Model):
 # REPAYMENT MODEL
 # ─────────────────────────────────────────────
 class Repayment(db.Model):
+    """
+    One ledger entry against a loan. Entries are append-only: a payment is
+    undone by a reversal entry (the negated amount, pointing at it) and
+    corrected by an adjustment entry (any signed amount).
+    """
     __tablename__ = "repayments"
+    __table_args__ = (
+        db.Index("idx_repayments_loan", "loan_id"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     loan_id = db.Column(db.Integer, db.ForeignKey("loans.id"), nullable=False)
     student_id = db.Column(db.Integer, db.ForeignKey("students.id"), nullable=False)
     amount = db.Column(db.Float, nullable=False)
+    entry_type = db.Column(db.Enum("payment", "reversal", "adjustment"), nullable=False, default="payment",
+                           server_default="payment")
+    # Unique: a payment can be reversed at most once
+    reverses_id = db.Column(db.Integer, db.ForeignKey("repayments.id"), nullable=True, unique=True)
     payment_date = db.Column(db.DateTime, default=datetime.utcnow)
-    payment_method = db.Column(db.Enum("bank_transfer", "mpesa", "cheque", "cash"), nullable=False)
+    payment_method = db.Column(db.Enum("bank_transfer", "mpesa", "cheque", "cash"), nullable=True)
     reference_number = db.Column(db.String(100))
-    balance_remaining = db.Column(db.Float)
+    balance_remaining = db.Column(db.Float)  # the loan's balance right after this entry
     recorded_by = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=True)
     notes = db.Column(db.Text)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -337,7 +637,40 @@ class Repayment(db.Model):
     student = db.relationship("Student", foreign_keys=[student_id])
 
     def __repr__(self):
-        return f"<Repayment KShs.{self.amount} on Loan#{self.loan_id}>"
+        return f"<Repayment {self.entry_type} KShs.{self.amount} on Loan#{self.loan_id}>"
+
+
+def _record_balance(connection, repayment_id, loan_id):
+    loans, repayments = Loan.__table__, Repayment.__table__
+    connection.execute(
+        repayments.update().where(repayments.c.id == repayment_id).values(
+            balance_remaining=db.select(loans.c.balance_remaining).where(loans.c.id == loan_id).scalar_subquery()
+        )
+    )
+
+
+@event.listens_for(Repayment, "after_insert")
+def _repayment_created(mapper, connection, target):
+    Loan.apply_payment(connection, target.loan_id, target.amount or 0)
+    _record_balance(connection, target.id, target.loan_id)
+
+
+@event.listens_for(Repayment, "after_update")
+def _repayment_updated(mapper, connection, target):
+    amount = db.inspect(target).attrs.amount.history
+    loan = db.inspect(target).attrs.loan_id.history
+    if not amount.has_changes() and not loan.has_changes():
+        return
+    old_amount = amount.deleted[0] if amount.deleted else target.amount
+    old_loan = loan.deleted[0] if loan.deleted else target.loan_id
+    Loan.apply_payment(connection, old_loan, -(old_amount or 0))
+    Loan.apply_payment(connection, target.loan_id, target.amount or 0)
+    _record_balance(connection, target.id, target.loan_id)
+
+
+@event.listens_for(Repayment, "after_delete")
+def _repayment_deleted(mapper, connection, target):
+    Loan.apply_payment(connection, target.loan_id, -(target.amount or 0))
 
 
 # ─────────────────────────────────────────────
@@ -345,6 +678,10 @@ class Repayment(db.Model):
 # ─────────────────────────────────────────────
 class Notification(db.Model):
     __tablename__ = "notifications"
+    __table_args__ = (
+        db.Index("ix_notifications_user_unread_created", "user_id", "is_read", "created_at"),
+        db.Index("ix_notifications_user_created", "user_id", "created_at"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
@@ -361,6 +698,101 @@ class Notification(db.Model):
         return f"<Notification '{self.title}' → User#{self.user_id}>"
 
 
+# ─────────────────────────────────────────────
+# NUMBER SEQUENCE MODEL
+# ─────────────────────────────────────────────
+class NumberSequence(db.Model):
+    """Named counters handed out by services.sequences (e.g. 'application:2026')."""
+    __tablename__ = "number_sequences"
+
+    name = db.Column(db.String(50), primary_key=True)
+    next_value = db.Column(db.BigInteger, nullable=False, default=1)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<NumberSequence {self.name} next={self.next_value}>"
+
+
+# ─────────────────────────────────────────────
+# NOTIFICATION OUTBOX MODEL
+# ─────────────────────────────────────────────
+class NotificationOutbox(db.Model):
+    """
+    Notification fan-out requests, written in the same transaction as the
+    business change and expanded into Notification rows by services.outbox.
+    """
+    __tablename__ = "notification_outbox"
+    __table_args__ = (
+        db.Index("ix_notification_outbox_status_available", "status", "available_at"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    recipient_user_id = db.Column(db.Integer, db.ForeignKey("users.id", ondelete="CASCADE"), nullable=True)
+    recipient_roles = db.Column(db.String(100), nullable=True)  # comma-separated roles
+    title = db.Column(db.String(200), nullable=False)
+    message = db.Column(db.Text, nullable=False)
+    type = db.Column(
+        db.Enum("application", "disbursement", "repayment", "review", "system"),
+        default="system"
+    )
+    status = db.Column(db.Enum("pending", "done", "failed"), default="pending", nullable=False)
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    last_error = db.Column(db.Text, nullable=True)
+    available_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    processed_at = db.Column(db.DateTime, nullable=True)
+
+    def __repr__(self):
+        return f"<NotificationOutbox #{self.id} '{self.title}' [{self.status}]>"
+
+
+def _bump_unread(connection, user_id, delta):
+    users = User.__table__
+    connection.execute(
+        users.update()
+        .where(users.c.id == user_id)
+        .values(unread_notification_count=users.c.unread_notification_count + delta,
+                updated_at=users.c.updated_at)
+    )
+
+
+@event.listens_for(Notification, "after_insert")
+def _notification_created(mapper, connection, target):
+    if not target.is_read:
+        _bump_unread(connection, target.user_id, 1)
+
+
+@event.listens_for(Notification, "after_update")
+def _notification_updated(mapper, connection, target):
+    history = db.inspect(target).attrs.is_read.history
+    if not history.has_changes():
+        return
+    was_read = bool(history.deleted[0]) if history.deleted else False
+    if was_read != bool(target.is_read):
+        _bump_unread(connection, target.user_id, -1 if target.is_read else 1)
+
+
+@event.listens_for(Notification, "after_delete")
+def _notification_deleted(mapper, connection, target):
+    if not target.is_read:
+        _bump_unread(connection, target.user_id, -1)
+
+
+def reconcile_unread_counts():
+    """Recompute every user's unread counter from the notifications table."""
+    unread = db.select(db.func.count(Notification.id)).where(
+        Notification.user_id == User.id, Notification.is_read.is_(False)
+    ).scalar_subquery()
+    result = db.session.execute(
+        db.update(User)
+        .where(User.unread_notification_count != unread)
+        .values(unread_notification_count=unread)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    return result.rowcount
+
+
 # ─────────────────────────────────────────────
 # SEED FUNCTION
 # ─────────────────────────────────────────────
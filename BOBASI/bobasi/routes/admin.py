@@ -1,11 +1,24 @@
 """
 Bobasi BBS - Admin Routes
 """
+import hmac
 from datetime import datetime
 from functools import wraps
-from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify
+from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify, current_app, Response
 from flask_login import login_required, current_user
 from models.models import db, User, Student, Application, Review, Disbursement, Loan, Notification
+from services.stats import admin_dashboard_stats, invalidate_stats, listing_totals
+from services.reporting import reporting_session
+from services.report_cube import refreshed_at, year_totals, breakdown, compare, DRILL_LEVELS
+from services.pagination import keyset_paginate
+from services.search import filter_applications, filter_students
+from services.loaders import with_profile
+from services.metrics import registry
+from services.notifications import mark_notifications_read as mark_read, recent_unread
+from services.outbox import enqueue_notification
+from services.exports import export_response, APPLICATION_COLUMNS, STUDENT_COLUMNS, application_rows, student_rows
+from services.identity import invalidate_user
+from services.transitions import TRANSITIONS, status_message, select_applications, bulk_transition
 
 admin_bp = Blueprint("admin", __name__)
 
@@ -34,21 +47,10 @@ def super_admin_required(f):
 @login_required
 @admin_required
 def dashboard():
-    stats = {
-        "total_students": Student.query.count(),
-        "total_apps": Application.query.count(),
-        "pending": Application.query.filter_by(status="pending").count(),
-        "under_review": Application.query.filter_by(status="under_review").count(),
-        "approved": Application.query.filter_by(status="approved").count(),
-        "rejected": Application.query.filter_by(status="rejected").count(),
-        "disbursed": Application.query.filter_by(status="disbursed").count(),
-        "total_disbursed": db.session.query(db.func.sum(Disbursement.amount)).scalar() or 0,
-        "total_loans": Loan.query.count(),
-        "active_loans": Loan.query.filter_by(status="active").count(),
-        "total_disbursed_count": Disbursement.query.count(),
-    }
-    recent_apps = Application.query.order_by(Application.submitted_at.desc()).limit(8).all()
-    notifications = current_user.notifications.filter_by(is_read=False).limit(5).all()
+    stats = admin_dashboard_stats()
+    recent_apps = with_profile(Application.query, "application_list").order_by(
+        Application.submitted_at.desc()).limit(8).all()
+    notifications = recent_unread(current_user)
     return render_template("admin/dashboard.html", stats=stats, recent_apps=recent_apps, notifications=notifications)
 
 
@@ -62,15 +64,26 @@ def applications():
     if status:
         query = query.filter_by(status=status)
     if search:
-        query = query.join(Student).filter(
-            db.or_(
-                Application.application_number.ilike(f"%{search}%"),
-                Student.full_name.ilike(f"%{search}%"),
-                Student.institution.ilike(f"%{search}%"),
-            )
-        )
-    apps = query.order_by(Application.submitted_at.desc()).all()
-    return render_template("admin/applications.html", applications=apps, status=status, search=search)
+        query = filter_applications(query, search)
+    total = listing_totals(("applications", status, search), query.order_by(None).count)
+    apps = keyset_paginate(with_profile(query, "application_list"), Application.submitted_at, Application.id)
+    return render_template("admin/applications.html", applications=apps, total=total, status=status, search=search)
+
+
+@admin_bp.route("/applications/export")
+@login_required
+@admin_required
+def export_applications():
+    """Stream every application matching the list filters as CSV or XLSX (?format=xlsx)."""
+    status = request.args.get("status", "")
+    search = request.args.get("search", "").lower()
+    query = Application.query
+    if status:
+        query = query.filter_by(status=status)
+    if search:
+        query = filter_applications(query, search)
+    return export_response(request.args.get("format", "csv"), "applications",
+                           APPLICATION_COLUMNS, application_rows(query))
 
 
 @admin_bp.route("/application/<int:app_id>")
@@ -78,7 +91,7 @@ def applications():
 @admin_required
 def view_application(app_id):
     app_obj = Application.query.get_or_404(app_id)
-    reviews = app_obj.reviews.all()
+    reviews = with_profile(app_obj.reviews, "review_list").all()
     return render_template("admin/view_application.html", application=app_obj, reviews=reviews)
 
 
@@ -110,30 +123,64 @@ def update_status(app_id):
     elif new_status == "rejected":
         app_obj.rejection_reason = reason
 
-    db.session.commit()
-
     # Notify student
-    student_user = app_obj.student.user
-    msg_map = {
-        "approved": f"Congratulations! Your application {app_obj.application_number} has been APPROVED for KShs. {app_obj.approved_amount:,.0f}.",
-        "rejected": f"Your application {app_obj.application_number} was not approved. Reason: {reason}",
-        "under_review": f"Your application {app_obj.application_number} is now under review by the committee.",
-        "disbursed": f"Funds for application {app_obj.application_number} have been disbursed. Check your account.",
-    }
-    if new_status in msg_map:
-        notif = Notification(
-            user_id=student_user.id,
+    message = status_message(new_status, app_obj.application_number, app_obj.approved_amount, reason)
+    if message:
+        enqueue_notification(
             title=f"Application {new_status.replace('_', ' ').title()}",
-            message=msg_map[new_status],
+            message=message,
             type="application",
+            user_id=app_obj.student.user_id,
         )
-        db.session.add(notif)
-        db.session.commit()
+    db.session.commit()
+    invalidate_stats()
 
     flash(f"Application status updated to '{new_status}'.", "success")
     return redirect(url_for("admin.view_application", app_id=app_id))
 
 
+@admin_bp.route("/applications/bulk-status", methods=["POST"])
+@login_required
+@admin_required
+def bulk_update_status():
+    """Apply one status change to the ticked applications, or to every application matching the list filter."""
+    new_status = request.form.get("status")
+    amount = request.form.get("approved_amount", "").strip()
+    reason = request.form.get("rejection_reason", "")
+    comments = request.form.get("committee_comments", "")
+    filter_status = request.form.get("filter_status", "")
+    filter_search = request.form.get("filter_search", "").lower()
+    back = url_for("admin.applications", status=filter_status or None, search=filter_search or None)
+
+    if new_status not in TRANSITIONS:
+        flash("Choose a valid status for the bulk update.", "danger")
+        return redirect(back)
+    if request.form.get("scope") == "filter":
+        query = select_applications(status=filter_status, search=filter_search)
+    else:
+        ids = request.form.getlist("ids", type=int)
+        if not ids:
+            flash("Select at least one application.", "warning")
+            return redirect(back)
+        query = select_applications(ids=ids)
+    try:
+        approved_amount = float(amount) if amount else None
+        if approved_amount is not None and approved_amount <= 0:
+            raise ValueError
+    except ValueError:
+        flash("Approved amount must be a number greater than zero.", "danger")
+        return redirect(back)
+
+    result = bulk_transition(query, new_status, current_user.name, approved_amount, reason, comments)
+    invalidate_stats()
+    flash(f"{result['updated']} application(s) moved to '{new_status}'.", "success")
+    if result["skipped"]:
+        sample = ", ".join(f"{s['application_number']} ({s['reason']})" for s in result["skipped"][:5])
+        more = f" and {len(result['skipped']) - 5} more" if len(result["skipped"]) > 5 else ""
+        flash(f"{len(result['skipped'])} skipped: {sample}{more}.", "warning")
+    return redirect(back)
+
+
 @admin_bp.route("/application/<int:app_id>/review", methods=["POST"])
 @login_required
 @admin_required
@@ -158,6 +205,7 @@ def add_review(app_id):
     if app_obj.status == "pending":
         app_obj.status = "under_review"
     db.session.commit()
+    invalidate_stats()
     flash("Review submitted.", "success")
     return redirect(url_for("admin.view_application", app_id=app_id))
 
@@ -169,15 +217,25 @@ def students():
     search = request.args.get("search", "").lower()
     query = Student.query
     if search:
-        query = query.filter(
-            db.or_(
-                Student.full_name.ilike(f"%{search}%"),
-                Student.admission_number.ilike(f"%{search}%"),
-                Student.institution.ilike(f"%{search}%"),
-            )
-        )
-    students_list = query.order_by(Student.created_at.desc()).all()
-    return render_template("admin/students.html", students=students_list, search=search)
+        query = filter_students(query, search)
+    total = listing_totals(("students", search), query.order_by(None).count)
+    students_list = keyset_paginate(query, Student.created_at, Student.id)
+    app_counts = dict(db.session.query(Application.student_id, db.func.count(Application.id)).filter(
+        Application.student_id.in_([s.id for s in students_list])
+    ).group_by(Application.student_id).all()) if students_list else {}
+    return render_template("admin/students.html", students=students_list, total=total, search=search,
+                           app_counts=app_counts)
+
+
+@admin_bp.route("/students/export")
+@login_required
+@admin_required
+def export_students():
+    search = request.args.get("search", "").lower()
+    query = Student.query
+    if search:
+        query = filter_students(query, search)
+    return export_response(request.args.get("format", "csv"), "students", STUDENT_COLUMNS, student_rows(query))
 
 
 @admin_bp.route("/students/<int:student_id>")
@@ -192,7 +250,7 @@ def view_student(student_id):
 @login_required
 @super_admin_required
 def users():
-    users_list = User.query.order_by(User.created_at.desc()).all()
+    users_list = keyset_paginate(User.query, User.created_at, User.id)
     return render_template("admin/users.html", users=users_list)
 
 
@@ -206,6 +264,7 @@ def toggle_user_status(user_id):
         return redirect(url_for("admin.users"))
     user.status = "suspended" if user.status == "active" else "active"
     db.session.commit()
+    invalidate_user(user.id, broadcast=True)
     flash(f"User {user.name} is now {user.status}.", "success")
     return redirect(url_for("admin.users"))
 
@@ -236,41 +295,60 @@ def add_user():
 @login_required
 @admin_required
 def reports():
-    # By sub-county
-    sc_data = db.session.query(
-        Student.sub_county,
-        db.func.count(Application.id),
-        db.func.sum(Application.approved_amount)
-    ).join(Application, Application.student_id == Student.id, isouter=True
-    ).group_by(Student.sub_county).all()
-
-    # By status
-    status_data = db.session.query(
-        Application.status,
-        db.func.count(Application.id)
-    ).group_by(Application.status).all()
-
-    # By institution
-    inst_data = db.session.query(
-        Application.institution,
-        db.func.count(Application.id),
-        db.func.sum(Application.approved_amount)
-    ).group_by(Application.institution).order_by(db.func.count(Application.id).desc()).limit(10).all()
-
-    total_disbursed = db.session.query(db.func.sum(Disbursement.amount)).scalar() or 0
-
+    """Aggregates from the reporting cube: status, geography (drill-down) and institutions, year on year.
+
+    Read-only: the cube is refreshed by a background worker or cron (services.report_cube).
+    """
+    session = reporting_session()
+    totals = year_totals(session)
+    years = [y for y, _ in totals]
+    year = request.args.get("year") or (years[0] if years else current_app.config["FINANCIAL_YEAR"])
+    compare_year = request.args.get("compare")
+    if compare_year is None:
+        compare_year = next((y for y in years if y < year), "")
+
+    # Drill-down: sub_county → ward → location ("" is the "Not Specified" bucket)
+    drill = {}
+    for level in DRILL_LEVELS[:-1]:
+        if level not in request.args:
+            break
+        drill[level] = request.args[level]
+    level = DRILL_LEVELS[len(drill)]
+
+    def year_on_year(column, **kwargs):
+        current = breakdown(session, column, year, **kwargs)
+        previous = breakdown(session, column, compare_year, kwargs.get("filters")) if compare_year else []
+        return compare(current, previous)
+
+    status_data = breakdown(session, "status", year)
     return render_template("admin/reports.html",
-        sc_data=sc_data,
+        years=years,
+        year=year,
+        compare_year=compare_year,
         status_data=status_data,
-        inst_data=inst_data,
-        total_disbursed=total_disbursed,
+        total_disbursed=sum(row[4] or 0 for row in status_data),
+        all_time_disbursed=sum(amount or 0 for _, amount in totals),
+        refreshed_at=refreshed_at(session),
+        drill=drill,
+        level=level,
+        geo_data=year_on_year(level, filters=drill),
+        inst_data=year_on_year("institution", order_by_count=True, limit=10),
     )
 
 
 @admin_bp.route("/notifications/mark-read", methods=["POST"])
 @login_required
 def mark_notifications_read():
-    for n in current_user.notifications.filter_by(is_read=False).all():
-        n.is_read = True
-    db.session.commit()
+    mark_read(current_user.id, request.form.get("up_to", type=int))
     return redirect(request.referrer or url_for("admin.dashboard"))
+
+
+@admin_bp.route("/metrics")
+def metrics():
+    """Prometheus text metrics. Admin session or `Authorization: Bearer <METRICS_TOKEN>`."""
+    token = current_app.config.get("METRICS_TOKEN")
+    supplied = request.headers.get("Authorization", "")
+    authorized = bool(token) and hmac.compare_digest(supplied.encode(), f"Bearer {token}".encode())
+    if not authorized and not (current_user.is_authenticated and current_user.role == "admin"):
+        return Response("Forbidden\n", status=403, mimetype="text/plain")
+    return Response(registry.render(), mimetype="text/plain; version=0.0.4")
@@ -4,6 +4,10 @@ Bobasi BBS - API Routes (JSON)
 from flask import Blueprint, jsonify, request
 from flask_login import login_required, current_user
 from models.models import db, Application, Student, Disbursement, Loan, Repayment, Notification
+from services.stats import cached_api_stats, invalidate_stats
+from services.search import ranked_ids, filter_students, filter_applications, filter_disbursements
+from services.notifications import mark_notifications_read
+from services.transitions import TRANSITIONS, select_applications, bulk_transition
 from datetime import datetime
 
 api_bp = Blueprint("api", __name__)
@@ -15,33 +19,92 @@ def stats():
     if current_user.role not in ("admin", "finance_officer", "review_committee"):
         return jsonify({"error": "Unauthorized"}), 403
 
-    monthly = [0] * 12
-    for app in Application.query.all():
-        try:
-            dt = datetime.fromisoformat(str(app.submitted_at))
-            if dt.year == datetime.now().year:
-                monthly[dt.month - 1] += 1
-        except Exception:
-            pass
+    entry = cached_api_stats()
+    resp = jsonify(entry["payload"])
+    resp.set_etag(entry["etag"])
+    resp.last_modified = entry["last_modified"]
+    resp.cache_control.private = True
+    resp.cache_control.no_cache = True
+    return resp.make_conditional(request)
 
-    return jsonify({
-        "total_apps": Application.query.count(),
-        "pending": Application.query.filter_by(status="pending").count(),
-        "approved": Application.query.filter_by(status="approved").count(),
-        "rejected": Application.query.filter_by(status="rejected").count(),
-        "disbursed": Application.query.filter_by(status="disbursed").count(),
-        "total_disbursed": db.session.query(db.func.sum(Disbursement.amount)).scalar() or 0,
-        "monthly_applications": monthly,
-    })
+
+@api_bp.route("/search")
+@login_required
+def search():
+    """Typeahead search: /api/search?q=jane&type=students (students are ranked by relevance)"""
+    if current_user.role not in ("admin", "finance_officer", "review_committee"):
+        return jsonify({"error": "Unauthorized"}), 403
+
+    term = request.args.get("q", "").strip()
+    kind = request.args.get("type", "students")
+    limit = min(request.args.get("limit", 20, type=int), 100)
+    if kind not in ("students", "applications", "disbursements"):
+        return jsonify({"error": "Unknown search type"}), 400
+    if not term:
+        return jsonify({"results": []})
+
+    if kind == "students":
+        ids = ranked_ids("search_students", term, limit)
+        if ids is None:
+            students = filter_students(Student.query, term).limit(limit).all()
+        else:
+            by_id = {s.id: s for s in Student.query.filter(Student.id.in_(ids))}
+            students = [by_id[i] for i in ids if i in by_id]
+        results = [{"id": s.id, "full_name": s.full_name, "admission_number": s.admission_number,
+                    "institution": s.institution} for s in students]
+    elif kind == "applications":
+        apps = filter_applications(Application.query, term).order_by(
+            Application.submitted_at.desc()).limit(limit).all()
+        results = [{"id": a.id, "application_number": a.application_number, "status": a.status} for a in apps]
+    else:
+        disbs = filter_disbursements(Disbursement.query, term).order_by(
+            Disbursement.created_at.desc()).limit(limit).all()
+        results = [{"id": d.id, "reference_number": d.reference_number, "amount": d.amount} for d in disbs]
+
+    return jsonify({"results": results})
 
 
 @api_bp.route("/notifications/mark-read", methods=["POST"])
 @login_required
 def mark_notifications():
-    for n in current_user.notifications.filter_by(is_read=False).all():
-        n.is_read = True
-    db.session.commit()
-    return jsonify({"status": "ok"})
+    """Mark all unread notifications read, or only those up to `up_to` (JSON body or form)."""
+    data = request.get_json(silent=True) or request.form
+    try:
+        up_to = int(data["up_to"]) if data.get("up_to") not in (None, "") else None
+    except (TypeError, ValueError):
+        return jsonify({"error": "up_to must be a notification id"}), 400
+    marked = mark_notifications_read(current_user.id, up_to)
+    return jsonify({"status": "ok", "marked": marked})
+
+
+@api_bp.route("/applications/bulk-status", methods=["POST"])
+@login_required
+def bulk_status():
+    """Bulk transition: {"status": "approved", "ids": [..]} or {"status": ..., "filter": {"status": .., "search": ..}}"""
+    if current_user.role not in ("admin", "review_committee"):
+        return jsonify({"error": "Unauthorized"}), 403
+
+    data = request.get_json(silent=True) or {}
+    new_status = data.get("status")
+    if new_status not in TRANSITIONS:
+        return jsonify({"error": f"status must be one of: {', '.join(TRANSITIONS)}"}), 400
+    ids, filters = data.get("ids"), data.get("filter") or {}
+    if ids:
+        if not isinstance(ids, list) or not all(isinstance(i, int) for i in ids):
+            return jsonify({"error": "ids must be a list of application ids"}), 400
+        query = select_applications(ids=ids)
+    elif filters.get("status") or filters.get("search"):
+        query = select_applications(status=filters.get("status", ""), search=str(filters.get("search", "")).lower())
+    else:
+        return jsonify({"error": "Provide ids or a filter"}), 400
+    amount = data.get("approved_amount")
+    if amount is not None and (not isinstance(amount, (int, float)) or amount <= 0):
+        return jsonify({"error": "approved_amount must be a positive number"}), 400
+
+    result = bulk_transition(query, new_status, current_user.name, amount,
+                             data.get("rejection_reason", ""), data.get("committee_comments", ""))
+    invalidate_stats()
+    return jsonify({"status": "ok", **result})
 
 
 @api_bp.route("/application/<int:app_id>/status")
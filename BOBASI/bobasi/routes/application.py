@@ -1,13 +1,16 @@
 """
 Bobasi BBS - Application Routes
 """
-import os, json, uuid
+import json
 from datetime import datetime
 from functools import wraps
-from flask import Blueprint, render_template, redirect, url_for, flash, request, current_app
+from flask import Blueprint, render_template, redirect, url_for, flash, request, current_app, jsonify
 from flask_login import login_required, current_user
-from werkzeug.utils import secure_filename
-from models.models import db, Student, Application, Document, Notification, User
+from models.models import db, Student, Application, Document, Notification, User, UploadSession
+from services.stats import invalidate_stats
+from services.outbox import enqueue_notification
+from services.sequences import next_application_number
+from services.documents import UploadError, store_upload, start_upload, append_chunk, abort_upload
 
 application_bp = Blueprint("application", __name__)
 
@@ -22,15 +25,6 @@ def student_required(f):
     return decorated
 
 
-def _gen_app_number(student_id):
-    from config import config
-    import os
-    cfg = config.get(os.environ.get("FLASK_ENV", "development"), config["default"])
-    year = datetime.now().year
-    count = Application.query.count() + 1
-    return f"BOB{year}{count:05d}"
-
-
 def _allowed_file(filename):
     allowed = current_app.config.get("ALLOWED_EXTENSIONS", {"pdf", "png", "jpg", "jpeg"})
     return "." in filename and filename.rsplit(".", 1)[1].lower() in allowed
@@ -77,7 +71,7 @@ def apply():
 
         app_obj = Application(
             student_id=student.id,
-            application_number=_gen_app_number(student.id),
+            application_number=next_application_number(),
             academic_year=f.get("academic_year", "2025/2026"),
             semester=f.get("semester", "1"),
             institution=f.get("institution", ""),
@@ -89,19 +83,16 @@ def apply():
             status="pending",
         )
         db.session.add(app_obj)
-        db.session.commit()
 
-        # Notify admins
-        admins = User.query.filter(User.role.in_(["admin", "review_committee"])).all()
-        for admin in admins:
-            notif = Notification(
-                user_id=admin.id,
-                title="New Bursary Application",
-                message=f"New application {app_obj.application_number} from {student.full_name} — KShs. {amount:,.0f}",
-                type="application",
-            )
-            db.session.add(notif)
+        # Notify admins (fanned out by the outbox worker, committed with the application)
+        enqueue_notification(
+            title="New Bursary Application",
+            message=f"New application {app_obj.application_number} from {student.full_name} — KShs. {amount:,.0f}",
+            type="application",
+            roles=["admin", "review_committee"],
+        )
         db.session.commit()
+        invalidate_stats()
 
         flash(f"Application submitted! Reference: {app_obj.application_number}", "success")
         return redirect(url_for("application.view", app_id=app_obj.id))
@@ -151,25 +142,107 @@ def upload_documents(app_id):
             flash("File type not allowed. Upload PDF, PNG, JPG, DOC.", "danger")
             return redirect(request.url)
 
-        filename = secure_filename(f"{student.id}_{app_id}_{uuid.uuid4().hex[:8]}_{file.filename}")
-        upload_dir = current_app.config["UPLOAD_FOLDER"]
-        os.makedirs(upload_dir, exist_ok=True)
-        save_path = os.path.join(upload_dir, filename)
-        file.save(save_path)
-
-        doc = Document(
-            student_id=student.id,
-            application_id=app_id,
-            document_type=doc_type,
-            document_name=file.filename,
-            file_path=f"uploads/{filename}",
-            file_size=os.path.getsize(save_path),
-            mime_type=file.content_type,
-        )
-        db.session.add(doc)
-        db.session.commit()
+        try:
+            store_upload(file, student.id, app_id, doc_type)
+        except UploadError as exc:
+            flash(str(exc), "danger")
+            return redirect(request.url)
         flash("Document uploaded successfully.", "success")
         return redirect(url_for("application.view", app_id=app_id))
 
     existing_docs = app_obj.documents.all()
-    return render_template("application/upload_docs.html", application=app_obj, documents=existing_docs)
+    return render_template("application/upload_docs.html", application=app_obj, documents=existing_docs,
+                           chunk_size=current_app.config["UPLOAD_CHUNK_SIZE"])
+
+
+# ─────────────────────────────────────────────
+# CHUNKED UPLOADS (JSON) — used by upload_docs.html when the browser supports it
+# ─────────────────────────────────────────────
+def _upload_state(upload):
+    return {
+        "upload_id": upload.id,
+        "offset": upload.received_bytes,
+        "size": upload.total_size,
+        "status": upload.status,
+        "document_id": upload.document_id,
+        "chunk_size": current_app.config["UPLOAD_CHUNK_SIZE"],
+    }
+
+
+def _own_upload(upload_id):
+    upload = UploadSession.query.get_or_404(upload_id)
+    student = current_user.student_profile
+    if not student or upload.student_id != student.id:
+        return None
+    return upload
+
+
+@application_bp.route("/<int:app_id>/uploads", methods=["POST"])
+@login_required
+@student_required
+def start_chunked_upload(app_id):
+    """Open a resumable upload: {"filename", "size", "document_type"}"""
+    app_obj = Application.query.get_or_404(app_id)
+    student = current_user.student_profile
+    if not student or app_obj.student_id != student.id:
+        return jsonify({"error": "Access denied"}), 403
+
+    data = request.get_json(silent=True) or {}
+    filename = str(data.get("filename", ""))
+    if not filename or not _allowed_file(filename):
+        return jsonify({"error": "File type not allowed. Upload PDF, PNG, JPG, DOC."}), 400
+    try:
+        upload = start_upload(student.id, app_id, data.get("document_type") or "other", filename,
+                              int(data.get("size", 0)))
+    except (TypeError, ValueError):
+        return jsonify({"error": "size must be the file size in bytes"}), 400
+    except UploadError as exc:
+        return jsonify({"error": str(exc)}), exc.status
+    return jsonify(_upload_state(upload)), 201
+
+
+@application_bp.route("/uploads/<upload_id>", methods=["GET"])
+@login_required
+@student_required
+def chunked_upload_status(upload_id):
+    """Resume point for an interrupted upload."""
+    upload = _own_upload(upload_id)
+    if upload is None:
+        return jsonify({"error": "Access denied"}), 403
+    return jsonify(_upload_state(upload))
+
+
+@application_bp.route("/uploads/<upload_id>", methods=["PATCH"])
+@login_required
+@student_required
+def append_chunked_upload(upload_id):
+    """Append the request body at the `Upload-Offset` header."""
+    upload = _own_upload(upload_id)
+    if upload is None:
+        return jsonify({"error": "Access denied"}), 403
+    try:
+        offset = int(request.headers.get("Upload-Offset", ""))
+    except ValueError:
+        return jsonify({"error": "Upload-Offset header is required"}), 400
+    try:
+        doc = append_chunk(upload, offset, request.stream)
+    except UploadError as exc:
+        body = {"error": str(exc)}
+        if exc.offset is not None:
+            body["offset"] = exc.offset
+        return jsonify(body), exc.status
+    if doc is not None:
+        flash("Document uploaded successfully.", "success")
+    return jsonify(_upload_state(upload))
+
+
+@application_bp.route("/uploads/<upload_id>", methods=["DELETE"])
+@login_required
+@student_required
+def abort_chunked_upload(upload_id):
+    upload = _own_upload(upload_id)
+    if upload is None:
+        return jsonify({"error": "Access denied"}), 403
+    if upload.status == "uploading":
+        abort_upload(upload)
+    return jsonify(_upload_state(upload))
@@ -5,6 +5,7 @@ from flask import Blueprint, render_template, redirect, url_for, flash, request,
 from flask_login import login_user, logout_user, login_required, current_user
 from datetime import datetime
 from models.models import db, User, Student
+from services.identity import invalidate_user
 
 auth_bp = Blueprint("auth", __name__)
 
@@ -133,6 +134,7 @@ def change_password():
 
         current_user.set_password(new_pw)
         db.session.commit()
+        invalidate_user(current_user.id, broadcast=True)
         flash("Password changed successfully.", "success")
         return redirect(url_for("auth.dashboard"))
 
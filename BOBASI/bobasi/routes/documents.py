@@ -0,0 +1,131 @@
+"""
+Bobasi BBS - Document Routes (downloads, previews)
+"""
+import os
+from urllib.parse import quote
+from flask import Blueprint, abort, send_file, request, current_app, Response
+from flask_login import login_required, current_user
+from models.models import db, Document
+from services.documents import blob_path, sniff_type, INLINE_TYPES
+from services.previews import preview_path, request_preview, touch
+
+documents_bp = Blueprint("documents", __name__)
+
+STAFF_ROLES = ("admin", "review_committee", "finance_officer")
+
+
+def _accessible_document(doc_id):
+    """The document if the current user may see it: staff, or the student who uploaded it."""
+    doc = Document.query.get_or_404(doc_id)
+    if current_user.role in STAFF_ROLES:
+        return doc
+    student = current_user.student_profile
+    if current_user.role == "student" and student and doc.student_id == student.id:
+        return doc
+    abort(403)
+
+
+def _served_type(path):
+    """(mimetype, may open inline) from the file's own bytes, never from the stored upload type.
+
+    Anything but a PDF or an image is a download: a file a student labelled text/html
+    must not render as a page on this origin.
+    """
+    try:
+        mime = sniff_type(path)
+    except OSError:
+        mime = None
+    if mime in INLINE_TYPES:
+        return mime, True
+    return "application/octet-stream", False
+
+
+def _disposition(doc, inline):
+    name = doc.document_name or f"document-{doc.id}"
+    fallback = name.encode("ascii", "ignore").decode().replace('"', "") or f"document-{doc.id}"
+    kind = "inline" if inline else "attachment"
+    return f"{kind}; filename=\"{fallback}\"; filename*=UTF-8''{quote(name)}"
+
+
+def _sandboxed(response):
+    """Whatever a document turns out to be, the browser must not run it with this origin's rights."""
+    response.headers["X-Content-Type-Options"] = "nosniff"
+    response.headers["Content-Security-Policy"] = "sandbox"
+    return response
+
+
+def _offloaded(doc, stored, mimetype, inline):
+    """Empty response telling the front-end server to stream the blob itself (it also handles Range)."""
+    etag = stored.sha256
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = Response(mimetype=mimetype)
+        if current_app.config["DOCUMENT_SENDFILE"] == "x-accel":
+            prefix = current_app.config["DOCUMENT_ACCEL_PREFIX"].rstrip("/")
+            response.headers["X-Accel-Redirect"] = f"{prefix}/{stored.storage_path}"
+        else:
+            response.headers["X-Sendfile"] = os.path.abspath(blob_path(stored))
+        response.headers["Content-Disposition"] = _disposition(doc, inline)
+    response.set_etag(etag)
+    return response
+
+
+@documents_bp.route("/<int:doc_id>")
+@login_required
+def download(doc_id):
+    """Stream a document to staff or its owner. ?inline=1 opens PDFs and images in the browser."""
+    doc = _accessible_document(doc_id)
+    stored = doc.stored_file
+
+    if stored is None:
+        # Pre-store upload still under static/uploads (see `flask import-legacy-uploads`)
+        path = os.path.join(os.path.dirname(current_app.config["UPLOAD_FOLDER"]), doc.file_path)
+        if not os.path.isfile(path):
+            abort(404)
+        mimetype, can_inline = _served_type(path)
+        response = send_file(path, mimetype=mimetype, conditional=True, max_age=0)
+        response.headers["Content-Disposition"] = _disposition(doc, can_inline and request.args.get("inline") == "1")
+        return _sandboxed(response)
+
+    path = blob_path(stored)
+    mimetype, can_inline = _served_type(path)
+    inline = can_inline and request.args.get("inline") == "1"
+    if current_app.config["DOCUMENT_SENDFILE"] in ("x-accel", "x-sendfile"):
+        response = _offloaded(doc, stored, mimetype, inline)
+    else:
+        if not os.path.isfile(path):
+            abort(404)
+        # conditional=True answers If-None-Match / If-Range and serves Range requests (206)
+        response = send_file(path, mimetype=mimetype, conditional=True, etag=stored.sha256,
+                             last_modified=stored.created_at)
+        response.headers["Content-Disposition"] = _disposition(doc, inline)
+        response.accept_ranges = "bytes"
+    # The bytes behind a document never change (content-addressed), so let the browser keep them
+    response.cache_control.public = False
+    response.cache_control.no_cache = None
+    response.cache_control.private = True
+    response.cache_control.max_age = 365 * 24 * 3600
+    response.cache_control.immutable = True
+    return _sandboxed(response)
+
+
+
+@documents_bp.route("/<int:doc_id>/preview")
+@login_required
+def preview(doc_id):
+    doc = _accessible_document(doc_id)
+    stored = doc.stored_file
+    if stored is None or stored.preview_status != "ready":
+        abort(404)
+    path = preview_path(stored)
+    if not touch(path):
+        # Evicted from the LRU cache — queue a fresh render and let the page show the placeholder
+        request_preview(stored)
+        abort(404)
+    response = send_file(path, mimetype=stored.preview_mime, conditional=True,
+                         etag=f"preview-{stored.sha256}", max_age=30 * 24 * 3600)
+    response.cache_control.private = True
+    response.cache_control.public = False
+    response.cache_control.no_cache = None
+    return response
@@ -4,9 +4,17 @@ Bobasi BBS - Finance Routes (Disbursements only — no repayments)
 import uuid
 from datetime import datetime
 from functools import wraps
-from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify
+from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify, current_app
 from flask_login import login_required, current_user
-from models.models import db, Application, Disbursement, Loan, Notification, Student
+from models.models import db, Application, Disbursement, DisbursementRun, Loan, Notification, Student
+from services.stats import finance_dashboard_stats, invalidate_stats, listing_totals, disbursement_totals
+from services.rollups import monthly_disbursements
+from services.pagination import keyset_paginate
+from services.search import filter_disbursements
+from services.loaders import with_profile
+from services.outbox import enqueue_notification
+from services.exports import export_response, DISBURSEMENT_COLUMNS, GRANT_COLUMNS, disbursement_rows, grant_rows
+from services.disbursement_runs import parse_filters, preview_run, create_run, execute_run, run_summary
 
 finance_bp = Blueprint("finance", __name__)
 
@@ -25,28 +33,17 @@ def finance_required(f):
 @login_required
 @finance_required
 def dashboard():
-    stats = {
-        "approved_pending_disburse": Application.query.filter_by(status="approved").count(),
-        "total_disbursed": db.session.query(db.func.sum(Disbursement.amount)).scalar() or 0,
-        "total_beneficiaries": db.session.query(Disbursement.student_id).distinct().count(),
-        "disbursed_apps": Application.query.filter_by(status="disbursed").count(),
-        "total_applied": db.session.query(db.func.sum(Application.requested_amount)).filter(
-            Application.status.in_(["approved", "disbursed"])
-        ).scalar() or 0,
-    }
-    recent_disb = Disbursement.query.order_by(Disbursement.created_at.desc()).limit(10).all()
-    # Monthly disbursement data for chart
-    monthly = []
-    for month in range(1, 13):
-        total = db.session.query(db.func.sum(Disbursement.amount)).filter(
-            db.func.strftime('%m', Disbursement.disbursement_date) == f"{month:02d}"
-        ).scalar() or 0
-        monthly.append(round(total))
+    stats = finance_dashboard_stats()
+    recent_disb = with_profile(Disbursement.query, "disbursement_list").order_by(
+        Disbursement.created_at.desc()).limit(10).all()
+    # Monthly disbursement data for chart (current financial year, from rollup)
+    month_labels, monthly = monthly_disbursements(current_app.config["FINANCIAL_YEAR"])
 
     return render_template("finance/dashboard.html",
         stats=stats,
         recent_disb=recent_disb,
         monthly=monthly,
+        month_labels=month_labels,
     )
 
 
@@ -112,20 +109,101 @@ def disburse():
         app_obj.status = "disbursed"
         app_obj.disbursed_at = datetime.utcnow()
 
-        notif = Notification(
-            user_id=app_obj.student.user_id,
+        enqueue_notification(
             title="🎉 Bursary Funds Disbursed",
             message=f"Congratulations! KShs {amount:,.0f} has been disbursed for your bursary application {app_obj.application_number}. Reference: {ref}. Method: {method.replace('_', ' ').title()}.",
             type="disbursement",
+            user_id=app_obj.student.user_id,
         )
-        db.session.add(notif)
         db.session.commit()
+        invalidate_stats()
 
         flash(f"✅ Disbursement of KShs {amount:,.0f} processed successfully. Reference: {ref}", "success")
         return redirect(url_for("finance.disbursements"))
 
-    approved_apps = Application.query.filter_by(status="approved").order_by(Application.submitted_at.desc()).all()
-    return render_template("finance/disburse.html", approved_apps=approved_apps)
+    approved_query = Application.query.filter_by(status="approved")
+    # Same key as the admin list filtered to "approved", so the two share one count
+    approved_total = listing_totals(("applications", "approved", ""), approved_query.order_by(None).count)
+    approved_apps = keyset_paginate(with_profile(approved_query, "application_list"),
+                                    Application.submitted_at, Application.id)
+    return render_template("finance/disburse.html", approved_apps=approved_apps, approved_total=approved_total)
+
+
+@finance_bp.route("/batch-disburse", methods=["GET", "POST"])
+@login_required
+@finance_required
+def batch_disburse():
+    source = request.form if request.method == "POST" else request.args
+    try:
+        filters = parse_filters(source)
+    except ValueError as exc:
+        flash(str(exc), "danger")
+        return redirect(url_for("finance.batch_disburse"))
+
+    if request.method == "POST":
+        method = request.form.get("payment_method")
+        if method not in ("bank_transfer", "mpesa", "cheque", "cash"):
+            flash("Please select a payment method.", "danger")
+            return redirect(url_for("finance.batch_disburse", **filters))
+        count, _ = preview_run(filters)
+        if not count:
+            flash("No approved applications match these filters.", "warning")
+            return redirect(url_for("finance.batch_disburse", **filters))
+
+        run = create_run(current_user.id, method, filters, request.form.get("notes", ""))
+        run = execute_run(run.id)
+        invalidate_stats()
+        if run.status == "completed":
+            flash(f"✅ Batch {run.reference_number}: {run.processed_count} disbursements totalling "
+                  f"KShs {run.processed_amount:,.0f} processed.", "success")
+        else:
+            flash(f"Batch {run.reference_number} stopped after {run.processed_count} disbursements. "
+                  f"Resume it from the run report.", "danger")
+        return redirect(url_for("finance.run_report", run_id=run.id))
+
+    count, total = preview_run(filters)
+    wards = db.session.execute(
+        db.select(Student.ward).join(Application, Application.student_id == Student.id)
+        .where(Application.status == "approved", Student.ward.isnot(None)).distinct().order_by(Student.ward)
+    ).scalars().all()
+    institutions = db.session.execute(
+        db.select(Application.institution).where(Application.status == "approved", Application.institution.isnot(None))
+        .distinct().order_by(Application.institution)
+    ).scalars().all()
+    runs = DisbursementRun.query.order_by(DisbursementRun.created_at.desc()).limit(10).all()
+    return render_template("finance/batch_disburse.html",
+        filters=filters,
+        count=count,
+        total=total,
+        wards=wards,
+        institutions=institutions,
+        runs=runs,
+    )
+
+
+@finance_bp.route("/runs/<int:run_id>")
+@login_required
+@finance_required
+def run_report(run_id):
+    run = DisbursementRun.query.get_or_404(run_id)
+    return render_template("finance/run_report.html", run=run, summary=run_summary(run))
+
+
+@finance_bp.route("/runs/<int:run_id>/resume", methods=["POST"])
+@login_required
+@finance_required
+def resume_run(run_id):
+    run = DisbursementRun.query.get_or_404(run_id)
+    if run.status == "completed":
+        flash("This batch has already completed.", "info")
+        return redirect(url_for("finance.run_report", run_id=run.id))
+    run = execute_run(run.id)
+    invalidate_stats()
+    if run.status == "completed":
+        flash(f"✅ Batch {run.reference_number} resumed and completed.", "success")
+    else:
+        flash(f"Batch {run.reference_number} failed again: {run.error}", "danger")
+    return redirect(url_for("finance.run_report", run_id=run.id))
 
 
 @finance_bp.route("/disbursements")
@@ -138,22 +216,50 @@ def disbursements():
     if method_filter:
         query = query.filter_by(payment_method=method_filter)
     if search:
-        query = query.join(Student).filter(
-            db.or_(
-                Student.full_name.ilike(f"%{search}%"),
-                Disbursement.reference_number.ilike(f"%{search}%"),
-            )
-        )
-    disbs = query.order_by(Disbursement.created_at.desc()).all()
-    total = sum(d.amount for d in disbs)
+        query = filter_disbursements(query, search)
+    if search:
+        count, total = listing_totals(("disbursements", method_filter, search), lambda: tuple(query.with_entities(
+            db.func.count(Disbursement.id), db.func.coalesce(db.func.sum(Disbursement.amount), 0)
+        ).order_by(None).one()))
+    else:
+        count, total = disbursement_totals(method_filter)
+    disbs = keyset_paginate(with_profile(query, "disbursement_list"), Disbursement.created_at, Disbursement.id)
     return render_template("finance/disbursements.html",
         disbursements=disbs,
+        count=count,
         total=total,
         method_filter=method_filter,
         search=search,
     )
 
 
+@finance_bp.route("/disbursements/export")
+@login_required
+@finance_required
+def export_disbursements():
+    """Stream every disbursement matching the list filters as CSV or XLSX (?format=xlsx)."""
+    method_filter = request.args.get("method", "")
+    search = request.args.get("search", "").strip()
+    query = Disbursement.query
+    if method_filter:
+        query = query.filter_by(payment_method=method_filter)
+    if search:
+        query = filter_disbursements(query, search)
+    return export_response(request.args.get("format", "csv"), "disbursements",
+                           DISBURSEMENT_COLUMNS, disbursement_rows(query))
+
+
+@finance_bp.route("/grants/export")
+@login_required
+@finance_required
+def export_grants():
+    status_filter = request.args.get("status", "")
+    query = Loan.query
+    if status_filter:
+        query = query.filter_by(status=status_filter)
+    return export_response(request.args.get("format", "csv"), "grants", GRANT_COLUMNS, grant_rows(query))
+
+
 @finance_bp.route("/grants")
 @login_required
 @finance_required
@@ -163,5 +269,9 @@ def grants():
     query = Loan.query
     if status_filter:
         query = query.filter_by(status=status_filter)
-    grants_list = query.order_by(Loan.created_at.desc()).all()
-    return render_template("finance/grants.html", grants=grants_list, status_filter=status_filter)
+    count, total = listing_totals(("grants", status_filter), lambda: tuple(query.with_entities(
+        db.func.count(Loan.id), db.func.coalesce(db.func.sum(Loan.principal_amount), 0)
+    ).order_by(None).one()))
+    grants_list = keyset_paginate(with_profile(query, "grant_list"), Loan.created_at, Loan.id)
+    return render_template("finance/grants.html", grants=grants_list, count=count, total=total,
+                           status_filter=status_filter)
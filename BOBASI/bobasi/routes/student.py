@@ -5,6 +5,11 @@ from flask import Blueprint, render_template, redirect, url_for, flash, request
 from flask_login import login_required, current_user
 from functools import wraps
 from models.models import db, Student, Application, Loan, Notification
+from services.pagination import keyset_paginate
+from services.loaders import with_profile
+from services.notifications import mark_notifications_read
+from services.stats import student_summary, student_inbox
+from services.identity import invalidate_user
 
 student_bp = Blueprint("student", __name__)
 
@@ -28,27 +33,16 @@ def dashboard():
         flash("Profile not found.", "danger")
         return redirect(url_for("auth.logout"))
 
-    apps = student.applications.order_by(Application.submitted_at.desc()).limit(5).all()
-    disbursements_list = student.loans.all()  # loan records = grant records
-    total_received = sum(l.principal_amount for l in disbursements_list)
-    notifications = current_user.notifications.filter_by(is_read=False).limit(5).all()
-
-    # Application status counts
-    status_counts = {
-        "pending": student.applications.filter_by(status="pending").count(),
-        "under_review": student.applications.filter_by(status="under_review").count(),
-        "approved": student.applications.filter_by(status="approved").count(),
-        "disbursed": student.applications.filter_by(status="disbursed").count(),
-        "rejected": student.applications.filter_by(status="rejected").count(),
-    }
+    summary = student_summary(student.id)
+    notifications = student_inbox(current_user.id)
 
     return render_template("student/dashboard.html",
         student=student,
-        apps=apps,
-        disbursements=disbursements_list,
-        total_received=total_received,
+        apps=summary["recent_apps"],
+        disbursements=summary["recent_grants"],
+        total_received=summary["total_received"],
         notifications=notifications,
-        status_counts=status_counts,
+        status_counts=summary["status_counts"],
     )
 
 
@@ -120,9 +114,10 @@ def profile():
         student.religious_leader = f.get("religious_leader", "")
         student.chief_name = f.get("chief_name", "")
         student.profile_complete = True
-        current_user.name = student.full_name
+        student.user.name = student.full_name
 
         db.session.commit()
+        invalidate_user(current_user.id)
         flash("Profile updated successfully.", "success")
         return redirect(url_for("student.dashboard"))
 
@@ -133,11 +128,14 @@ def profile():
 @login_required
 @student_required
 def notifications():
-    notifs = current_user.notifications.order_by(Notification.created_at.desc()).all()
-    for n in notifs:
-        n.is_read = True
-    db.session.commit()
-    return render_template("student/notifications.html", notifications=notifs)
+    notifs = keyset_paginate(current_user.notifications, Notification.created_at, Notification.id)
+    # Render first: the commit below expires every loaded row
+    html = render_template("student/notifications.html", notifications=notifs)
+    unread = [n.id for n in notifs if not n.is_read]
+    if unread:
+        # Only the items on this page have been seen
+        mark_notifications_read(current_user.id, ids=unread)
+    return html
 
 
 @student_bp.route("/disbursements")
@@ -145,7 +143,7 @@ def notifications():
 @student_required
 def my_disbursements():
     student = current_user.student_profile
-    grants = student.loans.order_by(Loan.created_at.desc()).all()
+    grants = with_profile(student.loans, "grant_list").order_by(Loan.created_at.desc()).all()
     return render_template("student/my_disbursements.html", grants=grants, student=student)
 
 
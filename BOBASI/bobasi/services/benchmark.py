@@ -0,0 +1,126 @@
+"""
+Bobasi BBS - Route Benchmarks
+Requests every GET page (the set check-query-plans covers, as a user of
+the blueprint's role) through the Flask test client and records latency
+percentiles and SQL statement counts per URL. A run is saved as a JSON
+baseline; compare_baselines() lists the pages that got slower or started
+issuing more statements since an earlier one (`flask benchmark-routes`).
+
+Each URL is requested `warmup` times first, so cached pages are measured
+in their steady state. Load data for a meaningful run comes from
+`flask generate-load-data`.
+"""
+import json
+import statistics
+import subprocess
+import time
+from contextlib import ExitStack
+from datetime import datetime
+from flask import current_app
+from models.models import db, User, Student, Application, Review, Document, Disbursement, Loan, Notification
+from services.querycount import count_queries
+from services.queryplan import plan_urls, role_users, logged_in_client
+
+# A page counts as slower only past both bounds, so timer noise on fast pages is ignored
+LATENCY_THRESHOLD = 0.25  # relative increase in p95
+LATENCY_FLOOR_MS = 2.0  # absolute increase in p95
+
+
+def _percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=current_app.root_path,
+                              capture_output=True, text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def dataset_summary():
+    """Row counts of the tables that grow with the number of students."""
+    models = (User, Student, Application, Review, Document, Disbursement, Loan, Notification)
+    return {m.__tablename__: db.session.query(db.func.count(m.id)).scalar() for m in models}
+
+
+def _engines():
+    engines = [db.engine]
+    reporting = current_app.extensions.get("reporting_engine")
+    if reporting is not None:
+        engines.append(reporting)
+    return engines
+
+
+def benchmark_url(app, client, url, iterations=20, warmup=1):
+    """Latency percentiles (ms) and SQL statements per request for one URL."""
+    for _ in range(warmup):
+        client.get(url)
+    timings, statements, status = [], [], None
+    for _ in range(iterations):
+        with app.app_context(), ExitStack() as stack:
+            counters = [stack.enter_context(count_queries(engine)) for engine in _engines()]
+            began = time.perf_counter()
+            status = client.get(url).status_code
+            timings.append((time.perf_counter() - began) * 1000)
+        statements.append(sum(c.count for c in counters))
+    return {
+        "status": status,
+        "p50_ms": round(_percentile(timings, 50), 2),
+        "p95_ms": round(_percentile(timings, 95), 2),
+        "p99_ms": round(_percentile(timings, 99), 2),
+        "mean_ms": round(statistics.fmean(timings), 2),
+        "max_ms": round(max(timings), 2),
+        "sql": int(statistics.median(statements)),
+        "sql_max": max(statements),
+    }
+
+
+def benchmark_routes(app, iterations=20, warmup=1, urls=None, progress=None):
+    """Benchmark every page and return a baseline dict (see module docstring)."""
+    users = role_users(app)
+    with app.app_context():
+        baseline = {
+            "created_at": datetime.utcnow().isoformat(timespec="seconds"),
+            "commit": _git_commit(),
+            "database": {"dialect": db.engine.dialect.name, "rows": dataset_summary()},
+            "iterations": iterations,
+            "warmup": warmup,
+            "routes": {},
+        }
+    for url, role in (urls or plan_urls(app)):
+        if role not in users:
+            continue
+        result = benchmark_url(app, logged_in_client(app, users[role]), url, iterations, warmup)
+        baseline["routes"][url] = {"role": role, **result}
+        if progress:
+            progress(url, baseline["routes"][url])
+    return baseline
+
+
+def save_baseline(baseline, path):
+    with open(path, "w") as fh:
+        json.dump(baseline, fh, indent=2, sort_keys=True)
+        fh.write("\n")
+
+
+def load_baseline(path):
+    with open(path) as fh:
+        return json.load(fh)
+
+
+def compare_baselines(old, new, threshold=LATENCY_THRESHOLD, floor_ms=LATENCY_FLOOR_MS):
+    """[(url, metric, old value, new value)] for every page that regressed from `old` to `new`."""
+    regressions = []
+    for url, now in sorted(new["routes"].items()):
+        before = old["routes"].get(url)
+        if before is None:
+            continue
+        if now["status"] != before["status"]:
+            regressions.append((url, "status", before["status"], now["status"]))
+        if now["sql"] > before["sql"]:
+            regressions.append((url, "sql", before["sql"], now["sql"]))
+        if now["p95_ms"] > before["p95_ms"] * (1 + threshold) and now["p95_ms"] - before["p95_ms"] > floor_ms:
+            regressions.append((url, "p95_ms", before["p95_ms"], now["p95_ms"]))
+    return regressions
@@ -0,0 +1,221 @@
+"""
+Bobasi BBS - Batch Disbursement Runs
+A run disburses every approved application matching a filter. Work is
+done in chunks of applications taken in id order; each chunk claims its
+applications, bulk-inserts the Disbursement and Loan rows and commits, so
+an interrupted run resumes from last_application_id without paying
+anyone twice.
+"""
+import json
+import uuid
+from datetime import datetime
+from models.models import (db, Application, Disbursement, DisbursementRun, DisbursementRollup,
+                           Loan, NotificationOutbox, Student)
+from services.search import index_rows
+from services.stats import invalidate_student_summary
+
+CHUNK_SIZE = 500
+RUN_FILTERS = ("ward", "institution", "min_amount", "max_amount")
+
+
+def parse_filters(source):
+    """Read run filters from a form / args mapping; blank values are dropped."""
+    filters = {}
+    for key in ("ward", "institution"):
+        value = (source.get(key) or "").strip()
+        if value:
+            filters[key] = value
+    for key in ("min_amount", "max_amount"):
+        value = (source.get(key) or "").strip()
+        if value:
+            try:
+                filters[key] = float(value)
+            except ValueError:
+                raise ValueError(f"{key.replace('_', ' ').title()} must be a number.")
+    return filters
+
+
+def _amount():
+    return db.func.coalesce(Application.approved_amount, Application.requested_amount)
+
+
+def _eligible(filters):
+    """Approved applications matching the run filters, as a SELECT over applications ⋈ students."""
+    amount = _amount()
+    stmt = (
+        db.select(
+            Application.id, Application.student_id, Application.application_number,
+            amount.label("amount"), Student.ward, Student.user_id, Student.bank_ac_no,
+        )
+        .join(Student, Student.id == Application.student_id)
+        .where(Application.status == "approved")
+    )
+    if filters.get("ward"):
+        stmt = stmt.where(Student.ward == filters["ward"])
+    if filters.get("institution"):
+        stmt = stmt.where(Application.institution == filters["institution"])
+    if filters.get("min_amount") is not None:
+        stmt = stmt.where(amount >= filters["min_amount"])
+    if filters.get("max_amount") is not None:
+        stmt = stmt.where(amount <= filters["max_amount"])
+    return stmt
+
+
+def preview_run(filters):
+    """(count, total) of approved applications a run with these filters would pay."""
+    sub = _eligible(filters).subquery()
+    count, total = db.session.execute(
+        db.select(db.func.count(), db.func.coalesce(db.func.sum(sub.c.amount), 0))
+    ).one()
+    return count, total
+
+
+def create_run(finance_officer_id, payment_method, filters, notes=""):
+    count, _ = preview_run(filters)
+    run = DisbursementRun(
+        reference_number=f"BOB-RUN-{datetime.now().strftime('%Y%m%d')}-{uuid.uuid4().hex[:6].upper()}",
+        finance_officer_id=finance_officer_id,
+        payment_method=payment_method,
+        filters_json=json.dumps(filters),
+        notes=notes,
+        status="pending",
+        total_selected=count,
+        processed_count=0,
+        processed_amount=0,
+        last_application_id=0,
+    )
+    db.session.add(run)
+    db.session.commit()
+    return run
+
+
+def _process_chunk(run, filters, chunk_size):
+    """Disburse the next chunk. Returns the number of applications paid (0 when done)."""
+    while True:
+        rows = db.session.execute(
+            _eligible(filters)
+            .where(Application.id > (run.last_application_id or 0))
+            .order_by(Application.id)
+            .limit(chunk_size)
+        ).all()
+        if not rows:
+            return 0
+        ids = [r.id for r in rows]
+        now = datetime.utcnow()
+        claimed = db.session.execute(
+            db.update(Application)
+            .where(Application.id.in_(ids), Application.status == "approved")
+            .values(status="disbursed", disbursed_at=now, updated_at=now)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        if claimed == len(ids):
+            break
+        # Someone disbursed part of this chunk meanwhile — reselect without them
+        db.session.rollback()
+
+    today = now.strftime("%Y-%m-%d")
+    stamp = now.strftime("%Y%m%d")
+    method = run.payment_method
+    refs = {r.id: f"BOB-DISB-{stamp}-{uuid.uuid4().hex[:6].upper()}" for r in rows}
+
+    # Bulk inserts skip the Disbursement/Notification mapper hooks, so the
+    # rollup, search index and outbox wake-up are maintained explicitly below.
+    db.session.execute(db.insert(Disbursement), [
+        {"application_id": r.id, "student_id": r.student_id, "finance_officer_id": run.finance_officer_id,
+         "run_id": run.id, "amount": r.amount, "disbursement_date": now, "payment_method": method,
+         "account_number": r.bank_ac_no, "reference_number": refs[r.id], "status": "processed",
+         "notes": run.notes, "created_at": now}
+        for r in rows
+    ])
+    db.session.execute(db.insert(Loan), [
+        {"application_id": r.id, "student_id": r.student_id, "principal_amount": r.amount,
+         "interest_rate": 0.0, "repayment_period_months": 0, "monthly_installment": 0,
+         "total_payable": r.amount, "balance_remaining": 0, "start_date": today, "due_date": today,
+         "status": "active", "created_at": now, "updated_at": now}
+        for r in rows
+    ])
+
+    connection = db.session.connection()
+    by_ward = {}
+    for r in rows:
+        amount, count = by_ward.get(r.ward, (0, 0))
+        by_ward[r.ward] = (amount + (r.amount or 0), count + 1)
+    for ward, (amount, count) in by_ward.items():
+        DisbursementRollup.apply(connection, now, method, ward, amount, count)
+
+    disb_ids = db.session.execute(
+        db.select(Disbursement.id).where(Disbursement.run_id == run.id, Disbursement.application_id.in_(ids))
+    ).scalars().all()
+    index_rows("search_disbursements", disb_ids)
+
+    method_label = method.replace("_", " ").title()
+    db.session.execute(db.insert(NotificationOutbox), [
+        {"recipient_user_id": r.user_id, "title": "🎉 Bursary Funds Disbursed",
+         "message": f"Congratulations! KShs {r.amount:,.0f} has been disbursed for your bursary application "
+                    f"{r.application_number}. Reference: {refs[r.id]}. Method: {method_label}.",
+         "type": "disbursement", "status": "pending", "attempts": 0, "available_at": now, "created_at": now}
+        for r in rows
+    ])
+    db.session.info["outbox_pending"] = True
+
+    run.processed_count = (run.processed_count or 0) + len(rows)
+    run.processed_amount = (run.processed_amount or 0) + sum(r.amount or 0 for r in rows)
+    run.last_application_id = ids[-1]
+    db.session.commit()
+    invalidate_student_summary(*{r.student_id for r in rows})
+    return len(rows)
+
+
+def execute_run(run_id, chunk_size=CHUNK_SIZE):
+    """Run (or resume) a disbursement run to completion; returns the run."""
+    run = db.session.get(DisbursementRun, run_id)
+    if run is None or run.status == "completed":
+        return run
+    run.status = "running"
+    run.started_at = run.started_at or datetime.utcnow()
+    run.error = None
+    db.session.commit()
+
+    filters = run.get_filters()
+    try:
+        while _process_chunk(run, filters, chunk_size):
+            pass
+    except Exception as exc:
+        db.session.rollback()
+        run = db.session.get(DisbursementRun, run_id)
+        run.status = "failed"
+        run.error = str(exc)[:2000]
+        db.session.commit()
+        return run
+
+    run.status = "completed"
+    run.completed_at = datetime.utcnow()
+    db.session.commit()
+    return run
+
+
+def run_summary(run):
+    """Totals for one run, broken down by ward and institution."""
+    base = (
+        db.select(db.func.count(Disbursement.id), db.func.coalesce(db.func.sum(Disbursement.amount), 0))
+        .join(Application, Application.id == Disbursement.application_id)
+        .join(Student, Student.id == Disbursement.student_id)
+        .where(Disbursement.run_id == run.id)
+    )
+    count, total = db.session.execute(base).one()
+    by_ward = db.session.execute(
+        base.add_columns(Student.ward).group_by(Student.ward).order_by(db.func.sum(Disbursement.amount).desc())
+    ).all()
+    by_institution = db.session.execute(
+        base.add_columns(Application.institution).group_by(Application.institution)
+        .order_by(db.func.sum(Disbursement.amount).desc())
+    ).all()
+    remaining, remaining_amount = preview_run(run.get_filters()) if run.status != "completed" else (0, 0)
+    return {
+        "count": count,
+        "total": total,
+        "by_ward": [{"ward": w or "—", "count": c, "total": t} for c, t, w in by_ward],
+        "by_institution": [{"institution": i or "—", "count": c, "total": t} for c, t, i in by_institution],
+        "remaining": remaining,
+        "remaining_amount": remaining_amount,
+    }
@@ -0,0 +1,362 @@
+"""
+Bobasi BBS - Document Storage
+Uploads are written in chunks to UPLOAD_TMP_FOLDER and hashed (SHA-256)
+as the bytes arrive. On completion the file is moved into the
+content-addressed DOCUMENT_STORE (<aa>/<bb>/<sha256>), so identical files
+are stored once and shared by every Document that references them through
+a reference-counted StoredFile row.
+"""
+import hashlib
+import os
+import threading
+import uuid
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy.exc import IntegrityError
+from models.models import db, Document, StoredFile, UploadSession
+
+COPY_CHUNK = 64 * 1024
+
+# Leading bytes → content type. The type a client claims is never trusted; what the
+# bytes are decides how a document is stored and served.
+MAGIC_TYPES = (
+    (b"%PDF", "application/pdf"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1", "application/msword"),
+    (b"PK\x03\x04", "application/vnd.openxmlformats-officedocument.wordprocessingml.document"),
+)
+INLINE_TYPES = {"application/pdf", "image/png", "image/jpeg"}  # safe to open in the browser
+
+# upload id -> (offset, running sha256); rebuilt from the .part file when a
+# chunk lands on a different worker process or after a restart
+_hashers = {}
+_hashers_lock = threading.Lock()
+
+
+class UploadError(Exception):
+    """Raised for an upload request the client must correct (bad offset, too large, …)."""
+    def __init__(self, message, status=400, offset=None):
+        super().__init__(message)
+        self.status = status
+        self.offset = offset
+
+
+def store_root():
+    return current_app.config["DOCUMENT_STORE"]
+
+
+def partial_path(upload_id):
+    return os.path.join(current_app.config["UPLOAD_TMP_FOLDER"], f"{upload_id}.part")
+
+
+def blob_path(stored_file):
+    return os.path.join(store_root(), stored_file.storage_path)
+
+
+def sniff_type(path):
+    """Content type of the file at `path` from its first bytes; None when it is not a known type."""
+    with open(path, "rb") as fh:
+        head = fh.read(16)
+    return next((mime for magic, mime in MAGIC_TYPES if head.startswith(magic)), None)
+
+
+def _accepted_type(path):
+    """Sniffed type of a finished upload; rejects content that is not an allowed document."""
+    mime = sniff_type(path)
+    if mime is None:
+        raise UploadError("File content is not a PDF, PNG, JPG or Word document.", status=415)
+    return mime
+
+
+def _relative_blob_path(digest):
+    return os.path.join(digest[:2], digest[2:4], digest)
+
+
+# ─────────────────────────────────────────────
+# HASHING WRITERS
+# ─────────────────────────────────────────────
+def _copy_hashing(source, target, hasher, limit):
+    """Copy a readable stream into `target` while hashing; returns bytes copied."""
+    copied = 0
+    while True:
+        chunk = source.read(COPY_CHUNK)
+        if not chunk:
+            return copied
+        copied += len(chunk)
+        if copied > limit:
+            raise UploadError("File is larger than the upload allows.", status=413)
+        hasher.update(chunk)
+        target.write(chunk)
+
+
+def _hasher_for(upload_id, offset):
+    with _hashers_lock:
+        state = _hashers.pop(upload_id, None)
+    if state and state[0] == offset:
+        return state[1]
+    hasher = hashlib.sha256()
+    with open(partial_path(upload_id), "rb") as fh:
+        remaining = offset
+        while remaining:
+            chunk = fh.read(min(COPY_CHUNK, remaining))
+            if not chunk:
+                break
+            hasher.update(chunk)
+            remaining -= len(chunk)
+    return hasher
+
+
+# ─────────────────────────────────────────────
+# CONTENT-ADDRESSED STORE
+# ─────────────────────────────────────────────
+def _acquire_blob(temp_path, digest, size, mime_type):
+    """Reference the blob for `digest`, moving the temp file into the store if the bytes are missing.
+
+    The StoredFile row is bumped (or inserted) first, so it stays locked by
+    this transaction until the caller commits and collect_garbage() cannot
+    delete it in between. Only then is the store checked: the temp file is
+    kept until the blob is known to be on disk. Returns the StoredFile.
+    """
+    relative = _relative_blob_path(digest)
+    final = os.path.join(store_root(), relative)
+
+    t = StoredFile.__table__
+    for _ in range(2):
+        bumped = db.session.execute(
+            t.update().where(t.c.sha256 == digest)
+            .values(ref_count=t.c.ref_count + 1, last_referenced_at=datetime.utcnow())
+        ).rowcount
+        if bumped:
+            break
+        try:
+            with db.session.begin_nested():
+                db.session.add(StoredFile(sha256=digest, size=size, mime_type=mime_type,
+                                          storage_path=relative, ref_count=1))
+            break
+        except IntegrityError:
+            continue  # another upload of the same bytes won the insert — bump its row instead
+
+    if os.path.exists(final):
+        os.remove(temp_path)
+    else:
+        # New blob, or its file was collected before our row existed. If this
+        # transaction rolls back the file is left without a row; the orphan
+        # sweep in collect_garbage() removes it after the grace period.
+        os.makedirs(os.path.dirname(final), exist_ok=True)
+        os.replace(temp_path, final)
+    db.session.info["previews_pending"] = True  # new blobs start with preview_status 'pending'
+    return StoredFile.query.filter_by(sha256=digest).one()
+
+
+def _create_document(student_id, application_id, document_type, filename, mime_type, stored):
+    doc = Document(
+        student_id=student_id,
+        application_id=application_id,
+        document_type=document_type,
+        document_name=filename,
+        file_path=stored.storage_path,
+        file_size=stored.size,
+        mime_type=mime_type,
+        stored_file_id=stored.id,
+    )
+    db.session.add(doc)
+    return doc
+
+
+def store_upload(file, student_id, application_id, document_type):
+    """Single-request upload (the plain form): stream, hash and store in one pass."""
+    os.makedirs(current_app.config["UPLOAD_TMP_FOLDER"], exist_ok=True)
+    temp_path = partial_path(uuid.uuid4().hex)
+    hasher = hashlib.sha256()
+    try:
+        with open(temp_path, "wb") as out:
+            size = _copy_hashing(file.stream, out, hasher, current_app.config["DOCUMENT_MAX_SIZE"])
+        mime_type = _accepted_type(temp_path)
+        stored = _acquire_blob(temp_path, hasher.hexdigest(), size, mime_type)
+    except Exception:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    doc = _create_document(student_id, application_id, document_type, file.filename, mime_type, stored)
+    db.session.commit()
+    return doc
+
+
+# ─────────────────────────────────────────────
+# CHUNKED / RESUMABLE UPLOADS
+# ─────────────────────────────────────────────
+def start_upload(student_id, application_id, document_type, filename, total_size):
+    if total_size <= 0:
+        raise UploadError("File is empty.")
+    if total_size > current_app.config["DOCUMENT_MAX_SIZE"]:
+        raise UploadError("File is larger than the upload allows.", status=413)
+    os.makedirs(current_app.config["UPLOAD_TMP_FOLDER"], exist_ok=True)
+    upload = UploadSession(
+        id=uuid.uuid4().hex,
+        student_id=student_id,
+        application_id=application_id,
+        document_type=document_type,
+        filename=filename,
+        total_size=total_size,
+        received_bytes=0,
+        status="uploading",
+    )
+    open(partial_path(upload.id), "wb").close()
+    db.session.add(upload)
+    db.session.commit()
+    return upload
+
+
+def append_chunk(upload, offset, stream):
+    """Append one chunk at `offset`; completes the upload when the last byte arrives.
+
+    Returns the Document once complete, otherwise None.
+    """
+    if upload.status != "uploading":
+        raise UploadError("This upload is no longer active.", status=409, offset=upload.received_bytes)
+    if offset != upload.received_bytes:
+        raise UploadError("Offset does not match the bytes received so far.", status=409,
+                          offset=upload.received_bytes)
+
+    path = partial_path(upload.id)
+    hasher = _hasher_for(upload.id, offset)
+    remaining = upload.total_size - offset
+    with open(path, "r+b") as out:
+        out.seek(offset)
+        try:
+            written = _copy_hashing(stream, out, hasher, remaining)
+        except UploadError:
+            out.truncate(offset)
+            raise
+        out.truncate(offset + written)
+    upload.received_bytes = offset + written
+
+    if upload.received_bytes < upload.total_size:
+        with _hashers_lock:
+            _hashers[upload.id] = (upload.received_bytes, hasher)
+        db.session.commit()
+        return None
+
+    try:
+        upload.mime_type = _accepted_type(path)
+    except UploadError:
+        abort_upload(upload)
+        raise
+    stored = _acquire_blob(path, hasher.hexdigest(), upload.total_size, upload.mime_type)
+    doc = _create_document(upload.student_id, upload.application_id, upload.document_type,
+                           upload.filename, upload.mime_type, stored)
+    db.session.flush()
+    upload.status = "complete"
+    upload.document_id = doc.id
+    db.session.commit()
+    return doc
+
+
+def abort_upload(upload):
+    with _hashers_lock:
+        _hashers.pop(upload.id, None)
+    if os.path.exists(partial_path(upload.id)):
+        os.remove(partial_path(upload.id))
+    upload.status = "aborted"
+    db.session.commit()
+
+
+# ─────────────────────────────────────────────
+# MAINTENANCE
+# ─────────────────────────────────────────────
+def reconcile_ref_counts():
+    """Recompute stored_files.ref_count from documents; returns rows corrected."""
+    counts = db.select(db.func.count(Document.id)).where(Document.stored_file_id == StoredFile.id) \
+        .correlate(StoredFile).scalar_subquery()
+    fixed = db.session.execute(
+        db.update(StoredFile).where(StoredFile.ref_count != counts).values(ref_count=counts)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.session.commit()
+    return fixed
+
+
+def _sweep_orphan_blobs(grace_hours):
+    """Remove files in the store that no StoredFile row references; returns files removed.
+
+    Files younger than `grace_hours` are skipped: they may belong to an
+    upload whose transaction has not committed yet.
+    """
+    cutoff = (datetime.utcnow() - timedelta(hours=grace_hours)).timestamp()
+    candidates = {}
+    for directory, _, names in os.walk(store_root()):
+        for name in names:
+            path = os.path.join(directory, name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    candidates[name] = path
+            except FileNotFoundError:
+                continue
+    removed = 0
+    digests = list(candidates)
+    for start in range(0, len(digests), 500):
+        batch = digests[start:start + 500]
+        known = set(db.session.execute(
+            db.select(StoredFile.sha256).where(StoredFile.sha256.in_(batch))
+        ).scalars())
+        for digest in batch:
+            if digest not in known and os.path.exists(candidates[digest]):
+                os.remove(candidates[digest])
+                removed += 1
+    return removed
+
+
+def collect_garbage(partial_max_age_hours=48, orphan_grace_hours=None):
+    """Delete unreferenced blobs, orphaned store files and stale partial uploads.
+
+    Returns (blobs, partials) removed; blobs counts orphaned files too.
+    """
+    if orphan_grace_hours is None:
+        orphan_grace_hours = current_app.config["DOCUMENT_ORPHAN_GRACE_HOURS"]
+    reconcile_ref_counts()
+    blobs = 0
+    for stored in StoredFile.query.filter(StoredFile.ref_count <= 0).all():
+        path = blob_path(stored)
+        # Re-check under the row delete and unlink before committing: an upload
+        # of the same bytes either bumped the row first (nothing is deleted) or
+        # waits on the delete and then finds the file gone and writes its own.
+        deleted = db.session.execute(
+            db.delete(StoredFile).where(StoredFile.id == stored.id, StoredFile.ref_count <= 0)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        if deleted and os.path.exists(path):
+            os.remove(path)
+            blobs += 1
+        db.session.commit()
+    blobs += _sweep_orphan_blobs(orphan_grace_hours)
+
+    cutoff = datetime.utcnow() - timedelta(hours=partial_max_age_hours)
+    stale = UploadSession.query.filter(UploadSession.status == "uploading", UploadSession.updated_at < cutoff).all()
+    for upload in stale:
+        abort_upload(upload)
+    return blobs, len(stale)
+
+
+def import_legacy_uploads():
+    """Move pre-store documents (static/uploads/…) into the content-addressed store."""
+    moved = 0
+    static_root = os.path.dirname(current_app.config["UPLOAD_FOLDER"])
+    os.makedirs(current_app.config["UPLOAD_TMP_FOLDER"], exist_ok=True)
+    for doc in Document.query.filter(Document.stored_file_id.is_(None)).all():
+        source = os.path.join(static_root, doc.file_path)
+        if not os.path.exists(source):
+            continue
+        temp_path = partial_path(uuid.uuid4().hex)
+        hasher = hashlib.sha256()
+        with open(source, "rb") as src, open(temp_path, "wb") as out:
+            size = _copy_hashing(src, out, hasher, float("inf"))
+        doc.mime_type = sniff_type(temp_path)
+        stored = _acquire_blob(temp_path, hasher.hexdigest(), size, doc.mime_type)
+        doc.stored_file_id = stored.id
+        doc.file_path = stored.storage_path
+        doc.file_size = size
+        db.session.commit()
+        os.remove(source)
+        moved += 1
+    return moved
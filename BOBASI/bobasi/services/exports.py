@@ -0,0 +1,257 @@
+"""
+Bobasi BBS - Streaming Exports
+CSV and XLSX extracts are produced by generators over server-side
+(yield_per) result iteration, so memory stays flat however many rows the
+filter matches. XLSX is written directly as a streamed zip of
+SpreadsheetML with inline strings; no spreadsheet library is needed.
+
+Text in CSV cells that a spreadsheet would read as a formula (leading =,
++, -, @, tab or carriage return) is prefixed with an apostrophe. XLSX
+inline strings are never evaluated, so they are written as-is.
+"""
+import csv
+import io
+import re
+import zipfile
+from datetime import date, datetime
+from xml.sax.saxutils import escape
+from flask import Response, stream_with_context
+from models.models import db, Application, Disbursement, Loan, Student, User
+
+YIELD_PER = 1000
+FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+XML_ILLEGAL = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f]")  # control characters XML 1.0 cannot carry
+FORMATS = {
+    "csv": "text/csv; charset=utf-8",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+
+
+# ─────────────────────────────────────────────
+# EXPORT DEFINITIONS — (header, column expression)
+# ─────────────────────────────────────────────
+APPLICATION_COLUMNS = [
+    ("Application No.", Application.application_number),
+    ("Student", Student.full_name),
+    ("Admission No.", Student.admission_number),
+    ("Ward", Student.ward),
+    ("Sub-County", Student.sub_county),
+    ("Academic Year", Application.academic_year),
+    ("Institution", Application.institution),
+    ("Course", Application.course),
+    ("Level of Study", Application.level_of_study),
+    ("Requested (KShs)", Application.requested_amount),
+    ("Approved (KShs)", Application.approved_amount),
+    ("Status", Application.status),
+    ("Reviewed By", Application.reviewed_by),
+    ("Submitted", Application.submitted_at),
+    ("Approved", Application.approved_at),
+    ("Disbursed", Application.disbursed_at),
+]
+
+STUDENT_COLUMNS = [
+    ("Full Name", Student.full_name),
+    ("Admission No.", Student.admission_number),
+    ("ID Number", Student.id_number),
+    ("Email", User.email),
+    ("Phone", Student.phone),
+    ("Gender", Student.gender),
+    ("Institution", Student.institution),
+    ("Course", Student.course),
+    ("Level of Study", Student.level_of_study),
+    ("Year of Study", Student.year_of_study),
+    ("Sub-County", Student.sub_county),
+    ("Ward", Student.ward),
+    ("Location", Student.location),
+    ("Family Status", Student.family_status),
+    ("Registered", Student.created_at),
+]
+
+DISBURSEMENT_COLUMNS = [
+    ("Reference", Disbursement.reference_number),
+    ("Application No.", Application.application_number),
+    ("Student", Student.full_name),
+    ("Ward", Student.ward),
+    ("Institution", Student.institution),
+    ("Amount (KShs)", Disbursement.amount),
+    ("Payment Method", Disbursement.payment_method),
+    ("Bank", Disbursement.bank_name),
+    ("Account No.", Disbursement.account_number),
+    ("Status", Disbursement.status),
+    ("Officer", User.name),
+    ("Date", Disbursement.disbursement_date),
+]
+
+GRANT_COLUMNS = [
+    ("Application No.", Application.application_number),
+    ("Student", Student.full_name),
+    ("Institution", Student.institution),
+    ("Amount (KShs)", Loan.principal_amount),
+    ("Status", Loan.status),
+    ("Start Date", Loan.start_date),
+    ("Recorded", Loan.created_at),
+]
+
+
+def application_rows(query):
+    return query.join(Student, Student.id == Application.student_id) \
+        .with_entities(*(c for _, c in APPLICATION_COLUMNS)).order_by(None).order_by(Application.id)
+
+
+def student_rows(query):
+    return query.join(User, User.id == Student.user_id) \
+        .with_entities(*(c for _, c in STUDENT_COLUMNS)).order_by(None).order_by(Student.id)
+
+
+def disbursement_rows(query):
+    return query.join(Application, Application.id == Disbursement.application_id) \
+        .join(Student, Student.id == Disbursement.student_id) \
+        .outerjoin(User, User.id == Disbursement.finance_officer_id) \
+        .with_entities(*(c for _, c in DISBURSEMENT_COLUMNS)).order_by(None).order_by(Disbursement.id)
+
+
+def grant_rows(query):
+    return query.join(Application, Application.id == Loan.application_id) \
+        .join(Student, Student.id == Loan.student_id) \
+        .with_entities(*(c for _, c in GRANT_COLUMNS)).order_by(None).order_by(Loan.id)
+
+
+# ─────────────────────────────────────────────
+# WRITERS
+# ─────────────────────────────────────────────
+def _cell_text(value):
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return value.strftime("%Y-%m-%d %H:%M")
+    if isinstance(value, date):
+        return value.isoformat()
+    return value
+
+
+def _csv_cell(value):
+    value = _cell_text(value)
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def _iter_rows(query):
+    return query.execution_options(yield_per=YIELD_PER)
+
+
+def csv_stream(headers, query):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([_csv_cell(h) for h in headers])
+    for i, row in enumerate(_iter_rows(query), 1):
+        writer.writerow([_csv_cell(v) for v in row])
+        if i % 200 == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+class _Sink:
+    """Write-only file object for ZipFile; drained by the generator after each write."""
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def _column_name(index):
+    name = ""
+    index += 1
+    while index:
+        index, rem = divmod(index - 1, 26)
+        name = chr(65 + rem) + name
+    return name
+
+
+def _xlsx_row(number, values):
+    cells = []
+    for i, value in enumerate(values):
+        ref = f"{_column_name(i)}{number}"
+        if isinstance(value, bool) or value is None:
+            value = "" if value is None else str(value)
+        if isinstance(value, (int, float)):
+            cells.append(f'<c r="{ref}"><v>{value}</v></c>')
+        else:
+            text = escape(XML_ILLEGAL.sub("", str(_cell_text(value))))
+            cells.append(f'<c r="{ref}" t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>')
+    return f'<row r="{number}">{"".join(cells)}</row>'
+
+
+_XLSX_STATIC = {
+    "[Content_Types].xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    "_rels/.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    "xl/_rels/workbook.xml.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>'
+        '</Relationships>'
+    ),
+}
+
+
+def xlsx_stream(headers, query, sheet_name="Export"):
+    sink = _Sink()
+    with zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_DEFLATED) as zf:
+        for name, body in _XLSX_STATIC.items():
+            zf.writestr(name, body)
+        zf.writestr("xl/workbook.xml", (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+            'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+            f'<sheets><sheet name="{escape(sheet_name[:31])}" sheetId="1" r:id="rId1"/></sheets></workbook>'
+        ))
+        yield sink.drain()
+        with zf.open("xl/worksheets/sheet1.xml", mode="w", force_zip64=True) as sheet:
+            sheet.write(b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                        b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>')
+            sheet.write(_xlsx_row(1, headers).encode("utf-8"))
+            for number, row in enumerate(_iter_rows(query), 2):
+                sheet.write(_xlsx_row(number, row).encode("utf-8"))
+                if number % 200 == 0:
+                    yield sink.drain()
+            sheet.write(b"</sheetData></worksheet>")
+    yield sink.drain()
+
+
+def export_response(fmt, filename, columns, query):
+    """Streamed download of `query` (already shaped by one of the *_rows helpers)."""
+    headers = [h for h, _ in columns]
+    stem = f"{filename}-{datetime.now().strftime('%Y%m%d-%H%M')}"
+    if fmt == "xlsx":
+        body = xlsx_stream(headers, query, sheet_name=filename.title())
+    else:
+        fmt, body = "csv", csv_stream(headers, query)
+    response = Response(stream_with_context(body), mimetype=FORMATS[fmt])
+    response.headers["Content-Disposition"] = f'attachment; filename="{stem}.{fmt}"'
+    response.headers["Cache-Control"] = "no-store"
+    return response
@@ -0,0 +1,144 @@
+"""
+Bobasi BBS - Cached User Loader
+Flask-Login rebuilds current_user on every request. Instead of loading
+the users row each time, a per-process LRU/TTL cache keeps a lightweight
+snapshot (id, name, email, role, status). Anything else — relationships,
+password checks — transparently loads the real User row.
+
+The unread-notification badge is deliberately not part of the snapshot:
+the counter is bumped by outbox workers and bulk inserts in any process,
+so it is read live from users.unread_notification_count (one primary-key
+lookup, at most once per request).
+
+Routes that change a user call invalidate_user() after committing.
+Suspensions and password changes also bump a generation file that every
+worker process on the host stats on each lookup, so they take effect
+everywhere on the very next request rather than after the TTL.
+"""
+import os
+import threading
+from flask import current_app, g
+from flask_login import UserMixin
+from models.models import db, User
+from services.cache import TTLCache
+
+SNAPSHOT_FIELDS = ("id", "name", "email", "role", "status")
+
+_lock = threading.Lock()
+
+
+class UserSnapshot(UserMixin):
+    """Read-only stand-in for User; unknown attributes fall through to the real row."""
+
+    def __init__(self, values):
+        self.__dict__.update(values)
+
+    @classmethod
+    def from_user(cls, user):
+        return cls({f: getattr(user, f) for f in SNAPSHOT_FIELDS})
+
+    def _user(self):
+        # One real load per request at most; the session identity map does the rest
+        return db.session.get(User, self.id)
+
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        return getattr(self._user(), name)
+
+    def is_admin(self):
+        return self.role == "admin"
+
+    def is_finance(self):
+        return self.role == "finance_officer"
+
+    def is_committee(self):
+        return self.role == "review_committee"
+
+    def is_student(self):
+        return self.role == "student"
+
+    @property
+    def is_active(self):
+        return self.status == "active"
+
+    @property
+    def unread_notifications(self):
+        cached = g.get("unread_notifications")
+        if cached is None or cached[0] != self.id:
+            count = db.session.execute(
+                db.select(User.unread_notification_count).where(User.id == self.id)
+            ).scalar()
+            cached = g.unread_notifications = (self.id, count or 0)
+        return cached[1]
+
+    def __repr__(self):
+        return f"<UserSnapshot {self.email} [{self.role}]>"
+
+
+def _generation_file():
+    return current_app.config["USER_CACHE_GENERATION_FILE"]
+
+
+def _generation():
+    try:
+        return os.stat(_generation_file()).st_mtime_ns
+    except FileNotFoundError:
+        return 0
+
+
+def _cache():
+    """The process-wide cache, emptied when another process bumped the generation file."""
+    state = current_app.extensions.get("user_cache")
+    generation = _generation()
+    if state is None or state["generation"] != generation:
+        with _lock:
+            state = current_app.extensions.get("user_cache")
+            if state is None:
+                state = {"cache": TTLCache(ttl=current_app.config["USER_CACHE_TTL"],
+                                           maxsize=current_app.config["USER_CACHE_SIZE"]),
+                         "generation": generation}
+                current_app.extensions["user_cache"] = state
+            elif state["generation"] != generation:
+                state["cache"].invalidate()
+                state["generation"] = generation
+    return state["cache"]
+
+
+def load_user(user_id):
+    """Flask-Login user_loader: a cached snapshot, or None for unknown / suspended / inactive users."""
+    try:
+        user_id = int(user_id)
+    except (TypeError, ValueError):
+        return None
+    if current_app.config["USER_CACHE_TTL"] <= 0:
+        user = db.session.get(User, user_id)
+        return user if user and user.status == "active" else None
+
+    cache = _cache()
+    snapshot = cache.get(user_id)
+    if snapshot is None:
+        user = db.session.get(User, user_id)
+        if user is None:
+            return None
+        snapshot = UserSnapshot.from_user(user)
+        cache.set(user_id, snapshot)
+    return snapshot if snapshot.status == "active" else None
+
+
+def invalidate_user(user_id=None, broadcast=False):
+    """Drop a user's snapshot (all when user_id is None). Call after the change is committed.
+
+    broadcast=True also tells the other worker processes; use it for changes that must
+    apply immediately everywhere (suspension, password change).
+    """
+    state = current_app.extensions.get("user_cache")
+    if state is not None:
+        state["cache"].invalidate(user_id)
+    if broadcast:
+        path = _generation_file()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "a"):
+            os.utime(path)
+        if state is not None:
+            state["generation"] = _generation()
@@ -0,0 +1,28 @@
+"""
+Bobasi BBS - Eager-Loading Profiles
+Named loader options for listing pages, so each row's related objects
+are fetched with the page instead of one lazy load per row.
+"""
+from models.models import db, Application, Disbursement, Loan, Review
+
+LOADER_PROFILES = {
+    # admin.applications, admin.dashboard, finance.disburse
+    "application_list": lambda: (db.joinedload(Application.student),),
+    # finance.disbursements, finance.dashboard
+    "disbursement_list": lambda: (
+        db.joinedload(Disbursement.student),
+        db.joinedload(Disbursement.finance_officer),
+    ),
+    # finance.grants, student.my_disbursements
+    "grant_list": lambda: (
+        db.joinedload(Loan.student),
+        db.joinedload(Loan.application),
+    ),
+    # admin.view_application
+    "review_list": lambda: (db.joinedload(Review.reviewer),),
+}
+
+
+def with_profile(query, profile):
+    """Apply a named loader profile to a query."""
+    return query.options(*LOADER_PROFILES[profile]())
@@ -0,0 +1,239 @@
+"""
+Bobasi BBS - Synthetic Load Data
+Fills a database with realistic students, applications, reviews, document
+metadata, disbursements (with their grant records) and notifications, so
+pages and benchmarks can be measured at e.g. 100k students / 500k
+applications (`flask generate-load-data`).
+
+Rows go in with bulk INSERTs in batches of students, which skip the mapper
+hooks; the derived tables those hooks maintain (unread counters, the
+disbursement rollup, the search index and the reporting cube) are rebuilt
+once at the end. Run it against an idle database: ids are assigned here.
+"""
+import random
+import time
+from datetime import datetime, timedelta
+from werkzeug.security import generate_password_hash
+from models.models import (
+    db, seed_defaults, User, Student, Application, Review, Document, Disbursement, Loan, Notification,
+)
+
+PASSWORD = "Student@1234"  # every synthetic student can log in with this
+
+SUB_COUNTIES = {
+    "Bobasi Central": ["Masige West", "Masige East", "Basi Central"],
+    "Bobasi Chache": ["Basi Chache", "Nyacheki"],
+    "Bobasi North": ["Bassi Bogetaorio", "Bobasi Bogetaorio"],
+    "Bobasi South West": ["Sameta/Mokwerero", "Bomariba"],
+    "Matibabu": ["Matibabu", "Riosiri"],
+    "Nyacheki": ["Nyacheki", "Bobaracho"],
+    "Boochi/Tendere": ["Boochi/Tendere", "Mogenda"],
+    "Boochi West": ["Boochi West", "Nyamonyo"],
+}
+LOCATIONS_PER_WARD = 4
+LEVELS = [("Certificate", 0.10), ("Diploma", 0.30), ("Degree", 0.50), ("Masters", 0.08), ("PHD", 0.02)]
+INSTITUTIONS = [
+    "Kisii University", "Maseno University", "Moi University", "University of Nairobi", "Kenyatta University",
+    "Egerton University", "Jomo Kenyatta University", "Kisii National Polytechnic", "Gusii Institute of Technology",
+    "Kenya Medical Training College", "Rift Valley Institute of Science and Technology", "Strathmore University",
+    "Technical University of Kenya", "Mount Kenya University", "Kabarak University",
+]
+COURSES = ["BSc Computer Science", "BEd Arts", "BCom", "Diploma in Nursing", "Diploma in ICT", "BSc Agriculture",
+           "Certificate in Electrical Installation", "LLB", "BSc Civil Engineering", "MBA", "Diploma in Education"]
+FIRST_NAMES = ["Brian", "Faith", "Dennis", "Mercy", "Kevin", "Sharon", "Evans", "Nancy", "Collins", "Lilian",
+               "Victor", "Esther", "Duncan", "Caroline", "Felix", "Beatrice", "Geoffrey", "Purity", "Enock", "Joyce"]
+SURNAMES = ["Ongeri", "Nyaboke", "Mokaya", "Kerubo", "Onyancha", "Moraa", "Nyakundi", "Bosibori", "Omwenga",
+            "Kwamboka", "Ondieki", "Nyamweya", "Ratemo", "Obure", "Matara", "Mogaka", "Nyangau", "Areri"]
+DOCUMENT_TYPES = ["national_id", "admission_letter", "fee_structure", "transcript", "parent_id",
+                  "birth_certificate", "bank_statement", "death_certificate"]
+PAYMENT_METHODS = [("bank_transfer", 0.5), ("mpesa", 0.35), ("cheque", 0.1), ("cash", 0.05)]
+FAMILY_STATUSES = [("both_parents_alive", 0.7), ("partial_orphan", 0.22), ("total_orphan", 0.08)]
+
+# Status mix for the current academic year and for earlier (closed) years
+CURRENT_STATUSES = [("pending", 0.35), ("under_review", 0.25), ("approved", 0.15), ("rejected", 0.1),
+                    ("disbursed", 0.15)]
+PAST_STATUSES = [("rejected", 0.2), ("disbursed", 0.35), ("completed", 0.45)]
+
+
+def _pick(rng, weighted):
+    return rng.choices([v for v, _ in weighted], weights=[w for _, w in weighted])[0]
+
+
+def academic_years(count, current=None):
+    """The last `count` academic years, oldest first, ending with the current one ('2025/2026')."""
+    now = datetime.utcnow()
+    start = current or (now.year if now.month >= 8 else now.year - 1)
+    return [f"{y}/{y + 1}" for y in range(start - count + 1, start + 1)]
+
+
+def _next_ids():
+    models = (User, Student, Application, Review, Document, Disbursement, Loan, Notification)
+    return {m: (db.session.query(db.func.max(m.id)).scalar() or 0) + 1 for m in models}
+
+
+class _Batch:
+    """Rows for one batch of students, keyed by model, with ids assigned from running counters."""
+
+    def __init__(self, ids):
+        self.ids = ids
+        self.rows = {m: [] for m in ids}
+
+    def add(self, model, **row):
+        row["id"] = self.ids[model]
+        self.ids[model] += 1
+        self.rows[model].append(row)
+        return row
+
+    def flush(self):
+        for model, rows in self.rows.items():
+            if rows:
+                db.session.execute(db.insert(model), rows)
+        db.session.commit()
+
+
+def _student(batch, rng, password_hash, now):
+    first, surname = rng.choice(FIRST_NAMES), rng.choice(SURNAMES)
+    name = f"{first} {surname}"
+    joined = now - timedelta(days=rng.randint(0, 5 * 365))
+    user = batch.add(User, name=name, email=f"{first.lower()}.{surname.lower()}.{batch.ids[User]}@students.test",
+                     password_hash=password_hash, role="student", status="active", email_verified=True,
+                     unread_notification_count=0, created_at=joined, updated_at=joined)
+    sub_county = rng.choice(list(SUB_COUNTIES))
+    ward = rng.choice(SUB_COUNTIES[sub_county])
+    family = _pick(rng, FAMILY_STATUSES)
+    father = 0 if family == "total_orphan" else rng.choice([0, 5000, 8000, 12000, 20000, 35000])
+    mother = 0 if family == "total_orphan" else rng.choice([0, 3000, 6000, 10000, 15000])
+    sid = batch.ids[Student]
+    student = batch.add(
+        Student, user_id=user["id"], full_name=name, admission_number=f"ADM/SYN/{sid:07d}",
+        institution=rng.choice(INSTITUTIONS), course=rng.choice(COURSES), year_of_study=rng.randint(1, 5),
+        level_of_study=_pick(rng, LEVELS), id_number=f"SYN{sid:09d}", phone=f"07{rng.randint(0, 99999999):08d}",
+        gender=rng.choice(["male", "female"]), sub_county=sub_county, ward=ward,
+        location=f"{ward} Location {rng.randint(1, LOCATIONS_PER_WARD)}", registered_voter=rng.choice(["Yes", "No"]),
+        family_status=family, siblings_count=rng.randint(0, 8), father_income=father, mother_income=mother,
+        household_income=father + mother, prev_bursary=rng.choice(["Yes", "No"]), profile_complete=True,
+        created_at=joined, updated_at=joined,
+    )
+    return user, student
+
+
+def _application(batch, rng, student, user, year, current_year, number, officers, reviewers):
+    """One application for `year` plus the rows that follow from its status."""
+    first = int(year[:4])
+    submitted = datetime(first, 8, 1) + timedelta(days=rng.randint(0, 150), minutes=rng.randint(0, 1440))
+    status = _pick(rng, CURRENT_STATUSES if year == current_year else PAST_STATUSES)
+    requested = rng.choice([10000, 15000, 20000, 25000, 30000, 40000, 50000])
+    decided = submitted + timedelta(days=rng.randint(7, 60))
+    approved_amount = None
+    if status in ("approved", "disbursed", "completed"):
+        approved_amount = float(rng.randrange(5000, requested + 1, 1000))
+    app = batch.add(
+        Application, student_id=student["id"], application_number=number, academic_year=year,
+        institution=student["institution"], course=student["course"], level_of_study=student["level_of_study"],
+        requested_amount=float(requested), approved_amount=approved_amount, status=status,
+        purpose="Tuition fees", submitted_at=submitted, created_at=submitted,
+        reviewed_at=decided if status != "pending" else None,
+        approved_at=decided if approved_amount else None,
+        rejection_reason="Incomplete documents" if status == "rejected" else None,
+        updated_at=decided if status != "pending" else submitted,
+    )
+
+    for doc_type in rng.sample(DOCUMENT_TYPES, rng.randint(2, 4)):
+        batch.add(Document, student_id=student["id"], application_id=app["id"], document_type=doc_type,
+                  document_name=f"{doc_type}.pdf", file_path=f"synthetic/{app['id']}/{doc_type}.pdf",
+                  file_size=rng.randint(40_000, 2_000_000), mime_type="application/pdf",
+                  status="pending" if status == "pending" else "verified", uploaded_at=submitted)
+
+    notices = [("Application Submitted", f"Your application {number} has been received.", "application",
+                submitted)]
+    if status != "pending" and reviewers:
+        for reviewer in rng.sample(reviewers, min(len(reviewers), rng.randint(1, 2))):
+            batch.add(Review, application_id=app["id"], reviewer_id=reviewer,
+                      decision="recommend_rejection" if status == "rejected" else "recommend_approval",
+                      recommended_amount=approved_amount, comments="Meets the criteria" if approved_amount else
+                      "Does not meet the criteria", review_date=decided - timedelta(days=rng.randint(1, 5)))
+        if status != "under_review":
+            notices.append((f"Application {status.replace('_', ' ').title()}",
+                            f"Your application {number} is now {status}.", "application", decided))
+
+    if status in ("disbursed", "completed"):
+        paid_on = decided + timedelta(days=rng.randint(3, 45))
+        method = _pick(rng, PAYMENT_METHODS)
+        reference = f"BOB-DISB-{paid_on:%Y%m%d}-S{app['id']:09d}"
+        batch.add(Disbursement, application_id=app["id"], student_id=student["id"],
+                  finance_officer_id=rng.choice(officers), amount=approved_amount, disbursement_date=paid_on,
+                  payment_method=method, reference_number=reference, status="processed", created_at=paid_on)
+        # The grant record finance.disburse creates alongside each disbursement
+        batch.add(Loan, application_id=app["id"], student_id=student["id"], principal_amount=approved_amount,
+                  interest_rate=0.0, repayment_period_months=0, monthly_installment=0,
+                  total_payable=approved_amount, balance_remaining=0, start_date=f"{paid_on:%Y-%m-%d}",
+                  due_date=f"{paid_on:%Y-%m-%d}", status="completed" if status == "completed" else "active",
+                  created_at=paid_on, updated_at=paid_on)
+        app["disbursed_at"] = paid_on
+        notices.append(("🎉 Bursary Funds Disbursed", f"KShs {approved_amount:,.0f} has been disbursed for "
+                        f"{number}. Reference: {reference}.", "disbursement", paid_on))
+
+    for title, message, kind, at in notices:
+        is_read = year != current_year or rng.random() < 0.6
+        batch.add(Notification, user_id=user["id"], title=title, message=message, type=kind,
+                  is_read=is_read, created_at=at)
+        if not is_read:
+            user["unread_notification_count"] += 1
+
+
+def generate_load_data(students=1000, applications_per_student=3.0, years=5, batch_size=1000, seed=None,
+                       progress=None):
+    """
+    Add `students` synthetic students (on top of seed_defaults()) with on
+    average `applications_per_student` applications spread over the last
+    `years` academic years. Returns {table: rows added} and the time taken.
+    """
+    from services.sequences import reserve_application_numbers
+    from services.rollups import rebuild_disbursement_rollup
+    from services.search import rebuild_search_index
+    from services.report_cube import refresh_report_cube
+    from services.stats import invalidate_stats
+
+    started = time.perf_counter()
+    rng = random.Random(seed)
+    seed_defaults()
+    officers = [u.id for u in User.query.filter_by(role="finance_officer")] or \
+        [u.id for u in User.query.filter_by(role="admin")]
+    reviewers = [u.id for u in User.query.filter_by(role="review_committee")]
+    year_list = academic_years(years)
+    current_year = year_list[-1]
+    password_hash = generate_password_hash(PASSWORD)  # hashing per student would dominate the run
+    now = datetime.utcnow()
+
+    ids = _next_ids()
+    first_ids = dict(ids)
+    done = 0
+    while done < students:
+        size = min(batch_size, students - done)
+        batch = _Batch(ids)
+        plans = []
+        for _ in range(size):
+            user, student = _student(batch, rng, password_hash, now)
+            # Each student applies in some of the years, at most once per year
+            count = min(years, max(1, round(rng.gauss(applications_per_student, 1))))
+            plans.append((user, student, sorted(rng.sample(year_list, count))))
+        by_calendar_year = {}
+        for _, _, applied in plans:
+            for year in applied:
+                by_calendar_year[int(year[:4])] = by_calendar_year.get(int(year[:4]), 0) + 1
+        numbers = {y: iter(reserve_application_numbers(y, n)) for y, n in by_calendar_year.items()}
+        for user, student, applied in plans:
+            for year in applied:
+                _application(batch, rng, student, user, year, current_year, next(numbers[int(year[:4])]),
+                             officers, reviewers)
+        batch.flush()
+        done += size
+        if progress:
+            progress(done, students)
+
+    rebuild_disbursement_rollup()
+    rebuild_search_index()
+    refresh_report_cube(full=True)
+    invalidate_stats()
+    added = {model.__tablename__: ids[model] - first_ids[model] for model in ids}
+    return added, time.perf_counter() - started
@@ -0,0 +1,85 @@
+"""
+Bobasi BBS - Loan Ledger
+Repayments are an append-only ledger. Payments, reversals and adjustments
+are all Repayment rows; the mapper hooks in models.py move the loan's
+amount_paid and balance_remaining in the same transaction as each entry,
+so listings read the running totals instead of summing repayments per row.
+
+check_loan_balances() recomputes both from the ledger in SQL (through the
+Loan.total_paid hybrid) and reports or repairs any loan that has drifted
+(`flask check-loan-balances`).
+"""
+from datetime import datetime
+from models.models import db, Loan, Repayment
+
+TOLERANCE = 0.005  # amounts are floats; differences below half a cent are rounding
+
+
+def _add_entry(loan, amount, entry_type, **fields):
+    entry = Repayment(loan_id=loan.id, student_id=loan.student_id, amount=amount, entry_type=entry_type, **fields)
+    db.session.add(entry)
+    db.session.commit()
+    db.session.refresh(loan)  # the hooks updated the loan row with Core statements
+    return entry
+
+
+def record_repayment(loan, amount, payment_method, recorded_by=None, reference_number=None, notes=None,
+                     payment_date=None):
+    """Record a payment against a loan; returns the ledger entry."""
+    if amount is None or amount <= 0:
+        raise ValueError("Repayment amount must be greater than zero.")
+    return _add_entry(loan, amount, "payment", payment_method=payment_method, recorded_by=recorded_by,
+                      reference_number=reference_number, notes=notes,
+                      payment_date=payment_date or datetime.utcnow())
+
+
+def reverse_repayment(repayment, recorded_by=None, reason=None):
+    """Undo a payment (e.g. a bounced cheque) with a reversal entry; returns the reversal."""
+    if repayment.entry_type != "payment":
+        raise ValueError("Only payments can be reversed; record an adjustment instead.")
+    if Repayment.query.filter_by(reverses_id=repayment.id).first():
+        raise ValueError("This payment has already been reversed.")
+    return _add_entry(
+        repayment.loan, -repayment.amount, "reversal", reverses_id=repayment.id,
+        payment_method=repayment.payment_method, recorded_by=recorded_by,
+        reference_number=f"REV-{repayment.reference_number or repayment.id}", notes=reason,
+    )
+
+
+def adjust_loan(loan, amount, recorded_by=None, notes=None):
+    """Correct a loan's paid total by a signed amount (e.g. a waived penalty); returns the entry."""
+    if not amount:
+        raise ValueError("Adjustment amount must not be zero.")
+    if not notes:
+        raise ValueError("Give a reason for the adjustment.")
+    return _add_entry(loan, amount, "adjustment", recorded_by=recorded_by, notes=notes)
+
+
+def check_loan_balances(fix=False, batch_size=1000):
+    """
+    [(loan id, stored paid, ledger paid, stored balance, ledger balance)] for
+    every loan whose running totals disagree with its repayments. With
+    fix=True the totals are rewritten from the ledger.
+    """
+    ledger_paid = Loan.total_paid  # the hybrid's SQL side: the ledger sum
+    expected_balance = Loan.balance_for(Loan, ledger_paid)
+    mismatches = db.session.execute(
+        db.select(Loan.id, Loan.amount_paid, ledger_paid, Loan.balance_remaining, expected_balance)
+        .where(db.or_(
+            db.func.abs(Loan.amount_paid - ledger_paid) > TOLERANCE,
+            Loan.balance_remaining.is_(None),
+            db.func.abs(Loan.balance_remaining - expected_balance) > TOLERANCE,
+        ))
+        .order_by(Loan.id)
+    ).all()
+    if fix and mismatches:
+        ids = [row.id for row in mismatches]
+        for start in range(0, len(ids), batch_size):
+            db.session.execute(
+                db.update(Loan)
+                .where(Loan.id.in_(ids[start:start + batch_size]))
+                .values(amount_paid=ledger_paid, balance_remaining=expected_balance, updated_at=datetime.utcnow())
+                .execution_options(synchronize_session=False)
+            )
+        db.session.commit()
+    return [tuple(row) for row in mismatches]
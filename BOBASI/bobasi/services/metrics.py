@@ -0,0 +1,141 @@
+"""
+Bobasi BBS - Request & SQL Instrumentation
+Per-request statement count, DB time and wall time, exposed as a
+Server-Timing header and aggregated per endpoint into fixed-bucket
+histograms (bounded memory) rendered in Prometheus text format.
+"""
+import threading
+import time
+from flask import g, request, has_request_context
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    __slots__ = ("counts", "total", "count")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(BUCKETS):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.total += value
+        self.count += 1
+
+
+class EndpointStats:
+    __slots__ = ("wall", "db", "statements")
+
+    def __init__(self):
+        self.wall = Histogram()
+        self.db = Histogram()
+        self.statements = 0
+
+
+class MetricsRegistry:
+    """One entry per Flask endpoint, so memory is bounded by the URL map."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._endpoints = {}
+
+    def record(self, endpoint, wall, db_time, statements):
+        with self._lock:
+            stats = self._endpoints.get(endpoint)
+            if stats is None:
+                stats = self._endpoints[endpoint] = EndpointStats()
+            stats.wall.observe(wall)
+            stats.db.observe(db_time)
+            stats.statements += statements
+
+    def render(self):
+        with self._lock:
+            snapshot = sorted(self._endpoints.items())
+            lines = []
+            for name, attr, help_text in (
+                ("bobasi_request_duration_seconds", "wall", "Wall time per request"),
+                ("bobasi_db_duration_seconds", "db", "Time spent in SQL per request"),
+            ):
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} histogram")
+                for endpoint, stats in snapshot:
+                    hist = getattr(stats, attr)
+                    labels = _labels(endpoint)
+                    cumulative = 0
+                    for bound, n in zip(BUCKETS, hist.counts):
+                        cumulative += n
+                        lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+                    lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {hist.count}')
+                    lines.append(f"{name}_sum{{{labels}}} {hist.total:.6f}")
+                    lines.append(f"{name}_count{{{labels}}} {hist.count}")
+            lines.append("# HELP bobasi_sql_statements_total SQL statements executed")
+            lines.append("# TYPE bobasi_sql_statements_total counter")
+            for endpoint, stats in snapshot:
+                lines.append(f"bobasi_sql_statements_total{{{_labels(endpoint)}}} {stats.statements}")
+        return "\n".join(lines) + "\n"
+
+
+def _labels(endpoint):
+    blueprint = endpoint.split(".", 1)[0] if "." in endpoint else ""
+    return f'endpoint="{endpoint}",blueprint="{blueprint}"'
+
+
+registry = MetricsRegistry()
+
+
+# ─────────────────────────────────────────────
+# ENGINE HOOKS (every engine / bind)
+# ─────────────────────────────────────────────
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context():
+        conn.info.setdefault("bobasi_query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if not has_request_context():
+        return
+    starts = conn.info.get("bobasi_query_start")
+    if not starts:
+        return
+    elapsed = time.perf_counter() - starts.pop()
+    g.sql_count = g.get("sql_count", 0) + 1
+    g.sql_time = g.get("sql_time", 0.0) + elapsed
+
+
+def init_metrics(app):
+    if not app.config.get("METRICS_ENABLED", True):
+        return
+
+    if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+
+    @app.before_request
+    def _start_timer():
+        g.request_start = time.perf_counter()
+        g.sql_count = 0
+        g.sql_time = 0.0
+
+    @app.after_request
+    def _record_timing(response):
+        start = g.get("request_start")
+        if start is None:
+            return response
+        wall = time.perf_counter() - start
+        sql_count = g.get("sql_count", 0)
+        sql_time = g.get("sql_time", 0.0)
+        registry.record(request.endpoint or "none", wall, sql_time, sql_count)
+        response.headers.add(
+            "Server-Timing",
+            f'db;dur={sql_time * 1000:.1f};desc="{sql_count} queries", total;dur={wall * 1000:.1f}',
+        )
+        return response
@@ -0,0 +1,46 @@
+"""
+Bobasi BBS - Notification Inbox Operations
+"""
+from models.models import db, User, Notification
+from services.stats import invalidate_student_inbox
+
+
+def mark_notifications_read(user_id, up_to_id=None, ids=None):
+    """
+    Mark a user's unread notifications read with one set-based UPDATE,
+    optionally only those with id <= up_to_id or only the given ids.
+    Returns the number marked.
+
+    Bulk UPDATEs bypass the Notification mapper hooks, so the user's
+    unread counter is decremented here in the same transaction.
+    """
+    stmt = db.update(Notification).where(
+        Notification.user_id == user_id,
+        Notification.is_read.is_(False),
+    )
+    if up_to_id is not None:
+        stmt = stmt.where(Notification.id <= up_to_id)
+    if ids is not None:
+        stmt = stmt.where(Notification.id.in_(ids))
+    marked = db.session.execute(
+        stmt.values(is_read=True).execution_options(synchronize_session=False)
+    ).rowcount
+
+    if marked:
+        users = User.__table__
+        db.session.execute(
+            users.update()
+            .where(users.c.id == user_id)
+            .values(unread_notification_count=users.c.unread_notification_count - marked,
+                    updated_at=users.c.updated_at)
+        )
+    db.session.commit()
+    if marked:
+        invalidate_student_inbox(user_id)
+    return marked
+
+
+def recent_unread(user, limit=5):
+    """Newest unread notifications, served by the (user_id, is_read, created_at) index."""
+    return user.notifications.filter_by(is_read=False).order_by(
+        Notification.created_at.desc()).limit(limit).all()
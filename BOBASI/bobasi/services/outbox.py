@@ -0,0 +1,141 @@
+"""
+Bobasi BBS - Notification Outbox
+Routes call enqueue_notification() inside their own transaction; a small
+background worker pool expands committed outbox rows into bulk
+Notification inserts. Delivery is at-least-once: a row is only marked
+done in the same transaction that inserts its notifications, and failed
+attempts are retried with backoff.
+"""
+from datetime import datetime, timedelta
+from models.models import db, User, Notification, NotificationOutbox
+from services.stats import invalidate_student_inbox
+from services.workers import WakeOnCommit, init_worker_pool
+
+MAX_ATTEMPTS = 5
+
+
+def enqueue_notification(title, message, type="system", user_id=None, roles=None):
+    """Add a fan-out request to the current session (committed with the caller's change)."""
+    entry = NotificationOutbox(
+        recipient_user_id=user_id,
+        recipient_roles=",".join(roles) if roles else None,
+        title=title,
+        message=message,
+        type=type,
+    )
+    db.session.add(entry)
+    db.session.info["outbox_pending"] = True
+    return entry
+
+
+def _recipients(entry):
+    if entry.recipient_user_id is not None:
+        return [entry.recipient_user_id]
+    roles = [r for r in (entry.recipient_roles or "").split(",") if r]
+    if not roles:
+        return []
+    return list(db.session.execute(db.select(User.id).where(User.role.in_(roles))).scalars())
+
+
+def _deliver(entry_id):
+    """Claim, expand and complete one outbox row in a single transaction."""
+    now = datetime.utcnow()
+    claimed = db.session.execute(
+        db.update(NotificationOutbox)
+        .where(NotificationOutbox.id == entry_id, NotificationOutbox.status == "pending")
+        .values(attempts=NotificationOutbox.attempts + 1)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    if not claimed:
+        db.session.rollback()
+        return False
+
+    entry = db.session.get(NotificationOutbox, entry_id)
+    user_ids = _recipients(entry)
+    if user_ids:
+        db.session.execute(db.insert(Notification), [
+            {"user_id": uid, "title": entry.title, "message": entry.message,
+             "type": entry.type, "is_read": False, "created_at": now}
+            for uid in user_ids
+        ])
+        # Bulk inserts skip the Notification mapper hooks, so bump counters here
+        users = User.__table__
+        db.session.execute(
+            users.update()
+            .where(users.c.id.in_(user_ids))
+            .values(unread_notification_count=users.c.unread_notification_count + 1,
+                    updated_at=users.c.updated_at)
+        )
+    entry.status = "done"
+    entry.processed_at = now
+    entry.last_error = None
+    db.session.commit()
+    invalidate_student_inbox(*user_ids)
+    return True
+
+
+def _record_failure(entry_id, error):
+    db.session.rollback()
+    entry = db.session.get(NotificationOutbox, entry_id)
+    if entry is None:
+        return
+    entry.attempts = (entry.attempts or 0) + 1
+    entry.last_error = str(error)[:2000]
+    if entry.attempts >= MAX_ATTEMPTS:
+        entry.status = "failed"
+    else:
+        entry.available_at = datetime.utcnow() + timedelta(seconds=2 ** entry.attempts)
+    db.session.commit()
+
+
+def process_outbox(batch_size=100):
+    """Deliver one batch of due outbox rows. Returns the number delivered."""
+    due = db.session.execute(
+        db.select(NotificationOutbox.id)
+        .where(NotificationOutbox.status == "pending",
+               NotificationOutbox.available_at <= datetime.utcnow())
+        .order_by(NotificationOutbox.id)
+        .limit(batch_size)
+    ).scalars().all()
+    db.session.rollback()
+
+    delivered = 0
+    for entry_id in due:
+        try:
+            delivered += _deliver(entry_id)
+        except Exception as exc:
+            _record_failure(entry_id, exc)
+    return delivered
+
+
+def drain_outbox(batch_size=100, include_delayed=True):
+    """
+    Deliver everything pending, synchronously (tests and `flask drain-outbox`).
+    With include_delayed, rows waiting out a retry backoff are attempted now.
+    """
+    if include_delayed:
+        db.session.execute(
+            db.update(NotificationOutbox)
+            .where(NotificationOutbox.status == "pending")
+            .values(available_at=datetime.utcnow())
+        )
+        db.session.commit()
+    total = 0
+    while True:
+        delivered = process_outbox(batch_size)
+        total += delivered
+        if not delivered:
+            return total
+
+
+# ─────────────────────────────────────────────
+# BACKGROUND WORKER POOL
+# ─────────────────────────────────────────────
+_wakeup = WakeOnCommit("outbox_pending")
+
+
+def init_outbox(app):
+    """Start the worker pool on the first request (so CLI commands don't spawn it)."""
+    init_worker_pool(app, "outbox", process_outbox, _wakeup,
+                     workers=app.config.get("OUTBOX_WORKERS", 2),
+                     poll_interval=app.config.get("OUTBOX_POLL_INTERVAL", 2.0))
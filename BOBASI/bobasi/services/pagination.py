@@ -0,0 +1,128 @@
+"""
+Bobasi BBS - Keyset (Cursor) Pagination
+"""
+import base64
+import json
+from datetime import datetime
+from flask import request, url_for, current_app
+
+
+def encode_cursor(sort_value, row_id):
+    if isinstance(sort_value, datetime):
+        sort_value = sort_value.isoformat()
+    raw = json.dumps([sort_value, row_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """Return (sort_value, id) or None if the cursor is missing or malformed; sort_value may be None."""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        sort_value, row_id = json.loads(raw)
+        return (datetime.fromisoformat(sort_value) if sort_value is not None else None), int(row_id)
+    except (ValueError, TypeError):
+        return None
+
+
+class KeysetPage:
+    """One page of a newest-first listing, with cursors for the neighbouring pages."""
+
+    def __init__(self, items, prev_cursor=None, next_cursor=None):
+        self.items = items
+        self.prev_cursor = prev_cursor
+        self.next_cursor = next_cursor
+
+    @property
+    def has_prev(self):
+        return self.prev_cursor is not None
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def _url(self, **cursor):
+        args = {k: v for k, v in request.args.items() if k not in ("after", "before")}
+        args.update(request.view_args or {})
+        args.update(cursor)
+        return url_for(request.endpoint, **args)
+
+    def next_url(self):
+        return self._url(after=self.next_cursor)
+
+    def prev_url(self):
+        return self._url(before=self.prev_cursor)
+
+    def first_url(self):
+        return self._url()
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    def __bool__(self):
+        return bool(self.items)
+
+
+def keyset_paginate(query, sort_column, id_column, per_page=None, after=None, before=None):
+    """
+    Paginate `query` newest-first on (sort_column, id_column) without OFFSET.
+    `after` / `before` are cursors from a previous page; by default they are
+    read from the request's query string. Rows with a NULL sort value come
+    last, as SQLite and MySQL order them.
+    """
+    per_page = per_page or current_app.config.get("PER_PAGE", 50)
+    if after is None and before is None:
+        after = request.args.get("after")
+        before = request.args.get("before")
+    after_key = decode_cursor(after)
+    before_key = decode_cursor(before)
+
+    limit = per_page + 1
+    if before_key and not after_key:
+        sort_value, row_id = before_key
+        if sort_value is None:
+            # Newer NULL rows first, then the oldest dated ones
+            rows = query.filter(sort_column.is_(None), id_column > row_id) \
+                .order_by(id_column.asc()).limit(limit).all()
+            if len(rows) < limit:
+                rows += query.filter(sort_column.isnot(None)) \
+                    .order_by(sort_column.asc(), id_column.asc()).limit(limit - len(rows)).all()
+        else:
+            rows = query.filter(
+                (sort_column > sort_value) | ((sort_column == sort_value) & (id_column > row_id))
+            ).order_by(sort_column.asc(), id_column.asc()).limit(limit).all()
+        has_more = len(rows) > per_page
+        items = list(reversed(rows[:per_page]))
+        has_prev, has_next = has_more, True
+    else:
+        if after_key and after_key[0] is None:
+            rows = query.filter(sort_column.is_(None), id_column < after_key[1]) \
+                .order_by(id_column.desc()).limit(limit).all()
+        else:
+            if after_key:
+                sort_value, row_id = after_key
+                query_after = query.filter(
+                    (sort_column < sort_value) | ((sort_column == sort_value) & (id_column < row_id))
+                )
+            else:
+                query_after = query
+            rows = query_after.order_by(sort_column.desc(), id_column.desc()).limit(limit).all()
+            if after_key and len(rows) < limit:
+                # The range above stops at the dated rows; NULLs follow them
+                rows += query.filter(sort_column.is_(None)).order_by(id_column.desc()) \
+                    .limit(limit - len(rows)).all()
+        items = rows[:per_page]
+        has_prev, has_next = after_key is not None, len(rows) > per_page
+
+    def key(obj):
+        return encode_cursor(getattr(obj, sort_column.key), getattr(obj, id_column.key))
+
+    return KeysetPage(
+        items,
+        prev_cursor=key(items[0]) if items and has_prev else None,
+        next_cursor=key(items[-1]) if items and has_next else None,
+    )
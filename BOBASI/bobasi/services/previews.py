@@ -0,0 +1,223 @@
+"""
+Bobasi BBS - Document Previews
+Small previews for the review page: the first page of a PDF (rendered by
+poppler's pdftoppm) or a downscaled copy of a JPEG/PNG (Pillow). New
+blobs are queued through stored_files.preview_status and rendered by a
+background worker pool, never in the upload request. Previews live in an
+on-disk cache bounded by PREVIEW_CACHE_MAX_BYTES and evicted
+least-recently-used first; an evicted preview is simply rendered again.
+"""
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+from datetime import datetime, timedelta
+from flask import current_app
+from models.models import db, StoredFile
+from services.documents import sniff_type
+from services.workers import WakeOnCommit, init_worker_pool
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow is optional; image previews are skipped without it
+    Image = ImageOps = None
+
+RENDER_TIMEOUT = 30          # seconds allowed for one pdftoppm call
+STALE_RENDER = timedelta(minutes=10)  # a 'rendering' claim older than this is retried
+
+_cache_lock = threading.Lock()
+
+
+_KINDS = {"application/pdf": "pdf", "image/png": "png", "image/jpeg": "jpeg"}
+
+
+def _sniff(path):
+    """Renderer for the file's real type (uploaded mime types are client-supplied)."""
+    return _KINDS.get(sniff_type(path))
+
+
+def cache_root():
+    return current_app.config["PREVIEW_CACHE"]
+
+
+def preview_path(stored_file):
+    ext = "png" if stored_file.preview_mime == "image/png" else "jpg"
+    return os.path.join(cache_root(), f"{stored_file.sha256}.{ext}")
+
+
+# ─────────────────────────────────────────────
+# RENDERING
+# ─────────────────────────────────────────────
+def _render_image(source, target, size, kind):
+    if Image is None:
+        return None
+    with Image.open(source) as img:
+        img = ImageOps.exif_transpose(img)
+        img.thumbnail((size, size))
+        if kind == "png":
+            img.save(target, "PNG", optimize=True)
+            return "image/png"
+        if img.mode not in ("RGB", "L"):
+            img = img.convert("RGB")
+        img.save(target, "JPEG", quality=75, optimize=True, progressive=True)
+        return "image/jpeg"
+
+
+def _render_pdf(source, target, size):
+    pdftoppm = shutil.which("pdftoppm")
+    if not pdftoppm:
+        return None
+    with tempfile.TemporaryDirectory(dir=cache_root()) as tmp:
+        prefix = os.path.join(tmp, "page")
+        subprocess.run(
+            [pdftoppm, "-f", "1", "-l", "1", "-singlefile", "-jpeg", "-jpegopt", "quality=75",
+             "-scale-to", str(size), source, prefix],
+            check=True, timeout=RENDER_TIMEOUT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        os.replace(prefix + ".jpg", target)
+    return "image/jpeg"
+
+
+def render_preview(source, sha256):
+    """Render a preview of `source` into the cache. Returns its mime type, or None if unsupported."""
+    kind = _sniff(source)
+    if kind is None:
+        return None
+    size = current_app.config["PREVIEW_SIZE"]
+    os.makedirs(cache_root(), exist_ok=True)
+    ext = "png" if kind == "png" else "jpg"
+    target = os.path.join(cache_root(), f"{sha256}.{ext}")
+    partial = f"{target}.{threading.get_ident()}.tmp"
+    try:
+        if kind == "pdf":
+            mime = _render_pdf(source, partial, size)
+        else:
+            mime = _render_image(source, partial, size, kind)
+        if mime:
+            os.replace(partial, target)
+            enforce_cache_limit()
+        return mime
+    finally:
+        if os.path.exists(partial):
+            os.remove(partial)
+
+
+# ─────────────────────────────────────────────
+# LRU CACHE
+# ─────────────────────────────────────────────
+def touch(path):
+    """Mark a cached preview as recently used (mtime is the LRU clock)."""
+    try:
+        os.utime(path)
+        return True
+    except FileNotFoundError:
+        return False
+
+
+def enforce_cache_limit(max_bytes=None):
+    """Evict least-recently-used previews until the cache fits; returns files removed."""
+    max_bytes = max_bytes if max_bytes is not None else current_app.config["PREVIEW_CACHE_MAX_BYTES"]
+    with _cache_lock:
+        entries, total = [], 0
+        for entry in os.scandir(cache_root()):
+            if entry.is_file() and not entry.name.endswith(".tmp"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+        removed = 0
+        for _, size, path in sorted(entries):
+            if total <= max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed += 1
+        return removed
+
+
+# ─────────────────────────────────────────────
+# QUEUE
+# ─────────────────────────────────────────────
+def request_preview(stored_file):
+    """Queue a (re-)render, e.g. after the cached preview was evicted."""
+    t = StoredFile.__table__
+    db.session.execute(
+        t.update().where(t.c.id == stored_file.id, t.c.preview_status.in_(("ready", "failed")))
+        .values(preview_status="pending", preview_updated_at=datetime.utcnow())
+    )
+    db.session.info["previews_pending"] = True
+    db.session.commit()
+
+
+def _claim(stored_id):
+    t = StoredFile.__table__
+    now = datetime.utcnow()
+    claimed = db.session.execute(
+        t.update()
+        .where(t.c.id == stored_id, db.or_(
+            t.c.preview_status == "pending",
+            db.and_(t.c.preview_status == "rendering", t.c.preview_updated_at < now - STALE_RENDER),
+        ))
+        .values(preview_status="rendering", preview_updated_at=now)
+    ).rowcount
+    db.session.commit()
+    return bool(claimed)
+
+
+def process_previews(batch_size=20):
+    """Render one batch of queued previews. Returns the number processed."""
+    from services.documents import blob_path
+    cutoff = datetime.utcnow() - STALE_RENDER
+    due = db.session.execute(
+        db.select(StoredFile.id)
+        .where(db.or_(
+            StoredFile.preview_status == "pending",
+            db.and_(StoredFile.preview_status == "rendering", StoredFile.preview_updated_at < cutoff),
+        ))
+        .order_by(StoredFile.id)
+        .limit(batch_size)
+    ).scalars().all()
+    db.session.rollback()
+
+    processed = 0
+    for stored_id in due:
+        if not _claim(stored_id):
+            continue
+        stored = db.session.get(StoredFile, stored_id)
+        try:
+            mime = render_preview(blob_path(stored), stored.sha256)
+            stored.preview_status = "ready" if mime else "unavailable"
+            stored.preview_mime = mime
+        except Exception as exc:
+            current_app.logger.warning("Preview for %s failed: %s", stored.sha256, exc)
+            stored.preview_status = "failed"
+        stored.preview_updated_at = datetime.utcnow()
+        db.session.commit()
+        processed += 1
+    return processed
+
+
+def drain_previews(batch_size=20):
+    """Render everything queued, synchronously (tests and `flask render-previews`)."""
+    total = 0
+    while True:
+        processed = process_previews(batch_size)
+        total += processed
+        if not processed:
+            return total
+
+
+# ─────────────────────────────────────────────
+# BACKGROUND WORKER POOL
+# ─────────────────────────────────────────────
+_wakeup = WakeOnCommit("previews_pending")
+
+
+def init_previews(app):
+    """Start the worker pool on the first request (so CLI commands don't spawn it)."""
+    init_worker_pool(app, "previews", process_previews, _wakeup,
+                     workers=app.config.get("PREVIEW_WORKERS", 2),
+                     poll_interval=app.config.get("PREVIEW_POLL_INTERVAL", 5.0))
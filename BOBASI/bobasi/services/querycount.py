@@ -0,0 +1,81 @@
+"""
+Bobasi BBS - SQL Statement Budgets
+Counts the statements an endpoint issues and checks them against a fixed
+upper bound, so N+1 regressions on listing pages are caught regardless of
+how many rows the database holds.
+"""
+from contextlib import contextmanager
+from sqlalchemy import event
+from models.models import db, User
+
+# endpoint URL → (role to log in as, max SQL statements per request)
+QUERY_BUDGETS = {
+    "/admin/dashboard": ("admin", 10),
+    "/admin/applications": ("admin", 8),
+    "/admin/applications?search=a": ("admin", 8),
+    "/admin/students": ("admin", 8),
+    "/admin/users": ("admin", 6),
+    "/admin/reports": ("admin", 8),
+    "/finance/dashboard": ("finance_officer", 8),
+    "/finance/disburse": ("finance_officer", 6),
+    "/finance/disbursements": ("finance_officer", 6),
+    "/finance/grants": ("finance_officer", 6),
+    "/api/stats": ("admin", 6),
+}
+
+
+class QueryCounter:
+    def __init__(self):
+        self.statements = []
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+
+@contextmanager
+def count_queries(engine=None):
+    """Record every statement executed on `engine` inside the block."""
+    engine = engine or db.engine
+    counter = QueryCounter()
+    event.listen(engine, "after_cursor_execute", counter)
+    try:
+        yield counter
+    finally:
+        event.remove(engine, "after_cursor_execute", counter)
+
+
+@contextmanager
+def assert_max_queries(limit, engine=None):
+    with count_queries(engine) as counter:
+        yield counter
+    if counter.count > limit:
+        raise AssertionError(
+            f"{counter.count} SQL statements (budget {limit}):\n" + "\n".join(counter.statements)
+        )
+
+
+def check_query_budgets(app, budgets=None):
+    """
+    Request each budgeted URL through the test client as a user of the given
+    role and return [(url, statements, budget, status_code)].
+    """
+    results = []
+    for url, (role, budget) in (budgets or QUERY_BUDGETS).items():
+        with app.app_context():
+            user = User.query.filter_by(role=role, status="active").first()
+            if not user:
+                continue
+            user_id = user.id
+        client = app.test_client()
+        with client.session_transaction() as sess:
+            sess["_user_id"] = str(user_id)
+            sess["_fresh"] = True
+        with app.app_context():
+            with count_queries() as counter:
+                resp = client.get(url)
+        results.append((url, counter.count, budget, resp.status_code))
+    return results
@@ -0,0 +1,177 @@
+"""
+Bobasi BBS - Query Plan Checks
+Requests every GET page as a user allowed to see it, runs SQLite's
+EXPLAIN QUERY PLAN on each statement the page issued, and reports full
+scans of the large tables. A missing index shows up here on a handful of
+seed rows long before it shows up as a slow page in production.
+"""
+import re
+from flask import url_for
+from sqlalchemy import event
+from models.models import db, User, Application, Document, DisbursementRun
+from services.search import ensure_search_index
+from services.stats import invalidate_stats
+
+# Tables that grow with the number of students; a plain SCAN of any of these is a regression
+LARGE_TABLES = {
+    "users", "students", "applications", "documents", "reviews", "disbursements",
+    "loans", "repayments", "notifications", "notification_outbox",
+}
+
+# blueprint → role to request its pages as
+BLUEPRINT_ROLES = {
+    "admin": "admin",
+    "api": "admin",
+    "documents": "admin",
+    "finance": "finance_officer",
+    "student": "student",
+    "application": "student",
+    "auth": "student",
+}
+
+# Pages that read whole tables on purpose (streamed exports) or are not pages at all
+EXEMPT_ENDPOINTS = {
+    "static", "auth.logout", "application.chunked_upload_status",
+    "admin.export_applications", "admin.export_students",
+    "finance.export_disbursements", "finance.export_grants",
+}
+
+# Filtered variants of list pages, checked in addition to the bare URLs
+EXTRA_URLS = {
+    "/admin/applications?status=pending": "admin",
+    "/admin/applications?search=kisii": "admin",
+    "/admin/students?search=kisii": "admin",
+    "/finance/disbursements?method=mpesa": "finance_officer",
+    "/finance/disbursements?search=kisii": "finance_officer",
+    "/finance/grants?status=active": "finance_officer",
+    "/api/search?q=kisii": "admin",
+    "/application/track?ref=BBS": "student",
+}
+
+# URL → large tables it may read in full: only the headline dashboard aggregates, which
+# sum every row by design and are cached by services.stats for STATS_CACHE_TTL.
+# List pages get no exemption; a scan there needs an index.
+ALLOWED_SCANS = {
+    "/admin/dashboard": {"disbursements", "loans"},
+    "/finance/dashboard": {"disbursements", "loans"},
+    "/api/stats": {"disbursements", "loans"},
+}
+
+_SCAN = re.compile(r"^SCAN (?:TABLE )?(\w+)(?: AS \w+)?$")
+
+
+def _sample_ids():
+    """Ids to fill URL arguments with, plus the student who owns them."""
+    application = Application.query.order_by(Application.id).first()
+    document = Document.query.order_by(Document.id).first()
+    run = DisbursementRun.query.order_by(DisbursementRun.id).first()
+    ids = {
+        "app_id": application.id if application else None,
+        "student_id": application.student_id if application else None,
+        "doc_id": document.id if document else None,
+        "run_id": run.id if run else None,
+    }
+    owner = application.student.user_id if application else None
+    return ids, owner
+
+
+def plan_urls(app):
+    """[(url, role)] for every checkable GET page, with URL arguments filled from existing rows."""
+    with app.app_context():
+        ids, _ = _sample_ids()
+    urls = {}
+    for rule in app.url_map.iter_rules():
+        if "GET" not in rule.methods or rule.endpoint in EXEMPT_ENDPOINTS:
+            continue
+        values = {arg: ids.get(arg) for arg in rule.arguments}
+        if any(v is None for v in values.values()):
+            continue
+        with app.test_request_context():
+            url = url_for(rule.endpoint, **values)
+        urls[url] = BLUEPRINT_ROLES.get(rule.endpoint.split(".")[0], "admin")
+    urls.update(EXTRA_URLS)
+    return sorted(urls.items())
+
+
+def role_users(app):
+    """role → id of an active user to request pages as (the student owns the sample application)."""
+    with app.app_context():
+        _, owner = _sample_ids()
+        users = {}
+        for role in set(BLUEPRINT_ROLES.values()):
+            user = User.query.filter_by(role=role, status="active")
+            if role == "student" and owner:
+                user = user.filter_by(id=owner)
+            user = user.first()
+            if user:
+                users[role] = user.id
+    return users
+
+
+def logged_in_client(app, user_id):
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess["_user_id"] = str(user_id)
+        sess["_fresh"] = True
+    return client
+
+
+def full_scans(plan_rows):
+    """Large tables read by a plain SCAN (no index) in an EXPLAIN QUERY PLAN result."""
+    scans = []
+    for row in plan_rows:
+        match = _SCAN.match(row[-1])
+        if match and match.group(1) in LARGE_TABLES:
+            scans.append(match.group(1))
+    return scans
+
+
+def _explain(connection, statement, parameters):
+    cursor = connection.cursor()
+    try:
+        cursor.execute("EXPLAIN QUERY PLAN " + statement, parameters)
+        return cursor.fetchall()
+    finally:
+        cursor.close()
+
+
+def check_query_plans(app, urls=None):
+    """
+    Request each URL and return [(url, status_code, statement, [scanned tables])]
+    for every statement that fully scans a large table.
+    """
+    with app.app_context():
+        if db.engine.dialect.name != "sqlite":
+            raise RuntimeError("Query plan checks run against a SQLite database.")
+        ensure_search_index()  # searches are only index-backed once the FTS tables exist
+    invalidate_stats()  # cached list totals would hide their statements from the check
+    users = role_users(app)
+
+    failures = []
+    for url, role in (urls or plan_urls(app)):
+        if role not in users:
+            continue
+        client = logged_in_client(app, users[role])
+        statements = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            if not executemany and statement.lstrip().upper().startswith(("SELECT", "WITH", "UPDATE", "DELETE")):
+                statements.append((statement, parameters))
+
+        with app.app_context():
+            event.listen(db.engine, "after_cursor_execute", record)
+            try:
+                status = client.get(url).status_code
+            finally:
+                event.remove(db.engine, "after_cursor_execute", record)
+            connection = db.engine.raw_connection()
+            try:
+                allowed = ALLOWED_SCANS.get(url, set())
+                for statement, parameters in statements:
+                    scans = [t for t in full_scans(_explain(connection, statement, parameters))
+                             if t not in allowed]
+                    if scans:
+                        failures.append((url, status, statement, scans))
+            finally:
+                connection.close()
+    return failures
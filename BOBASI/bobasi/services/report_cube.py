@@ -0,0 +1,281 @@
+"""
+Bobasi BBS - Reporting Cube
+admin.reports reads pre-aggregated buckets (academic year × sub-county ×
+ward × location × institution × status × level of study) from report_cube
+instead of grouping the applications table on every view.
+
+The cube is refreshed incrementally. Applications changed since the last
+watermark are found through the indexed updated_at / created_at columns,
+which also catches the bulk UPDATE paths that skip mapper hooks. Each one's
+current contribution is then compared with what report_cube_members says
+it contributed last time, and only the difference is applied. Re-examining
+an unchanged application is therefore harmless, which is what lets a
+refresh look back a little past the watermark for late-committing
+transactions. Deleted applications are only dropped by a full rebuild
+(`flask refresh-report-cube --full`).
+
+Refreshes never run inside a page view. Each web process runs one
+background thread that refreshes at most every REPORT_CUBE_REFRESH_INTERVAL
+seconds (the report_cube_state claim keeps it to one refresh per interval
+across processes); set the interval to 0 and run `flask
+refresh-report-cube` from cron instead. The page shows refreshed_at.
+"""
+from collections import defaultdict
+from datetime import datetime, timedelta
+from flask import current_app
+from services.workers import init_worker_pool
+from models.models import (
+    db, Application, Student, Disbursement, ReportCube, ReportCubeMember, ReportCubeState, REPORT_CUBE_KEY,
+)
+
+CHUNK_SIZE = 500
+OVERLAP = timedelta(minutes=10)  # how far before the watermark a refresh looks again
+LOCK_TIMEOUT = timedelta(minutes=15)
+MEASURES = ("requested_amount", "approved_amount", "disbursed_amount", "disbursement_count")
+DRILL_LEVELS = ("sub_county", "ward", "location")
+
+
+# ─────────────────────────────────────────────
+# REFRESH
+# ─────────────────────────────────────────────
+def _contributions(ids):
+    """application id → (cube key, measures) as the application stands now."""
+    paid = (
+        db.select(Disbursement.application_id,
+                  db.func.sum(Disbursement.amount).label("amount"),
+                  db.func.count(Disbursement.id).label("count"))
+        .where(Disbursement.application_id.in_(ids))
+        .group_by(Disbursement.application_id)
+        .subquery()
+    )
+    rows = db.session.execute(
+        db.select(Application.id, Application.academic_year, Student.sub_county, Student.ward, Student.location,
+                  Application.institution, Application.status, Application.level_of_study,
+                  Application.requested_amount, Application.approved_amount, paid.c.amount, paid.c.count)
+        .join(Student, Student.id == Application.student_id)
+        .outerjoin(paid, paid.c.application_id == Application.id)
+        .where(Application.id.in_(ids))
+    ).all()
+    return {
+        r.id: (
+            tuple((v or "").strip() for v in (r.academic_year, r.sub_county, r.ward, r.location,
+                                              r.institution, r.status, r.level_of_study)),
+            {"requested_amount": r.requested_amount or 0, "approved_amount": r.approved_amount or 0,
+             "disbursed_amount": r.amount or 0, "disbursement_count": r.count or 0},
+        )
+        for r in rows
+    }
+
+
+def _recorded(ids):
+    """application id → (cube key, measures) as last applied to the cube."""
+    rows = db.session.execute(
+        db.select(ReportCubeMember, *(getattr(ReportCube, k) for k in REPORT_CUBE_KEY))
+        .join(ReportCube, ReportCube.id == ReportCubeMember.cube_id)
+        .where(ReportCubeMember.application_id.in_(ids))
+    ).all()
+    return {
+        row[0].application_id: (tuple(row[1:]), {m: getattr(row[0], m) for m in MEASURES})
+        for row in rows
+    }
+
+
+def _apply(deltas):
+    """Add each key's deltas to its bucket (creating it); returns key → bucket id."""
+    t = ReportCube.__table__
+    connection = db.session.connection()
+    now = datetime.utcnow()
+    for key, delta in deltas.items():
+        match = [t.c[k] == v for k, v in zip(REPORT_CUBE_KEY, key)]
+        updated = connection.execute(
+            t.update().where(*match)
+            .values(updated_at=now, **{m: t.c[m] + v for m, v in delta.items()})
+        ).rowcount
+        if not updated:
+            connection.execute(t.insert().values(updated_at=now, **dict(zip(REPORT_CUBE_KEY, key)), **delta))
+    if not deltas:
+        return {}
+    rows = connection.execute(
+        db.select(t.c.id, *(t.c[k] for k in REPORT_CUBE_KEY))
+        .where(db.tuple_(*(t.c[k] for k in REPORT_CUBE_KEY)).in_(list(deltas)))
+    ).all()
+    return {tuple(r[1:]): r[0] for r in rows}
+
+
+def _refresh_chunk(ids):
+    """Bring the cube up to date for these applications; returns how many changed."""
+    current, recorded = _contributions(ids), _recorded(ids)
+    deltas = defaultdict(lambda: defaultdict(float))
+    changed = []
+    for app_id in ids:
+        new, old = current.get(app_id), recorded.get(app_id)
+        if new == old:
+            continue
+        changed.append(app_id)
+        for entry, sign in ((old, -1), (new, 1)):
+            if entry is None:
+                continue
+            key, measures = entry
+            deltas[key]["application_count"] += sign
+            for m in MEASURES:
+                deltas[key][m] += sign * measures[m]
+    if not changed:
+        return 0
+
+    bucket_ids = _apply({key: dict(d) for key, d in deltas.items()})
+    db.session.execute(db.delete(ReportCubeMember).where(ReportCubeMember.application_id.in_(changed)))
+    members = [
+        {"application_id": app_id, "cube_id": bucket_ids[current[app_id][0]], **current[app_id][1]}
+        for app_id in changed if app_id in current
+    ]
+    if members:
+        db.session.execute(db.insert(ReportCubeMember), members)
+    db.session.commit()
+    return len(changed)
+
+
+def _changed_since(since):
+    """Ids of applications touched since `since`: edited, paid, or whose student moved."""
+    query = db.union(
+        db.select(Application.id).where(Application.updated_at >= since),
+        db.select(Disbursement.application_id).where(Disbursement.created_at >= since),
+        db.select(Application.id).join(Student, Student.id == Application.student_id)
+        .where(Student.updated_at >= since),
+    )
+    return sorted(db.session.execute(query).scalars().all())
+
+
+def _all_application_ids():
+    last = 0
+    while True:
+        ids = db.session.execute(
+            db.select(Application.id).where(Application.id > last).order_by(Application.id).limit(CHUNK_SIZE)
+        ).scalars().all()
+        if not ids:
+            return
+        yield ids
+        last = ids[-1]
+
+
+def _claim(state_id, now, min_interval=None):
+    """Take the refresh lock (and, with min_interval, only if the last refresh is older than that)."""
+    t = ReportCubeState.__table__
+    condition = [t.c.id == state_id, db.or_(t.c.locked_until.is_(None), t.c.locked_until < now)]
+    if min_interval is not None:
+        condition.append(db.or_(t.c.refreshed_at.is_(None), t.c.refreshed_at < now - min_interval))
+    claimed = db.session.execute(t.update().where(*condition).values(locked_until=now + LOCK_TIMEOUT)).rowcount
+    db.session.commit()
+    return bool(claimed)
+
+
+def _state():
+    state = db.session.get(ReportCubeState, 1)
+    if state is None:
+        db.session.add(ReportCubeState(id=1))
+        db.session.commit()
+        state = db.session.get(ReportCubeState, 1)
+    return state
+
+
+def refresh_report_cube(full=False, min_interval=None):
+    """
+    Apply changes since the watermark (or rebuild everything with full=True).
+    Returns the number of applications whose contribution changed, or None
+    when another refresh holds the lock / the last one is recent enough.
+    """
+    state = _state()
+    started = datetime.utcnow()
+    if not _claim(state.id, started, min_interval):
+        return None
+    changed = 0
+    try:
+        if full or state.watermark is None:
+            db.session.execute(db.delete(ReportCubeMember))
+            db.session.execute(db.delete(ReportCube))
+            db.session.commit()
+            chunks = _all_application_ids()
+        else:
+            ids = _changed_since(state.watermark - OVERLAP)
+            chunks = (ids[i:i + CHUNK_SIZE] for i in range(0, len(ids), CHUNK_SIZE))
+        for ids in chunks:
+            changed += _refresh_chunk(ids)
+        db.session.execute(db.delete(ReportCube).where(ReportCube.application_count <= 0))
+        db.session.execute(db.update(ReportCubeState).where(ReportCubeState.id == state.id)
+                           .values(watermark=started, refreshed_at=datetime.utcnow()))
+    except Exception:
+        db.session.rollback()
+        raise
+    finally:
+        db.session.execute(db.update(ReportCubeState).where(ReportCubeState.id == state.id)
+                           .values(locked_until=None))
+        db.session.commit()
+    return changed
+
+
+def refresh_if_due():
+    """Refresh if the last refresh is older than REPORT_CUBE_REFRESH_INTERVAL (background worker)."""
+    interval = timedelta(seconds=current_app.config.get("REPORT_CUBE_REFRESH_INTERVAL", 60))
+    try:
+        refresh_report_cube(min_interval=interval)
+    except Exception:
+        db.session.rollback()
+        current_app.logger.exception("Report cube refresh failed; reports show the last refreshed figures")
+    return 0  # one refresh per wake-up; the pool sleeps until the next interval
+
+
+def init_report_cube(app):
+    """Start the refresh thread on the first request (so CLI commands don't spawn it)."""
+    interval = app.config.get("REPORT_CUBE_REFRESH_INTERVAL", 60)
+    init_worker_pool(app, "report-cube", refresh_if_due,
+                     workers=1 if interval > 0 else 0, poll_interval=interval)
+
+
+# ─────────────────────────────────────────────
+# QUERIES
+# ─────────────────────────────────────────────
+def refreshed_at(session):
+    """When the cube that `session` reads was last refreshed (None before the first refresh)."""
+    return session.execute(
+        db.select(ReportCubeState.refreshed_at).where(ReportCubeState.id == 1)
+    ).scalar()
+
+
+def year_totals(session):
+    """[(academic year, disbursed)] newest year first."""
+    return session.execute(
+        db.select(ReportCube.academic_year, db.func.sum(ReportCube.disbursed_amount))
+        .group_by(ReportCube.academic_year).order_by(ReportCube.academic_year.desc())
+    ).all()
+
+
+def breakdown(session, column, year, filters=None, order_by_count=False, limit=None):
+    """[(value, applications, requested, approved, disbursed)] grouped by one cube column for a year."""
+    col = getattr(ReportCube, column)
+    count = db.func.sum(ReportCube.application_count)
+    query = (
+        db.select(col, count, db.func.sum(ReportCube.requested_amount),
+                  db.func.sum(ReportCube.approved_amount), db.func.sum(ReportCube.disbursed_amount))
+        .where(ReportCube.academic_year == year,
+               *(getattr(ReportCube, k) == v for k, v in (filters or {}).items()))
+        .group_by(col)
+        .order_by(count.desc() if order_by_count else col)
+    )
+    if limit:
+        query = query.limit(limit)
+    return session.execute(query).all()
+
+
+def compare(current, previous):
+    """Join this year's rows with last year's by label, adding the change in applications."""
+    before = {row[0]: row for row in previous}
+    rows = []
+    for label, count, requested, approved, disbursed in current:
+        prev = before.get(label)
+        prev_count = prev[1] if prev else 0
+        rows.append({
+            "label": label, "count": count, "requested": requested or 0, "approved": approved or 0,
+            "disbursed": disbursed or 0, "prev_count": prev_count,
+            "prev_approved": (prev[3] or 0) if prev else 0,
+            "change": round((count - prev_count) / prev_count * 100, 1) if prev_count else None,
+        })
+    return rows
@@ -0,0 +1,221 @@
+"""
+Bobasi BBS - Reporting Reads
+Dashboards, reports and /api/stats run their GROUP BYs through
+reporting_session() instead of db.session, so they never compete with
+submissions and disbursements for the primary database:
+
+* REPORTING_DATABASE_URL — a read-only replica (e.g. a replicated SQLite
+  file opened with ?mode=ro, or a MySQL/PostgreSQL read replica).
+* REPORTING_SNAPSHOT — a snapshot file copied from the SQLite primary with
+  the online backup API. When it falls more than REPORTING_MAX_STALENESS
+  seconds behind, a background thread re-copies it (at most one copy at a
+  time across all worker processes, through a lock file) and requests read
+  the primary until the new copy is in place. `flask
+  refresh-reporting-snapshot` from cron keeps it fresh without that.
+
+With neither set, reports read the primary as before. A replica that lags
+past the staleness bound is bypassed in favour of the primary. Lag is
+measured from file times (SQLite), SHOW REPLICA STATUS (MySQL) or the last
+replayed transaction (PostgreSQL); on any other replica it cannot be
+measured, the bound is not enforced and a warning is logged once.
+"""
+import os
+import sqlite3
+import threading
+import time
+from flask import current_app, g
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import NullPool
+from models.models import db
+
+STALE_REFRESH_LOCK = 600  # seconds; a lock file older than this was left by a crashed copy
+
+_refresh_lock = threading.Lock()
+_unmeasured_warned = False
+
+
+def init_reporting(app):
+    """Create the reporting engine. It is kept out of SQLALCHEMY_BINDS so create_all never touches it."""
+    snapshot = app.config.get("REPORTING_SNAPSHOT")
+    url = app.config.get("REPORTING_DATABASE_URL")
+    if snapshot:
+        # NullPool: every session opens the current file, so a refreshed snapshot is seen at once
+        engine = create_engine(f"sqlite:///file:{os.path.abspath(snapshot)}?mode=ro&uri=true",
+                               poolclass=NullPool)
+    elif url:
+        engine = create_engine(url, pool_pre_ping=True)
+    else:
+        return
+    app.extensions["reporting_engine"] = engine
+
+    @app.teardown_appcontext
+    def _close_reporting_session(exc):
+        session = g.pop("reporting_session", None)
+        if session is not None and session is not db.session:
+            session.close()
+
+
+def _sqlite_file(engine):
+    url = engine.url
+    if url.get_backend_name() != "sqlite" or not url.database or url.database == ":memory:":
+        return None
+    path = url.database
+    if path.startswith("file:"):
+        path = path[len("file:"):]
+    return path
+
+
+def _last_write(path):
+    """When a SQLite database last changed, counting its WAL file."""
+    times = [os.path.getmtime(p) for p in (path, f"{path}-wal") if os.path.exists(p)]
+    return max(times) if times else None
+
+
+def _replica_lag(engine):
+    """Replication delay reported by a MySQL or PostgreSQL replica; None when it can't be read."""
+    dialect = engine.dialect.name
+    try:
+        with engine.connect() as conn:
+            if dialect == "mysql":
+                try:
+                    row = conn.exec_driver_sql("SHOW REPLICA STATUS").mappings().first()
+                    key = "Seconds_Behind_Source"
+                except Exception:  # MySQL before 8.0.22
+                    row = conn.exec_driver_sql("SHOW SLAVE STATUS").mappings().first()
+                    key = "Seconds_Behind_Master"
+                if row is None:
+                    return 0.0  # not replicating: the URL points at a primary
+                lag = row.get(key)
+                return float("inf") if lag is None else float(lag)  # NULL: replication stopped
+            if dialect == "postgresql":
+                lag = conn.exec_driver_sql(
+                    "SELECT CASE WHEN NOT pg_is_in_recovery() THEN 0 "
+                    "WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+                    "ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END"
+                ).scalar()
+                return float("inf") if lag is None else float(lag)
+    except Exception:
+        current_app.logger.exception("Could not read replication lag from the reporting database")
+    return None
+
+
+def lag_seconds():
+    """
+    How long the reporting copy may have been missing writes. For SQLite:
+    0 while the primary is unchanged since the copy was taken, otherwise
+    the copy's age. For MySQL/PostgreSQL replicas: the replication delay
+    they report. None when it can't be measured.
+    """
+    engine = current_app.extensions["reporting_engine"]
+    primary = _sqlite_file(db.engine)
+    copy = _sqlite_file(engine)
+    if not copy:
+        return _replica_lag(engine)
+    if not primary:
+        return None
+    primary_written, copy_written = _last_write(primary), _last_write(copy)
+    if primary_written is None or copy_written is None:
+        return float("inf")
+    if primary_written <= copy_written:
+        return 0.0
+    return time.time() - copy_written
+
+
+def refresh_snapshot():
+    """Copy the primary into REPORTING_SNAPSHOT (a consistent, read-only copy). Returns seconds taken."""
+    primary = _sqlite_file(db.engine)
+    if not primary:
+        raise RuntimeError("Reporting snapshots need a file-backed SQLite primary database.")
+    target = os.path.abspath(current_app.config["REPORTING_SNAPSHOT"])
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    partial = f"{target}.{os.getpid()}.tmp"
+    started = time.time()
+    source = sqlite3.connect(f"file:{primary}?mode=ro", uri=True)
+    copy = sqlite3.connect(partial)
+    try:
+        source.backup(copy)  # one read transaction; with WAL the writer carries on meanwhile
+        copy.execute("PRAGMA journal_mode = DELETE")  # opened read-only later, so no -wal/-shm files
+        copy.commit()
+    finally:
+        copy.close()
+        source.close()
+    # Date the copy from when it began: writes that landed during the backup count as lag
+    os.utime(partial, (started, started))
+    os.replace(partial, target)
+    return time.time() - started
+
+
+def _claim_refresh(target):
+    """Take the cross-process refresh lock file; False when another process holds it."""
+    lock = f"{target}.lock"
+    for _ in range(2):
+        try:
+            os.close(os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            return True
+        except FileExistsError:
+            try:
+                if time.time() - os.path.getmtime(lock) < STALE_REFRESH_LOCK:
+                    return False
+                os.remove(lock)
+            except FileNotFoundError:
+                pass
+    return False
+
+
+def _refresh_in_background(app):
+    """Start a snapshot copy unless one is already running in this or another process."""
+    if not _refresh_lock.acquire(blocking=False):
+        return
+    target = os.path.abspath(app.config["REPORTING_SNAPSHOT"])
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    if not _claim_refresh(target):
+        _refresh_lock.release()
+        return
+
+    def run():
+        try:
+            with app.app_context():
+                refresh_snapshot()
+        except Exception:
+            app.logger.exception("Reporting snapshot refresh failed")
+        finally:
+            try:
+                os.remove(f"{target}.lock")
+            except FileNotFoundError:
+                pass
+            _refresh_lock.release()
+
+    threading.Thread(target=run, name="reporting-snapshot", daemon=True).start()
+
+
+def _ensure_fresh():
+    """True when the reporting bind is within the staleness bound; a stale snapshot is refreshed in the background."""
+    global _unmeasured_warned
+    bound = current_app.config["REPORTING_MAX_STALENESS"]
+    lag = lag_seconds()
+    if lag is None:
+        if not _unmeasured_warned:
+            _unmeasured_warned = True
+            current_app.logger.warning("Replication lag of the reporting database can't be measured; "
+                                       "REPORTING_MAX_STALENESS is not enforced")
+        return True
+    if lag <= bound:
+        return True
+    if current_app.config.get("REPORTING_SNAPSHOT"):
+        _refresh_in_background(current_app._get_current_object())
+    else:
+        current_app.logger.warning("Reporting replica is %.0fs behind (bound %ss); reading the primary",
+                                   lag, bound)
+    return False
+
+
+def reporting_session():
+    """The session reporting queries use for this request: the reporting engine's, or db.session."""
+    engine = current_app.extensions.get("reporting_engine")
+    if engine is None:
+        return db.session
+    if "reporting_session" in g:
+        return g.reporting_session
+    g.reporting_session = Session(bind=engine) if _ensure_fresh() else db.session
+    return g.reporting_session
@@ -0,0 +1,63 @@
+"""
+Bobasi BBS - Disbursement Rollups
+"""
+from collections import defaultdict
+from models.models import db, Disbursement, DisbursementRollup, Student, financial_year_for
+from services.reporting import reporting_session
+
+# Financial year runs July–June
+FY_MONTHS = (7, 8, 9, 10, 11, 12, 1, 2, 3, 4, 5, 6)
+MONTH_LABELS = {1: "Jan", 2: "Feb", 3: "Mar", 4: "Apr", 5: "May", 6: "Jun",
+                7: "Jul", 8: "Aug", 9: "Sep", 10: "Oct", 11: "Nov", 12: "Dec"}
+
+
+def monthly_disbursements(financial_year):
+    """Chart labels and totals (Jul → Jun) for one financial year, read from the rollup."""
+    rows = reporting_session().query(
+        DisbursementRollup.month,
+        db.func.sum(DisbursementRollup.total_amount),
+    ).filter(
+        DisbursementRollup.financial_year == financial_year
+    ).group_by(DisbursementRollup.month).all()
+    totals = {month: amount or 0 for month, amount in rows}
+    labels = [MONTH_LABELS[m] for m in FY_MONTHS]
+    values = [round(totals.get(m, 0)) for m in FY_MONTHS]
+    return labels, values
+
+
+def rebuild_disbursement_rollup(batch_size=1000):
+    """
+    Recompute every rollup bucket from the disbursements table.
+    Bucketing happens in Python so the same code runs on SQLite and MySQL.
+    """
+    buckets = defaultdict(lambda: [0.0, 0])
+    rows = db.session.execute(
+        db.select(
+            Disbursement.disbursement_date,
+            Disbursement.created_at,
+            Disbursement.payment_method,
+            Disbursement.amount,
+            Student.ward,
+        ).join(Student, Student.id == Disbursement.student_id, isouter=True)
+        .execution_options(yield_per=batch_size)
+    )
+    for disbursed_on, created_at, method, amount, ward in rows:
+        when = disbursed_on or created_at
+        if when is None:
+            continue
+        bucket = buckets[(financial_year_for(when), when.month, method or "", ward or "")]
+        bucket[0] += amount or 0
+        bucket[1] += 1
+
+    db.session.query(DisbursementRollup).delete(synchronize_session=False)
+    if buckets:
+        db.session.execute(
+            db.insert(DisbursementRollup),
+            [
+                {"financial_year": fy, "month": month, "payment_method": method, "ward": ward,
+                 "total_amount": total, "disbursement_count": count}
+                for (fy, month, method, ward), (total, count) in buckets.items()
+            ],
+        )
+    db.session.commit()
+    return len(buckets)
@@ -0,0 +1,180 @@
+"""
+Bobasi BBS - Full-Text Search
+SQLite FTS5 index over students, applications and disbursements, kept in
+sync by mapper event hooks. Other dialects (or a database whose index has
+not been built yet) fall back to LIKE matching.
+"""
+import re
+from sqlalchemy import event
+from models.models import db, Student, Application, Disbursement
+
+# FTS table → (model, indexed columns). The FTS rowid is the model's id.
+INDEXES = {
+    "search_students": (Student, ("full_name", "admission_number", "institution")),
+    "search_applications": (Application, ("application_number",)),
+    "search_disbursements": (Disbursement, ("reference_number",)),
+}
+
+_ready = set()
+
+
+def _fts_ready(connection, table):
+    """True once the FTS table exists on this SQLite database."""
+    if connection.dialect.name != "sqlite":
+        return False
+    key = (str(connection.engine.url), table)
+    if key in _ready:
+        return True
+    exists = connection.execute(
+        db.text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+        {"name": table},
+    ).scalar()
+    if exists:
+        _ready.add(key)
+    return bool(exists)
+
+
+def match_expression(term):
+    """Turn free text into an FTS5 prefix query: 'jane kis' → '"jane"* "kis"*'."""
+    tokens = re.findall(r"\w+", (term or "").lower())
+    return " ".join(f'"{t}"*' for t in tokens)
+
+
+def _matching_ids(table, term):
+    """Sub-select of ids matching `term`, or None when FTS can't be used."""
+    expr = match_expression(term)
+    if not expr or not _fts_ready(db.session.connection(), table):
+        return None
+    return db.text(
+        f"SELECT rowid FROM {table} WHERE {table} MATCH :q"
+    ).bindparams(q=expr).columns(rowid=db.Integer)
+
+
+def filter_students(query, term):
+    ids = _matching_ids("search_students", term)
+    if ids is None:
+        return query.filter(db.or_(
+            Student.full_name.ilike(f"%{term}%"),
+            Student.admission_number.ilike(f"%{term}%"),
+            Student.institution.ilike(f"%{term}%"),
+        ))
+    return query.filter(Student.id.in_(ids))
+
+
+def filter_applications(query, term):
+    student_ids = _matching_ids("search_students", term)
+    app_ids = _matching_ids("search_applications", term)
+    if student_ids is None or app_ids is None:
+        return query.filter(db.or_(
+            Application.application_number.ilike(f"%{term}%"),
+            Application.student_id.in_(db.select(Student.id).where(db.or_(
+                Student.full_name.ilike(f"%{term}%"),
+                Student.institution.ilike(f"%{term}%"),
+            ))),
+        ))
+    return query.filter(db.or_(Application.id.in_(app_ids), Application.student_id.in_(student_ids)))
+
+
+def filter_disbursements(query, term):
+    student_ids = _matching_ids("search_students", term)
+    disb_ids = _matching_ids("search_disbursements", term)
+    if student_ids is None or disb_ids is None:
+        return query.filter(db.or_(
+            Disbursement.reference_number.ilike(f"%{term}%"),
+            Disbursement.student_id.in_(db.select(Student.id).where(Student.full_name.ilike(f"%{term}%"))),
+        ))
+    return query.filter(db.or_(Disbursement.id.in_(disb_ids), Disbursement.student_id.in_(student_ids)))
+
+
+def ranked_ids(table, term, limit=20):
+    """Best-matching ids for `term`, ordered by FTS5 bm25 rank."""
+    expr = match_expression(term)
+    if not expr or not _fts_ready(db.session.connection(), table):
+        return None
+    rows = db.session.execute(
+        db.text(f"SELECT rowid FROM {table} WHERE {table} MATCH :q ORDER BY rank LIMIT :n"),
+        {"q": expr, "n": limit},
+    )
+    return [r[0] for r in rows]
+
+
+def index_rows(table, ids):
+    """Add rows written by bulk INSERTs (which skip the mapper hooks) to an FTS table."""
+    connection = db.session.connection()
+    if not ids or not _fts_ready(connection, table):
+        return
+    model, columns = INDEXES[table]
+    cols = ", ".join(columns)
+    connection.execute(
+        db.text(f"INSERT INTO {table} (rowid, {cols}) SELECT id, {cols} FROM {model.__tablename__} "
+                f"WHERE id IN :ids").bindparams(db.bindparam("ids", expanding=True)),
+        {"ids": list(ids)},
+    )
+
+
+def rebuild_search_index():
+    """(Re)create the FTS5 tables and repopulate them from the base tables."""
+    connection = db.session.connection()
+    if connection.dialect.name != "sqlite":
+        return False
+    for table, (model, columns) in INDEXES.items():
+        cols = ", ".join(columns)
+        connection.execute(db.text(f"DROP TABLE IF EXISTS {table}"))
+        connection.execute(db.text(
+            f"CREATE VIRTUAL TABLE {table} USING fts5({cols}, tokenize = 'unicode61', prefix = '2 3 4')"
+        ))
+        connection.execute(db.text(
+            f"INSERT INTO {table} (rowid, {cols}) SELECT id, {cols} FROM {model.__tablename__}"
+        ))
+    db.session.commit()
+    return True
+
+
+def ensure_search_index():
+    """Build the index only if it is missing (e.g. on first start)."""
+    connection = db.session.connection()
+    if connection.dialect.name != "sqlite":
+        return False
+    if all(_fts_ready(connection, table) for table in INDEXES):
+        return False
+    return rebuild_search_index()
+
+
+# ─────────────────────────────────────────────
+# INDEX SYNC HOOKS
+# ─────────────────────────────────────────────
+def _register_hooks(table, model, columns):
+    cols = ", ".join(columns)
+    params = ", ".join(f":{c}" for c in columns)
+
+    def _index(connection, target):
+        connection.execute(
+            db.text(f"INSERT INTO {table} (rowid, {cols}) VALUES (:rowid, {params})"),
+            {"rowid": target.id, **{c: getattr(target, c) for c in columns}},
+        )
+
+    def _unindex(connection, target):
+        connection.execute(db.text(f"DELETE FROM {table} WHERE rowid = :rowid"), {"rowid": target.id})
+
+    @event.listens_for(model, "after_insert")
+    def after_insert(mapper, connection, target):
+        if _fts_ready(connection, table):
+            _index(connection, target)
+
+    @event.listens_for(model, "after_update")
+    def after_update(mapper, connection, target):
+        state = db.inspect(target)
+        if not any(state.attrs[c].history.has_changes() for c in columns):
+            return
+        if _fts_ready(connection, table):
+            _unindex(connection, target)
+            _index(connection, target)
+
+    @event.listens_for(model, "after_delete")
+    def after_delete(mapper, connection, target):
+        if _fts_ready(connection, table):
+            _unindex(connection, target)
+
+
+for _table, (_model, _columns) in INDEXES.items():
+    _register_hooks(_table, _model, _columns)
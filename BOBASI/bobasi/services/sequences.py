@@ -0,0 +1,174 @@
+"""
+Bobasi BBS - Sequence Allocator
+Hands out numbers from the number_sequences table with one atomic
+UPDATE on a short, separate transaction, so concurrent submissions never
+race to the same value. Optionally reserves a block per worker process
+so most allocations need no database round trip.
+
+check_concurrent_allocation() is the regression check for that guarantee:
+it allocates from a scratch sequence in several forked processes, each
+with several threads, and asserts that no number was handed out twice
+(`flask stress-sequence`).
+"""
+import multiprocessing
+import os
+import threading
+import uuid
+from datetime import datetime
+from flask import current_app
+from sqlalchemy.exc import IntegrityError
+from models.models import db, Application, NumberSequence
+
+_blocks = {}  # name → [next, end) reserved by this process
+_blocks_lock = threading.Lock()
+_blocks_pid = os.getpid()
+
+
+def _reserve(name, count, seed):
+    """Atomically take `count` values from sequence `name`; returns the first one."""
+    t = NumberSequence.__table__
+    for _ in range(5):
+        with db.engine.begin() as conn:
+            updated = conn.execute(
+                t.update().where(t.c.name == name)
+                .values(next_value=t.c.next_value + count, updated_at=datetime.utcnow())
+            ).rowcount
+            if updated:
+                return conn.execute(db.select(t.c.next_value).where(t.c.name == name)).scalar() - count
+        # First use of this sequence: create it, then retry the UPDATE
+        try:
+            with db.engine.begin() as conn:
+                conn.execute(t.insert().values(name=name, next_value=seed(), updated_at=datetime.utcnow()))
+        except IntegrityError:
+            pass  # another worker created it first
+    raise RuntimeError(f"Could not allocate from sequence '{name}'")
+
+
+def next_value(name, seed=lambda: 1, block_size=1):
+    """Next number from sequence `name`, reserving `block_size` at a time per process."""
+    global _blocks_pid
+    if block_size <= 1:
+        return _reserve(name, 1, seed)
+    with _blocks_lock:
+        if _blocks_pid != os.getpid():
+            # Forked worker: never reuse the parent's reserved block
+            _blocks.clear()
+            _blocks_pid = os.getpid()
+        block = _blocks.get(name)
+        if not block or block[0] >= block[1]:
+            start = _reserve(name, block_size, seed)
+            block = _blocks[name] = [start, start + block_size]
+        value = block[0]
+        block[0] += 1
+        return value
+
+
+def _application_seed(prefix, year):
+    """Continue after the highest number already issued for `year`."""
+    def seed():
+        prefix_year = f"{prefix}{year}"
+        with db.engine.connect() as conn:
+            rows = conn.execute(
+                db.select(Application.application_number)
+                .where(Application.application_number.like(f"{prefix_year}%"))
+            ).scalars().all()
+        used = [int(n[len(prefix_year):]) for n in rows if n[len(prefix_year):].isdigit()]
+        return max(used, default=0) + 1
+    return seed
+
+
+def next_application_number():
+    """BOB{year}{n:05d}, unique across concurrent submissions."""
+    prefix = current_app.config.get("APPLICATION_PREFIX", "BOB")
+    year = datetime.now().year
+    n = next_value(
+        f"application:{year}",
+        seed=_application_seed(prefix, year),
+        block_size=current_app.config.get("APPLICATION_NUMBER_BLOCK", 1),
+    )
+    return f"{prefix}{year}{n:05d}"
+
+
+def reserve_application_numbers(year, count):
+    """`count` consecutive application numbers for `year` in one allocation (bulk imports, load data)."""
+    prefix = current_app.config.get("APPLICATION_PREFIX", "BOB")
+    start = _reserve(f"application:{year}", count, _application_seed(prefix, year))
+    return [f"{prefix}{year}{n:05d}" for n in range(start, start + count)]
+
+
+# ─────────────────────────────────────────
+# CONCURRENCY CHECK
+# ─────────────────────────────────────────
+def _stress_process(app, name, threads, per_thread, block_size, queue):
+    with app.app_context():
+        db.engine.dispose(close=False)  # forked: open fresh connections, leave the parent's alone
+    results, errors, lock = [], [], threading.Lock()
+
+    def worker():
+        with app.app_context():
+            try:
+                got = [next_value(name, block_size=block_size) for _ in range(per_thread)]
+            except Exception as exc:
+                with lock:
+                    errors.append(repr(exc))
+            else:
+                with lock:
+                    results.extend(got)
+            finally:
+                db.session.remove()
+
+    pool = [threading.Thread(target=worker) for _ in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    queue.put((os.getpid(), results, errors))
+
+
+def check_concurrent_allocation(app, processes=4, threads=8, per_thread=100, block_size=1):
+    """
+    Allocate `per_thread` numbers from every thread of every process on a
+    scratch sequence and return {"allocated", "expected", "pids"}. Raises
+    AssertionError if any allocation failed, any number was issued twice
+    (within or across processes) or, with block_size=1, the numbers are not
+    exactly 1..N.
+    """
+    name = f"stress:{uuid.uuid4().hex[:12]}"
+    context = multiprocessing.get_context("fork")
+    queue = context.Queue()
+    with app.app_context():
+        db.engine.dispose()  # children must not inherit pooled connections
+    workers = [
+        context.Process(target=_stress_process, args=(app, name, threads, per_thread, block_size, queue))
+        for _ in range(processes)
+    ]
+    for p in workers:
+        p.start()
+    issued, errors, pids = {}, [], set()
+    try:
+        for _ in workers:
+            pid, results, failed = queue.get(timeout=300)
+            pids.add(pid)
+            errors.extend(failed)
+            for n in results:
+                issued.setdefault(n, []).append(pid)
+        for p in workers:
+            p.join()
+    finally:
+        with app.app_context():
+            db.session.query(NumberSequence).filter_by(name=name).delete()
+            db.session.commit()
+
+    expected = processes * threads * per_thread
+    allocated = sum(len(owners) for owners in issued.values())
+    assert not errors, f"{len(errors)} allocations failed, first: {errors[0]}"
+    assert len(pids) == processes, f"only {len(pids)} of {processes} processes reported"
+    duplicates = {n: owners for n, owners in issued.items() if len(owners) > 1}
+    assert not duplicates, (
+        f"{len(duplicates)} numbers issued more than once, e.g. "
+        + ", ".join(f"{n} (pids {sorted(set(o))})" for n, o in list(duplicates.items())[:5])
+    )
+    assert allocated == expected, f"{allocated} numbers allocated, expected {expected}"
+    if block_size <= 1:
+        assert set(issued) == set(range(1, expected + 1)), "numbers are not contiguous from 1"
+    return {"allocated": allocated, "expected": expected, "pids": sorted(pids)}
@@ -0,0 +1,184 @@
+"""
+Bobasi BBS - SQLite Connection Tuning
+Applies SQLITE_PRAGMAS to every new SQLite connection. The production
+profile switches to WAL journaling, so readers never block the writer and
+the writer never blocks readers, and sets a busy timeout, so a second writer
+waits for the lock instead of failing with "database is locked".
+
+benchmark() runs the same concurrent read/write mix against scratch
+databases so the default and production settings can be compared
+(`flask benchmark-sqlite`).
+"""
+import multiprocessing
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+from datetime import datetime
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import OperationalError
+from models.models import db, User, Student, Application, Notification
+
+
+def apply_pragmas(dbapi_connection, pragmas):
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name} = {value}")
+    finally:
+        cursor.close()
+
+
+def tune_engine(engine, pragmas):
+    """Run `pragmas` on each connection the engine opens (no-op for other dialects)."""
+    if engine.dialect.name != "sqlite" or not pragmas:
+        return
+
+    @event.listens_for(engine, "connect")
+    def _set_pragmas(dbapi_connection, connection_record):
+        apply_pragmas(dbapi_connection, pragmas)
+
+
+def init_sqlite(app):
+    pragmas = app.config.get("SQLITE_PRAGMAS") or {}
+    with app.app_context():
+        for engine in db.engines.values():
+            tune_engine(engine, pragmas)
+
+
+# ─────────────────────────────────────────────
+# BENCHMARK
+# ─────────────────────────────────────────────
+def _seed(engine, students):
+    db.metadata.create_all(engine)
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        conn.execute(db.insert(User), [
+            {"name": f"Student {i}", "email": f"s{i}@bench.local", "password_hash": "x",
+             "role": "student", "status": "active", "created_at": now}
+            for i in range(students)
+        ])
+        conn.execute(db.insert(Student), [
+            {"user_id": i + 1, "full_name": f"Student {i}", "ward": f"Ward {i % 7}", "created_at": now}
+            for i in range(students)
+        ])
+        conn.execute(db.insert(Application), [
+            {"student_id": i + 1, "application_number": f"BENCH-{i:06d}", "requested_amount": 20000,
+             "academic_year": "2025/2026", "status": "pending", "submitted_at": now}
+            for i in range(students)
+        ])
+
+
+def _read(conn, students):
+    """A listing page: one student's applications plus the newest applications overall."""
+    student_id = random.randint(1, students)
+    conn.execute(db.select(Application).where(Application.student_id == student_id)).all()
+    conn.execute(
+        db.select(Application.id, Application.application_number, Student.full_name)
+        .join(Student, Student.id == Application.student_id)
+        .order_by(Application.submitted_at.desc(), Application.id.desc()).limit(20)
+    ).all()
+
+
+def _write(conn, students):
+    """A short write transaction, as the app issues them: a notification plus its unread counter."""
+    user_id = random.randint(1, students)
+    with conn.begin():
+        conn.execute(db.insert(Notification).values(
+            user_id=user_id, title="Benchmark", message="Status update",
+            type="system", is_read=False, created_at=datetime.utcnow()))
+        conn.execute(db.update(User).where(User.id == user_id)
+                     .values(unread_notification_count=User.unread_notification_count + 1))
+
+
+def _percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def _run_worker(path, pragmas, engine_options, threads, deadline, write_ratio, students, queue):
+    """One worker process (like a gunicorn worker): `threads` request threads on its own engine."""
+    engine = create_engine(f"sqlite:///{path}", **engine_options)
+    tune_engine(engine, pragmas)
+    results = {"read": [], "write": []}
+    errors = {"read": 0, "write": 0}
+    lock = threading.Lock()
+
+    def worker():
+        latencies, failed = {"read": [], "write": []}, {"read": 0, "write": 0}
+        while time.time() < deadline:
+            kind = "write" if random.random() < write_ratio else "read"
+            began = time.perf_counter()
+            try:
+                with engine.connect() as conn:
+                    if kind == "write":
+                        _write(conn, students)
+                    else:
+                        _read(conn, students)
+                latencies[kind].append(time.perf_counter() - began)
+            except OperationalError:
+                failed[kind] += 1
+        with lock:
+            for kind in results:
+                results[kind].extend(latencies[kind])
+                errors[kind] += failed[kind]
+
+    pool = [threading.Thread(target=worker) for _ in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    engine.dispose()
+    queue.put((results, errors))
+
+
+def benchmark(pragmas=None, engine_options=None, processes=4, threads=8, seconds=10.0, write_ratio=0.2,
+              students=2000):
+    """
+    Hammer a scratch SQLite database from `processes` × `threads` concurrent
+    requests for `seconds` and return throughput, latency percentiles and
+    lock errors ("database is locked") for reads and writes.
+    """
+    pragmas, engine_options = pragmas or {}, engine_options or {}
+    workdir = tempfile.mkdtemp(prefix="bobasi-bench-")
+    path = os.path.join(workdir, "bench.db")
+    engine = create_engine(f"sqlite:///{path}")
+    tune_engine(engine, pragmas)
+    _seed(engine, students)
+    engine.dispose()
+
+    context = multiprocessing.get_context("fork")
+    queue = context.Queue()
+    deadline = time.time() + 0.5 + seconds  # head start so every process begins together
+    workers = [
+        context.Process(target=_run_worker,
+                        args=(path, pragmas, engine_options, threads, deadline, write_ratio, students, queue))
+        for _ in range(processes)
+    ]
+    for p in workers:
+        p.start()
+    results = {"read": [], "write": []}
+    errors = {"read": 0, "write": 0}
+    for _ in workers:
+        latencies, failed = queue.get()
+        for kind in results:
+            results[kind].extend(latencies[kind])
+            errors[kind] += failed[kind]
+    for p in workers:
+        p.join()
+    shutil.rmtree(workdir, ignore_errors=True)
+
+    return {
+        kind: {
+            "ops": len(results[kind]),
+            "per_second": len(results[kind]) / seconds,
+            "p50_ms": _percentile(results[kind], 50) * 1000,
+            "p95_ms": _percentile(results[kind], 95) * 1000,
+            "errors": errors[kind],
+        }
+        for kind in results
+    }
@@ -0,0 +1,294 @@
+"""
+Bobasi BBS - Dashboard Statistics Service
+"""
+import hashlib
+import json
+from datetime import datetime
+from flask import current_app
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+from models.models import db, Student, Application, Disbursement, DisbursementRollup, Loan, Notification
+from services.cache import TTLCache
+from services.reporting import reporting_session
+
+APPLICATION_STATUSES = ("pending", "under_review", "approved", "rejected", "disbursed", "completed")
+
+_api_cache = TTLCache()
+_totals_cache = TTLCache(maxsize=256)  # listing header totals, keyed by list and filters
+_student_cache = TTLCache(maxsize=8192)  # ("summary", student id) and ("inbox", user id)
+
+
+def _application_counts():
+    """Per-status application counts and requested totals in one grouped pass."""
+    counts = {s: 0 for s in APPLICATION_STATUSES}
+    requested = {s: 0 for s in APPLICATION_STATUSES}
+    rows = reporting_session().query(
+        Application.status,
+        db.func.count(Application.id),
+        db.func.sum(Application.requested_amount),
+    ).group_by(Application.status).all()
+    for status, count, amount in rows:
+        counts[status] = count
+        requested[status] = amount or 0
+    return counts, requested
+
+
+def _table_totals():
+    """Student, loan and disbursement totals in a single round trip."""
+    row = reporting_session().query(
+        db.select(db.func.count(Student.id)).scalar_subquery(),
+        db.select(db.func.count(Loan.id)).scalar_subquery(),
+        db.select(db.func.count(Loan.id)).where(Loan.status == "active").scalar_subquery(),
+        db.select(db.func.count(Disbursement.id)).scalar_subquery(),
+        db.select(db.func.coalesce(db.func.sum(Disbursement.amount), 0)).scalar_subquery(),
+        db.select(db.func.count(db.distinct(Disbursement.student_id))).scalar_subquery(),
+    ).one()
+    return {
+        "total_students": row[0],
+        "total_loans": row[1],
+        "active_loans": row[2],
+        "total_disbursed_count": row[3],
+        "total_disbursed": row[4] or 0,
+        "total_beneficiaries": row[5],
+    }
+
+
+def get_stats():
+    """
+    Every dashboard counter used by admin.dashboard, finance.dashboard and
+    api.stats. Computed once and shared between callers and requests for
+    STATS_CACHE_TTL seconds; per process, invalidate_stats() drops it.
+    """
+    stats = _api_cache.get("stats")
+    if stats is not None:
+        return stats
+
+    counts, requested = _application_counts()
+    stats = _table_totals()
+    stats.update(counts)
+    stats["total_apps"] = sum(counts.values())
+    stats["total_applied"] = requested["approved"] + requested["disbursed"]
+    _api_cache.set("stats", stats, ttl=current_app.config.get("STATS_CACHE_TTL", 60))
+    return stats
+
+
+def admin_dashboard_stats():
+    s = get_stats()
+    return {
+        "total_students": s["total_students"],
+        "total_apps": s["total_apps"],
+        "pending": s["pending"],
+        "under_review": s["under_review"],
+        "approved": s["approved"],
+        "rejected": s["rejected"],
+        "disbursed": s["disbursed"],
+        "total_disbursed": s["total_disbursed"],
+        "total_loans": s["total_loans"],
+        "active_loans": s["active_loans"],
+        "total_disbursed_count": s["total_disbursed_count"],
+    }
+
+
+def finance_dashboard_stats():
+    s = get_stats()
+    return {
+        "approved_pending_disburse": s["approved"],
+        "total_disbursed": s["total_disbursed"],
+        "total_beneficiaries": s["total_beneficiaries"],
+        "disbursed_apps": s["disbursed"],
+        "total_applied": s["total_applied"],
+    }
+
+
+def api_stats():
+    s = get_stats()
+    return {
+        "total_apps": s["total_apps"],
+        "pending": s["pending"],
+        "approved": s["approved"],
+        "rejected": s["rejected"],
+        "disbursed": s["disbursed"],
+        "total_disbursed": s["total_disbursed"],
+    }
+
+
+def monthly_applications(year):
+    """Applications submitted per month of `year`, bucketed by the database."""
+    month = db.extract("month", Application.submitted_at)
+    rows = reporting_session().query(month, db.func.count(Application.id)).filter(
+        Application.submitted_at >= datetime(year, 1, 1),
+        Application.submitted_at < datetime(year + 1, 1, 1),
+    ).group_by(month).all()
+    monthly = [0] * 12
+    for m, count in rows:
+        monthly[int(m) - 1] = count
+    return monthly
+
+
+def cached_api_stats():
+    """
+    The /api/stats payload with its ETag and Last-Modified time, cached
+    in process for STATS_CACHE_TTL seconds. Last-Modified only moves
+    when the payload content actually changes.
+    """
+    entry = _api_cache.get("api_stats")
+    if entry is not None:
+        return entry
+
+    payload = api_stats()
+    payload["monthly_applications"] = monthly_applications(datetime.now().year)
+    body = json.dumps(payload, sort_keys=True)
+    etag = hashlib.sha1(body.encode()).hexdigest()
+
+    previous = _api_cache.get("api_stats_last")
+    if previous and previous["etag"] == etag:
+        last_modified = previous["last_modified"]
+    else:
+        last_modified = datetime.utcnow().replace(microsecond=0)
+
+    entry = {"payload": payload, "etag": etag, "last_modified": last_modified}
+    _api_cache.set("api_stats", entry, ttl=current_app.config.get("STATS_CACHE_TTL", 60))
+    _api_cache.set("api_stats_last", entry, ttl=86400)
+    return entry
+
+
+def invalidate_stats():
+    """Drop the cached dashboard counters, API payload and listing totals after applications or disbursements change."""
+    _api_cache.invalidate("stats")
+    _api_cache.invalidate("api_stats")
+    _totals_cache.invalidate()
+
+
+def listing_totals(key, compute):
+    """
+    The "N matching / KShs total" figures of a paginated list, computed once
+    and shared by every page and request for STATS_CACHE_TTL seconds, so
+    paging through a list stays constant-cost. Per process; invalidate_stats()
+    drops them.
+    """
+    totals = _totals_cache.get(key)
+    if totals is None:
+        totals = compute()
+        _totals_cache.set(key, totals, ttl=current_app.config.get("STATS_CACHE_TTL", 60))
+    return totals
+
+
+def disbursement_totals(payment_method=None):
+    """(count, amount) of all disbursements, optionally of one payment method, from the monthly rollup."""
+    query = db.session.query(
+        db.func.coalesce(db.func.sum(DisbursementRollup.disbursement_count), 0),
+        db.func.coalesce(db.func.sum(DisbursementRollup.total_amount), 0),
+    )
+    if payment_method:
+        query = query.filter(DisbursementRollup.payment_method == payment_method)
+    return tuple(query.one())
+
+
+# ─────────────────────────────────────────────
+# STUDENT DASHBOARD
+# ─────────────────────────────────────────────
+def _student_ttl():
+    return current_app.config.get("STUDENT_DASHBOARD_CACHE_TTL", 30)
+
+
+def student_summary(student_id):
+    """
+    Status counts, grant total and recent applications/grants for
+    student.dashboard: one grouped query over the student's applications,
+    one aggregate over their grant records, then the newest rows by index.
+    Cached per student for STUDENT_DASHBOARD_CACHE_TTL seconds in this
+    process only; the hooks below drop it once a change to the student's
+    applications or loans commits. Other worker processes keep their copy
+    until the TTL expires, so the TTL bounds how stale a dashboard can be.
+    """
+    key = ("summary", student_id)
+    summary = _student_cache.get(key)
+    if summary is not None:
+        return summary
+
+    counts = {s: 0 for s in APPLICATION_STATUSES}
+    counts.update(db.session.execute(
+        db.select(Application.status, db.func.count(Application.id))
+        .where(Application.student_id == student_id)
+        .group_by(Application.status)
+    ).all())
+    grant_count, total_received = db.session.execute(
+        db.select(db.func.count(Loan.id), db.func.coalesce(db.func.sum(Loan.principal_amount), 0))
+        .where(Loan.student_id == student_id)
+    ).one()
+
+    recent_apps = []
+    if sum(counts.values()):
+        recent_apps = db.session.execute(
+            db.select(Application.id, Application.application_number, Application.academic_year,
+                      Application.requested_amount, Application.approved_amount, Application.status,
+                      Application.submitted_at)
+            .where(Application.student_id == student_id)
+            .order_by(Application.submitted_at.desc(), Application.id.desc()).limit(5)
+        ).all()
+    recent_grants = []
+    if grant_count:
+        recent_grants = db.session.execute(
+            db.select(Loan.id, Loan.principal_amount, Loan.created_at)
+            .where(Loan.student_id == student_id)
+            .order_by(Loan.created_at.desc(), Loan.id.desc()).limit(3)
+        ).all()
+
+    summary = {
+        "status_counts": counts,
+        "total_received": total_received or 0,
+        "grant_count": grant_count,
+        "recent_apps": recent_apps,
+        "recent_grants": recent_grants,
+    }
+    _student_cache.set(key, summary, ttl=_student_ttl())
+    return summary
+
+
+def student_inbox(user_id, limit=5):
+    """Newest unread notifications for the dashboard, cached like student_summary()."""
+    key = ("inbox", user_id)
+    rows = _student_cache.get(key)
+    if rows is None:
+        rows = db.session.execute(
+            db.select(Notification.id, Notification.title, Notification.message, Notification.created_at)
+            .where(Notification.user_id == user_id, Notification.is_read.is_(False))
+            .order_by(Notification.created_at.desc()).limit(limit)
+        ).all()
+        _student_cache.set(key, rows, ttl=_student_ttl())
+    return rows
+
+
+def invalidate_student_summary(*student_ids):
+    """Call after bulk statements that change applications or loans (ORM changes are hooked)."""
+    for student_id in student_ids:
+        _student_cache.invalidate(("summary", student_id))
+
+
+def invalidate_student_inbox(*user_ids):
+    """Call after bulk statements that add or mark notifications (ORM changes are hooked)."""
+    for user_id in user_ids:
+        _student_cache.invalidate(("inbox", user_id))
+
+
+def _register_hooks(model, kind, column):
+    """Note changed ids on the session; they are dropped from the cache after it commits."""
+    def note(mapper, connection, target):
+        session = object_session(target)
+        if session is not None:
+            session.info.setdefault("student_cache_pending", set()).add((kind, getattr(target, column)))
+
+    for name in ("after_insert", "after_update", "after_delete"):
+        event.listen(model, name, note)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed(session):
+    # After, not at flush: a request reading in between would re-cache the old rows
+    for key in session.info.pop("student_cache_pending", ()):
+        _student_cache.invalidate(key)
+
+
+_register_hooks(Application, "summary", "student_id")
+_register_hooks(Loan, "summary", "student_id")
+_register_hooks(Notification, "inbox", "user_id")
@@ -0,0 +1,129 @@
+"""
+Bobasi BBS - Application Status Transitions
+Shared by the single-application status form and the bulk transition
+endpoints. Bulk changes run as one guarded UPDATE per chunk; rows whose
+current status does not allow the transition are reported back instead
+of failing the batch.
+"""
+from datetime import datetime
+from models.models import db, Application, NotificationOutbox, Student
+from services.search import filter_applications
+from services.stats import invalidate_student_summary
+
+CHUNK_SIZE = 500
+
+# target status -> statuses it may be reached from in bulk.
+# 'disbursed' is only reachable through the finance disbursement flows.
+TRANSITIONS = {
+    "pending": ("under_review", "rejected"),
+    "under_review": ("pending",),
+    "approved": ("pending", "under_review"),
+    "rejected": ("pending", "under_review", "approved"),
+    "completed": ("disbursed",),
+}
+
+
+def status_message(status, application_number, approved_amount=None, reason=""):
+    """Student notification text for a status change (None when the student isn't notified)."""
+    msg_map = {
+        "approved": f"Congratulations! Your application {application_number} has been APPROVED for KShs. {approved_amount or 0:,.0f}.",
+        "rejected": f"Your application {application_number} was not approved. Reason: {reason}",
+        "under_review": f"Your application {application_number} is now under review by the committee.",
+        "disbursed": f"Funds for application {application_number} have been disbursed. Check your account.",
+    }
+    return msg_map.get(status)
+
+
+def select_applications(ids=None, status="", search=""):
+    """Query for the applications a bulk action targets: explicit ids, or the list filters."""
+    query = Application.query
+    if ids:
+        return query.filter(Application.id.in_(ids))
+    if status:
+        query = query.filter_by(status=status)
+    if search:
+        query = filter_applications(query, search)
+    return query
+
+
+def bulk_transition(query, new_status, reviewer_name, approved_amount=None, rejection_reason="",
+                    comments="", chunk_size=CHUNK_SIZE):
+    """Move every application in `query` to `new_status`.
+
+    Returns {"updated": n, "skipped": [{"id", "application_number", "status", "reason"}]}.
+    Each chunk is committed on its own, together with its notification outbox rows.
+    """
+    if new_status not in TRANSITIONS:
+        raise ValueError(f"Applications cannot be moved to '{new_status}' in bulk.")
+    allowed = TRANSITIONS[new_status]
+
+    candidates = query.with_entities(Application.id, Application.application_number, Application.status) \
+        .order_by(None).order_by(Application.id).all()
+    updated, skipped = 0, []
+    title = f"Application {new_status.replace('_', ' ').title()}"
+
+    for start in range(0, len(candidates), chunk_size):
+        chunk = candidates[start:start + chunk_size]
+        valid = []
+        for row in chunk:
+            if row.status in allowed:
+                valid.append(row.id)
+            else:
+                skipped.append({"id": row.id, "application_number": row.application_number, "status": row.status,
+                                "reason": f"cannot move from '{row.status}' to '{new_status}'"})
+        if not valid:
+            continue
+
+        # Lock the rows that can still make the transition so the UPDATE changes
+        # exactly this set (rows can move concurrently)
+        done = db.session.execute(
+            db.select(Application.id, Application.student_id, Application.application_number,
+                      Application.approved_amount, Application.requested_amount, Student.user_id)
+            .join(Student, Student.id == Application.student_id)
+            .where(Application.id.in_(valid), Application.status.in_(allowed))
+            .with_for_update(of=Application)
+        ).all()
+        locked = [r.id for r in done]
+
+        now = datetime.utcnow()
+        values = {"status": new_status, "reviewed_by": reviewer_name, "reviewed_at": now, "updated_at": now}
+        if comments:
+            values["committee_comments"] = comments
+        if new_status == "approved":
+            values["approved_amount"] = approved_amount if approved_amount is not None else \
+                db.func.coalesce(Application.approved_amount, Application.requested_amount)
+            values["approved_at"] = now
+        elif new_status == "rejected":
+            values["rejection_reason"] = rejection_reason
+        if locked:
+            db.session.execute(
+                db.update(Application)
+                .where(Application.id.in_(locked))
+                .values(**values)
+                .execution_options(synchronize_session=False)
+            )
+        done_ids = {r.id for r in done}
+        for row in chunk:
+            if row.id in valid and row.id not in done_ids:
+                skipped.append({"id": row.id, "application_number": row.application_number, "status": row.status,
+                                "reason": "changed by another user during the update"})
+
+        outbox = []
+        for r in done:
+            amount = r.approved_amount
+            if new_status == "approved":
+                amount = approved_amount if approved_amount is not None else \
+                    (r.approved_amount if r.approved_amount is not None else r.requested_amount)
+            message = status_message(new_status, r.application_number, amount, rejection_reason)
+            if message:
+                outbox.append({"recipient_user_id": r.user_id, "title": title, "message": message,
+                               "type": "application", "status": "pending", "attempts": 0,
+                               "available_at": now, "created_at": now})
+        if outbox:
+            db.session.execute(db.insert(NotificationOutbox), outbox)
+            db.session.info["outbox_pending"] = True
+        db.session.commit()
+        invalidate_student_summary(*{r.student_id for r in done})
+        updated += len(done)
+
+    return {"updated": updated, "skipped": skipped}
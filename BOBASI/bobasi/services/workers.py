@@ -0,0 +1,83 @@
+"""
+Bobasi BBS - Background Workers
+A small pool of daemon threads per queue (notification outbox, document
+previews, report cube). Each thread sleeps until woken or until its poll
+interval passes, then calls the queue's process function until it reports
+no more work. A commit that queued work sets a session.info flag; the
+after_commit listener registered by WakeOnCommit turns that flag into an
+immediate wake-up, so workers never see rows before they are committed.
+Pools without a wake-up simply run on their poll interval.
+
+Pools start on the first request, so CLI commands never spawn them.
+"""
+import threading
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from models.models import db
+
+
+class WakeOnCommit:
+    """Wake-up event set after any commit whose session.info carries `flag`."""
+    def __init__(self, flag):
+        self.flag = flag
+        self.event = threading.Event()
+        event.listen(Session, "after_commit", self._after_commit)
+
+    def _after_commit(self, session):
+        if session.info.pop(self.flag, False):
+            self.event.set()
+
+    def set(self):
+        self.event.set()
+
+
+class WorkerPool:
+    def __init__(self, app, name, process, wakeup=None, workers=2, poll_interval=2.0):
+        self.app = app
+        self.name = name
+        self.process = process
+        self.event = wakeup.event if wakeup is not None else threading.Event()
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self._threads = []
+        self._stop = threading.Event()
+
+    def start(self):
+        for i in range(self.workers):
+            t = threading.Thread(target=self._run, name=f"{self.name}-worker-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def stop(self):
+        self._stop.set()
+        self.event.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.event.wait(self.poll_interval)
+            self.event.clear()
+            with self.app.app_context():
+                try:
+                    while self.process() and not self._stop.is_set():
+                        pass
+                except Exception:
+                    self.app.logger.exception("%s worker failed", self.name.capitalize())
+                finally:
+                    db.session.remove()
+
+
+def init_worker_pool(app, name, process, wakeup=None, workers=1, poll_interval=2.0):
+    """Start a WorkerPool as app.extensions[name] on the first request; workers <= 0 disables it."""
+    if workers <= 0:
+        return
+    lock = threading.Lock()
+
+    @app.before_request
+    def _start_workers():
+        if name in app.extensions:
+            return
+        with lock:
+            if name not in app.extensions:
+                pool = WorkerPool(app, name, process, wakeup, workers, poll_interval)
+                pool.start()
+                app.extensions[name] = pool